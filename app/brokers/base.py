@@ -0,0 +1,159 @@
+import asyncio
+from abc import ABC, abstractmethod
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Generic, Self, TypeVar
+
+from redis import asyncio as aioredis
+
+from app.brokers.configs import BaseBrokerConfig, RedisBrokerConfig
+
+
+class BrokerError(Exception): ...
+
+
+BrokerConfig = TypeVar('BrokerConfig', bound=BaseBrokerConfig)
+
+
+@dataclass
+class BrokerStats:
+    subscribers: int = 0
+    received: int = 0
+    delivered: int = 0
+    dropped: int = 0
+
+
+@dataclass(eq=False)
+class Subscription:
+    topic: str
+    buffer_size: int
+    is_dropped: bool = False
+
+    def __post_init__(self) -> None:
+        # one extra slot so the end marker always fits after a drop
+        self.messages: asyncio.Queue[bytes | None] = asyncio.Queue(self.buffer_size + 1)
+
+    def push(self, message: bytes) -> bool:
+        if self.messages.qsize() >= self.buffer_size:
+            return False
+        self.messages.put_nowait(message)
+        return True
+
+    def drop(self) -> None:
+        # a slow consumer loses its backlog and its stream ends
+        self.is_dropped = True
+        while not self.messages.empty():
+            self.messages.get_nowait()
+        self.messages.put_nowait(None)
+
+    def __aiter__(self) -> Self:
+        return self
+
+    async def __anext__(self) -> bytes:
+        message = await self.messages.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+
+@dataclass
+class BaseAsyncBroker(ABC, Generic[BrokerConfig]):
+    config: BrokerConfig
+
+    @abstractmethod
+    async def connect(self) -> Self: ...
+
+    @abstractmethod
+    async def publish(self, topic: str, message: bytes) -> None: ...
+
+    @abstractmethod
+    def subscribe(
+        self, topic: str
+    ) -> AbstractAsyncContextManager[Subscription]: ...
+
+    @abstractmethod
+    def get_stats(self) -> BrokerStats: ...
+
+    @abstractmethod
+    async def close(self) -> None: ...
+
+
+@dataclass
+class RedisAsyncBroker(BaseAsyncBroker[RedisBrokerConfig]):
+    subscriptions: dict[str, set[Subscription]] = field(default_factory=dict)
+
+    async def connect(self) -> Self:
+        self.redis = aioredis.Redis(
+            host=self.config.redis_host,
+            port=self.config.redis_port
+        )
+        self.stats = BrokerStats()
+        # a single pub/sub connection per worker fans out to every local subscriber
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await self.pubsub.psubscribe(f'{self.config.channel_prefix}*')
+        self.listener = asyncio.create_task(self._listen())
+        self.config.logger.info('Redis broker: connect')
+        return self
+
+    async def publish(self, topic: str, message: bytes) -> None:
+        try:
+            await self.redis.publish(f'{self.config.channel_prefix}{topic}', message)
+            self.config.logger.debug(f'Published message to topic: {topic}')
+        except Exception as e:
+            self.config.logger.warning(e, exc_info=True)
+
+    @asynccontextmanager
+    async def subscribe(self, topic: str) -> AsyncIterator[Subscription]:
+        subscription = Subscription(topic, self.config.subscriber_buffer_size)
+        self.subscriptions.setdefault(topic, set()).add(subscription)
+        self.stats.subscribers += 1
+        try:
+            yield subscription
+        finally:
+            self._unsubscribe(subscription)
+
+    def get_stats(self) -> BrokerStats:
+        return BrokerStats(**self.stats.__dict__)
+
+    async def close(self) -> None:
+        self.listener.cancel()
+        await asyncio.gather(self.listener, return_exceptions=True)
+        for subscriptions in list(self.subscriptions.values()):
+            for subscription in list(subscriptions):
+                subscription.drop()
+        await self.pubsub.aclose()
+        await self.redis.aclose()
+        self.config.logger.info('Redis broker: close')
+
+    def _dispatch(self, topic: str, message: bytes) -> None:
+        self.stats.received += 1
+        for subscription in list(self.subscriptions.get(topic, ())):
+            if subscription.push(message):
+                self.stats.delivered += 1
+            else:
+                self.stats.dropped += 1
+                subscription.drop()
+                self._unsubscribe(subscription)
+                self.config.logger.debug(f'Dropped slow subscriber of topic: {topic}')
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self.subscriptions.get(subscription.topic)
+        if not subscriptions or subscription not in subscriptions:
+            return
+        subscriptions.discard(subscription)
+        self.stats.subscribers -= 1
+        if not subscriptions:
+            del self.subscriptions[subscription.topic]
+
+    async def _listen(self) -> None:
+        prefix_length = len(self.config.channel_prefix)
+        while True:
+            try:
+                async for message in self.pubsub.listen():
+                    topic = message['channel'].decode()[prefix_length:]
+                    self._dispatch(topic, message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.config.logger.warning(e, exc_info=True)
+                await asyncio.sleep(1)
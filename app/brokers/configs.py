@@ -0,0 +1,17 @@
+import logging
+
+from pydantic import BaseModel
+
+
+class BaseBrokerConfig(BaseModel):
+    logger: logging.Logger
+    subscriber_buffer_size: int = 64
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class RedisBrokerConfig(BaseBrokerConfig):
+    redis_host: str
+    redis_port: int
+    channel_prefix: str = 'events: '
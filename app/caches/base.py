@@ -1,38 +1,388 @@
+import asyncio
+import math
+import random
+import time as clock
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from datetime import timedelta
-from typing import Generic, Optional, Self, TypeVar
+from typing import (Any, Awaitable, Callable, Generic, Mapping, Optional,
+                    Self, TypeVar)
+from uuid import uuid4
 
+import msgspec
 from redis import asyncio as aioredis
 
-from app.caches.configs import BaseTTLCacheConfig, RedisConfig
+from app.caches.codecs import CacheCodecError, CacheEntry
+from app.caches.configs import BaseTTLCacheConfig, RedisConfig, TwoTierConfig
 from app.types import Seconds
+from app.utils.single_flight import SingleFlight
 
 CacheConfig = TypeVar('CacheConfig', bound=BaseTTLCacheConfig)
+ResultType = TypeVar('ResultType')
+
+
+@dataclass
+class CacheTierStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def miss_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.misses / lookups if lookups else 0.0
+
+
+@dataclass
+class CacheRefreshStats:
+    stale_serves: int = 0
+    early_refreshes: int = 0
+    background_refreshes: int = 0
+    failed_refreshes: int = 0
+
+
+DOCUMENT_HEAD = ''
+DOCUMENT_VERSION = '#version'
+# with ARGV[1] set the key is deleted instead unless field ARGV[1] holds ARGV[2]
+PATCH_FIELDS_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 0 then
+    return 0
+end
+if ARGV[1] ~= '' and redis.call('hget', KEYS[1], ARGV[1]) ~= ARGV[2] then
+    redis.call('del', KEYS[1])
+    return 0
+end
+for i = 3, #ARGV, 2 do
+    if ARGV[i + 1] == '' then
+        redis.call('hdel', KEYS[1], ARGV[i])
+    else
+        redis.call('hset', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+end
+return 1
+"""
+# sets KEYS[1] only if it holds ARGV[1]; publishes ARGV[5] to ARGV[4] then
+COMPARE_AND_SET_SCRIPT = """
+local current = redis.call('get', KEYS[1])
+if current == ARGV[1] then
+    redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    if ARGV[4] ~= '' then
+        redis.call('publish', ARGV[4], ARGV[5])
+    end
+end
+return current
+"""
+# sets KEYS[1] to ARGV[1] unless it holds a greater number; publishes as above
+SET_VERSION_SCRIPT = """
+local current = tonumber(redis.call('get', KEYS[1]))
+if current == nil or current < tonumber(ARGV[1]) then
+    redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    if ARGV[3] ~= '' then
+        redis.call('publish', ARGV[3], ARGV[4])
+    end
+end
+"""
+
+
+def _to_seconds(time: Seconds | timedelta) -> float:
+    return time.total_seconds() if isinstance(time, timedelta) else time
+
+
+def _soft_expires_at(soft_time: Optional[Seconds | timedelta]) -> float | None:
+    return clock.time() + _to_seconds(soft_time) if soft_time else None
+
+
+async def _timed(
+    build: Callable[[], Awaitable[ResultType]]
+) -> tuple[ResultType, float]:
+    build_start = clock.monotonic()
+    built_value = await build()
+    return built_value, clock.monotonic() - build_start
+
+
+def _assemble_document(
+    head: dict[str, Any], list_field: str, fragments: Mapping[str, Any]
+) -> dict[str, Any]:
+    return {**head, list_field: [fragments[name] for name in sorted(fragments)]}
+
+
+def _assemble_document_json(
+    head: bytes, list_field: str, fragments: Mapping[str, bytes]
+) -> bytes:
+    # splices JSON fragments into the JSON head without decoding either
+    separator = b'' if head == b'{}' else b','
+    return b''.join((
+        head[:-1], separator, msgspec.json.encode(list_field), b':[',
+        b','.join(fragments[name] for name in sorted(fragments)), b']}'
+    ))
 
 
 @dataclass
 class BaseAsyncTTLCache(ABC, Generic[CacheConfig]):
     config: CacheConfig
+    single_flight: SingleFlight = field(default_factory=SingleFlight)
+    refresh_stats: CacheRefreshStats = field(default_factory=CacheRefreshStats)
+    refreshes: set[asyncio.Task] = field(default_factory=set)
 
     @abstractmethod
     async def connect(self) -> Self: ...
 
     @abstractmethod
     async def set(
-        self, key: str, value: str,  # noqa: WPS110
+        self, key: str, value: str | bytes,  # noqa: WPS110
         time: Optional[Seconds | timedelta] = None
     ) -> None: ...
 
     @abstractmethod
     async def get(self, key: str) -> str | None: ...
 
+    @abstractmethod
+    async def get_bytes(self, key: str) -> bytes | None: ...
+
     @abstractmethod
     async def del_key(self, key: str) -> None: ...
 
+    @abstractmethod
+    async def set_fields(
+        self, key: str, fields: Mapping[str, bytes],
+        time: Optional[Seconds | timedelta] = None
+    ) -> None: ...
+
+    @abstractmethod
+    async def get_fields(self, key: str) -> dict[str, bytes] | None: ...
+
+    # atomic; returns False if the key is missing. Given `expected` as a field
+    # name and value, a key whose field holds anything else is deleted instead
+    @abstractmethod
+    async def patch_fields(
+        self, key: str, fields: Mapping[str, bytes | None],
+        expected: tuple[str, bytes] | None = None
+    ) -> bool: ...
+
+    # atomic; returns the value held before the call (the write happened if
+    # it equals `expected`) or None if the key is missing or unreachable
+    @abstractmethod
+    async def compare_and_set(
+        self, key: str, expected: bytes, value: bytes,  # noqa: WPS110
+        time: Optional[Seconds | timedelta] = None
+    ) -> bytes | None: ...
+
+    # atomic; keeps the greater of the cached and the given version, so a
+    # version read before a write cannot replace one stored after it
+    @abstractmethod
+    async def set_version(
+        self, key: str, version: int,
+        time: Optional[Seconds | timedelta] = None
+    ) -> None: ...
+
+    @abstractmethod
+    def get_stats(self) -> dict[str, CacheTierStats]: ...
+
     @abstractmethod
     async def close(self) -> None: ...
 
+    async def set_object(
+        self, key: str, value: Any,  # noqa: WPS110
+        time: Optional[Seconds | timedelta] = None
+    ) -> None:
+        await self.set(key, self.config.codec.encode(value), time)
+
+    async def get_object(self, key: str) -> Any | None:
+        cached_value = await self.get_bytes(key)
+        if not cached_value:
+            return None
+        try:
+            return self.config.codec.decode(cached_value)
+        except CacheCodecError as e:
+            self.config.logger.warning(e, exc_info=True)
+
+    async def get_json(self, key: str) -> bytes | None:
+        cached_value = await self.get_bytes(key)
+        if not cached_value:
+            return None
+        try:
+            return self.config.codec.decode_json(cached_value)
+        except CacheCodecError as e:
+            self.config.logger.warning(e, exc_info=True)
+
+    async def get_json_entry(self, key: str) -> CacheEntry | None:
+        cached_value = await self.get_bytes(key)
+        if not cached_value:
+            return None
+        try:
+            return self.config.codec.decode_json_entry(cached_value)
+        except CacheCodecError as e:
+            self.config.logger.warning(e, exc_info=True)
+
+    async def get_or_build_json(
+        self, key: str, build: Callable[[], Awaitable[Any]],
+        time: Optional[Seconds | timedelta] = None,
+        soft_time: Optional[Seconds | timedelta] = None
+    ) -> bytes:
+        # past soft_time the stale value is served while it is rebuilt in the
+        # background; time is the hard expiry of the key itself
+        async def store() -> CacheEntry:
+            built_value, build_time = await _timed(build)
+            await self.set(
+                key,
+                self.config.codec.encode(
+                    built_value, _soft_expires_at(soft_time), build_time
+                ),
+                time
+            )
+            return CacheEntry(msgspec.json.encode(built_value))
+
+        entry = await self._get_or_build(key, lambda: self.get_json_entry(key), store)
+        return entry.payload
+
+    async def get_or_build_document_json(
+        self, key: str, list_field: str,
+        build: Callable[[], Awaitable[tuple[dict[str, Any], dict[str, Any], int]]],
+        time: Optional[Seconds | timedelta] = None,
+        soft_time: Optional[Seconds | timedelta] = None
+    ) -> tuple[bytes, int]:
+        # build returns the document without list_field, the elements of
+        # list_field by fragment name and the version they were read at; each
+        # fragment is stored in its own hash field so patch_document can
+        # replace it alone. The document is returned with its version
+        async def store() -> CacheEntry:
+            (head, fragments, version), build_time = await _timed(build)
+            codec = self.config.codec
+            await self.set_fields(
+                key,
+                {
+                    DOCUMENT_HEAD: codec.encode(
+                        head, _soft_expires_at(soft_time), build_time
+                    ),
+                    DOCUMENT_VERSION: str(version).encode(),
+                    **{
+                        name: codec.encode(fragment)
+                        for name, fragment in fragments.items()
+                    }
+                },
+                time
+            )
+            return CacheEntry(
+                msgspec.json.encode(_assemble_document(head, list_field, fragments)),
+                version=version
+            )
+
+        entry = await self._get_or_build(
+            key, lambda: self.get_document_entry(key, list_field), store
+        )
+        return entry.payload, entry.version  # type: ignore
+
+    async def get_document_entry(self, key: str, list_field: str) -> CacheEntry | None:
+        fields = await self.get_fields(key)
+        if not fields or DOCUMENT_HEAD not in fields or DOCUMENT_VERSION not in fields:
+            return None
+        codec = self.config.codec
+        try:
+            entry = codec.decode_json_entry(fields.pop(DOCUMENT_HEAD))
+            version = int(fields.pop(DOCUMENT_VERSION))
+            fragments = {
+                name: codec.decode_json(fragment)
+                for name, fragment in fields.items()
+            }
+            if entry is None or None in fragments.values():
+                return None
+            entry.payload = _assemble_document_json(
+                entry.payload, list_field, fragments
+            )
+            entry.version = version
+        except (CacheCodecError, msgspec.DecodeError, ValueError) as e:
+            self.config.logger.warning(e, exc_info=True)
+            return None
+        return entry
+
+    async def patch_document(
+        self, key: str, fragments: Mapping[str, Any], version: int
+    ) -> bool:
+        # a None fragment is removed; returns False if the document is not cached.
+        # The patch applies only on top of version - 1: a document that missed
+        # a patch or was built past it is deleted to be built again
+        codec = self.config.codec
+        return await self.patch_fields(
+            key,
+            {
+                DOCUMENT_VERSION: str(version).encode(),
+                **{
+                    name: None if fragment is None else codec.encode(fragment)
+                    for name, fragment in fragments.items()
+                }
+            },
+            expected=(DOCUMENT_VERSION, str(version - 1).encode())
+        )
+
+    def get_refresh_stats(self) -> CacheRefreshStats:
+        return CacheRefreshStats(**self.refresh_stats.__dict__)
+
+    async def _get_or_build(
+        self, key: str, load: Callable[[], Awaitable[CacheEntry | None]],
+        store: Callable[[], Awaitable[CacheEntry]]
+    ) -> CacheEntry:
+        async def rebuild() -> CacheEntry:
+            return await self._rebuild(key, load, store)
+
+        async def build_missing() -> CacheEntry:
+            # the miss may predate a flight that has just stored the value
+            entry = await load()
+            if entry is not None:
+                return entry
+            return await rebuild()
+
+        entry = await load()
+        if entry is None:
+            return await self.single_flight.run(key, build_missing)
+        if self._should_refresh(entry) and key not in self.single_flight.calls:
+            self._refresh_in_background(key, rebuild)
+        return entry
+
+    async def _rebuild(
+        self, key: str, load: Callable[[], Awaitable[CacheEntry | None]],
+        store: Callable[[], Awaitable[CacheEntry]]
+    ) -> CacheEntry:
+        return await store()
+
+    def _should_refresh(self, entry: CacheEntry) -> bool:
+        if entry.soft_expires_at is None:
+            return False
+        now = clock.time()
+        if now >= entry.soft_expires_at:
+            self.refresh_stats.stale_serves += 1
+            return True
+        # XFetch: refresh early with a probability growing towards the soft
+        # expiry, scaled by how long the value took to build
+        early_by = -entry.build_time * self.config.early_refresh_beta * math.log(
+            1 - random.random()  # noqa: S311
+        )
+        if now + early_by >= entry.soft_expires_at:
+            self.refresh_stats.early_refreshes += 1
+            return True
+        return False
+
+    def _refresh_in_background(
+        self, key: str, rebuild: Callable[[], Awaitable[CacheEntry]]
+    ) -> None:
+        self.refresh_stats.background_refreshes += 1
+        refresh = asyncio.ensure_future(self.single_flight.run(key, rebuild))
+        self.refreshes.add(refresh)
+        refresh.add_done_callback(self._on_refresh_done)
+
+    def _on_refresh_done(self, refresh: asyncio.Task) -> None:
+        self.refreshes.discard(refresh)
+        if refresh.cancelled():
+            return
+        error = refresh.exception()
+        if error is not None:
+            self.refresh_stats.failed_refreshes += 1
+            self.config.logger.warning(error, exc_info=error)
+
 
 @dataclass
 class RedisAsyncCache(BaseAsyncTTLCache[RedisConfig]):
@@ -42,11 +392,17 @@ class RedisAsyncCache(BaseAsyncTTLCache[RedisConfig]):
             host=self.config.redis_host,
             port=self.config.redis_port
         )
+        self.redis_stats = CacheTierStats()
+        self.patch_fields_script = self.redis.register_script(PATCH_FIELDS_SCRIPT)
+        self.compare_and_set_script = self.redis.register_script(
+            COMPARE_AND_SET_SCRIPT
+        )
+        self.set_version_script = self.redis.register_script(SET_VERSION_SCRIPT)
         self.config.logger.info('Redis: connect')
         return self
 
     async def set(
-        self, key: str, value: str,  # noqa: WPS110
+        self, key: str, value: str | bytes,  # noqa: WPS110
         time: Optional[Seconds | timedelta] = None
     ) -> None:
         try:
@@ -60,12 +416,21 @@ class RedisAsyncCache(BaseAsyncTTLCache[RedisConfig]):
             self.config.logger.warning(e, exc_info=True)
 
     async def get(self, key: str) -> str | None:
+        cached_value = await self.get_bytes(key)
+        return cached_value.decode() if cached_value else None
+
+    async def get_bytes(self, key: str) -> bytes | None:
         try:
             cached_value = await self.redis.get(name=key)
             self.config.logger.debug(f'Get value by key: {key}')
-            return cached_value.decode() if cached_value else None
         except Exception as e:
             self.config.logger.warning(e, exc_info=True)
+            return None
+        if cached_value is None:
+            self.redis_stats.misses += 1
+        else:
+            self.redis_stats.hits += 1
+        return cached_value
 
     async def del_key(self, key: str) -> None:
         try:
@@ -74,6 +439,297 @@ class RedisAsyncCache(BaseAsyncTTLCache[RedisConfig]):
         except Exception as e:
             self.config.logger.warning(e, exc_info=True)
 
+    async def set_fields(
+        self, key: str, fields: Mapping[str, bytes],
+        time: Optional[Seconds | timedelta] = None
+    ) -> None:
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                pipe.hset(key, mapping=fields)  # type: ignore
+                pipe.expire(key, time if time else self.config.default_cache_lifetime)
+                await pipe.execute()
+            self.config.logger.debug(f'Set cache fields with key: {key}')
+        except Exception as e:
+            self.config.logger.warning(e, exc_info=True)
+
+    async def get_fields(self, key: str) -> dict[str, bytes] | None:
+        try:
+            fields = await self.redis.hgetall(key)  # type: ignore
+            self.config.logger.debug(f'Get fields by key: {key}')
+        except Exception as e:
+            self.config.logger.warning(e, exc_info=True)
+            return None
+        if not fields:
+            self.redis_stats.misses += 1
+            return None
+        self.redis_stats.hits += 1
+        return {name.decode(): field_value for name, field_value in fields.items()}
+
+    async def patch_fields(
+        self, key: str, fields: Mapping[str, bytes | None],
+        expected: tuple[str, bytes] | None = None
+    ) -> bool:
+        patch = [
+            patch_value
+            for name, field_value in fields.items()
+            for patch_value in (name, field_value or b'')
+        ]
+        try:
+            is_patched = await self.patch_fields_script(
+                keys=[key], args=[*(expected or ('', b'')), *patch]
+            )
+            self.config.logger.debug(f'Patched cache fields with key: {key}')
+        except Exception as e:
+            self.config.logger.warning(e, exc_info=True)
+            await self.del_key(key)
+            return False
+        return bool(is_patched)
+
+    async def compare_and_set(
+        self, key: str, expected: bytes, value: bytes,  # noqa: WPS110
+        time: Optional[Seconds | timedelta] = None
+    ) -> bytes | None:
+        lifetime = _to_seconds(time if time else self.config.default_cache_lifetime)
+        try:
+            current_value = await self.compare_and_set_script(
+                keys=[key],
+                args=[
+                    expected, value, math.ceil(lifetime),
+                    *self._get_invalidation(key)
+                ]
+            )
+            self.config.logger.debug(f'Compare and set cache key: {key}')
+        except Exception as e:
+            self.config.logger.warning(e, exc_info=True)
+            return None
+        return current_value
+
+    async def set_version(
+        self, key: str, version: int,
+        time: Optional[Seconds | timedelta] = None
+    ) -> None:
+        lifetime = _to_seconds(time if time else self.config.default_cache_lifetime)
+        try:
+            await self.set_version_script(
+                keys=[key],
+                args=[version, math.ceil(lifetime), *self._get_invalidation(key)]
+            )
+            self.config.logger.debug(f'Set version with key: {key}')
+        except Exception as e:
+            self.config.logger.warning(e, exc_info=True)
+
+    def get_stats(self) -> dict[str, CacheTierStats]:
+        return {'redis': CacheTierStats(**self.redis_stats.__dict__)}
+
+    async def _rebuild(
+        self, key: str, load: Callable[[], Awaitable[CacheEntry | None]],
+        store: Callable[[], Awaitable[CacheEntry]]
+    ) -> CacheEntry:
+        if self.config.rebuild_lock_lease is None:
+            return await store()
+
+        lock = self.redis.lock(
+            f'lock: {key}', timeout=_to_seconds(self.config.rebuild_lock_lease)
+        )
+        try:
+            is_locked = await lock.acquire(blocking=False)
+        except Exception as e:
+            self.config.logger.warning(e, exc_info=True)
+            return await store()
+
+        if not is_locked:
+            entry = await self._wait_for_rebuild(load)
+            if entry is not None:
+                return entry
+            return await store()
+
+        try:
+            return await store()
+        finally:
+            try:
+                await lock.release()
+            except Exception as e:
+                self.config.logger.warning(e, exc_info=True)
+
+    def _get_invalidation(self, key: str) -> tuple[str, str]:
+        # channel and message published when a script changes the key
+        return '', ''
+
+    async def _wait_for_rebuild(
+        self, load: Callable[[], Awaitable[CacheEntry | None]]
+    ) -> CacheEntry | None:
+        # another process holds the lease; wait for its value until it lapses
+        loop = asyncio.get_running_loop()
+        lease = self.config.rebuild_lock_lease
+        deadline = loop.time() + _to_seconds(lease)  # type: ignore
+        while loop.time() < deadline:
+            await asyncio.sleep(self.config.rebuild_lock_poll_interval)
+            entry = await load()
+            if entry is not None:
+                return entry
+        return None
+
     async def close(self) -> None:
+        await asyncio.gather(*self.refreshes, return_exceptions=True)
         await self.redis.aclose()
         self.config.logger.info('Redis: close')
+
+
+@dataclass
+class TwoTierAsyncCache(RedisAsyncCache):
+    config: TwoTierConfig  # type: ignore
+    node_id: str = field(default_factory=lambda: uuid4().hex)
+
+    async def connect(self) -> Self:
+        await super().connect()
+        # values are raw bytes or, for hashes, a dict of raw fields
+        self.local: OrderedDict[
+            str, tuple[float, bytes | dict[str, bytes]]
+        ] = OrderedDict()
+        self.local_stats = CacheTierStats()
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await self.pubsub.subscribe(self.config.invalidation_channel)
+        self.listener = asyncio.create_task(self._listen_invalidations())
+        return self
+
+    async def set(
+        self, key: str, value: str | bytes,  # noqa: WPS110
+        time: Optional[Seconds | timedelta] = None
+    ) -> None:
+        await super().set(key, value, time)
+        await self._publish_invalidation(key)
+        self._set_local(
+            key, value.encode() if isinstance(value, str) else value, time
+        )
+
+    async def get_bytes(self, key: str) -> bytes | None:
+        cached_value = self._get_local(key)
+        if isinstance(cached_value, bytes):
+            self.local_stats.hits += 1
+            return cached_value
+        self.local_stats.misses += 1
+
+        cached_value = await super().get_bytes(key)
+        if cached_value is not None:
+            self._set_local(key, cached_value)
+        return cached_value
+
+    async def del_key(self, key: str) -> None:
+        self.local.pop(key, None)
+        await super().del_key(key)
+        await self._publish_invalidation(key)
+
+    async def set_fields(
+        self, key: str, fields: Mapping[str, bytes],
+        time: Optional[Seconds | timedelta] = None
+    ) -> None:
+        await super().set_fields(key, fields, time)
+        await self._publish_invalidation(key)
+        self._set_local(key, dict(fields), time)
+
+    async def get_fields(self, key: str) -> dict[str, bytes] | None:
+        local_fields = self._get_local(key)
+        if isinstance(local_fields, dict):
+            self.local_stats.hits += 1
+            return dict(local_fields)
+        self.local_stats.misses += 1
+
+        fields = await super().get_fields(key)
+        if fields is not None:
+            self._set_local(key, dict(fields))
+        return fields
+
+    async def patch_fields(
+        self, key: str, fields: Mapping[str, bytes | None],
+        expected: tuple[str, bytes] | None = None
+    ) -> bool:
+        local_fields = self._get_local(key)
+        is_patched = await super().patch_fields(key, fields, expected)
+        await self._publish_invalidation(key)
+        if not is_patched or not isinstance(local_fields, dict):
+            self.local.pop(key, None)
+            return is_patched
+
+        for name, field_value in fields.items():
+            if field_value is None:
+                local_fields.pop(name, None)
+            else:
+                local_fields[name] = field_value
+        return is_patched
+
+    async def compare_and_set(
+        self, key: str, expected: bytes, value: bytes,  # noqa: WPS110
+        time: Optional[Seconds | timedelta] = None
+    ) -> bytes | None:
+        self.local.pop(key, None)
+        return await super().compare_and_set(key, expected, value, time)
+
+    async def set_version(
+        self, key: str, version: int,
+        time: Optional[Seconds | timedelta] = None
+    ) -> None:
+        self.local.pop(key, None)
+        await super().set_version(key, version, time)
+
+    def get_stats(self) -> dict[str, CacheTierStats]:
+        return {
+            'local': CacheTierStats(**self.local_stats.__dict__),
+            **super().get_stats()
+        }
+
+    async def close(self) -> None:
+        self.listener.cancel()
+        await asyncio.gather(self.listener, return_exceptions=True)
+        await self.pubsub.aclose()
+        await super().close()
+
+    def _get_local(self, key: str) -> bytes | dict[str, bytes] | None:
+        local_value = self.local.get(key)
+        if local_value is None:
+            return None
+        expires_at, cached_value = local_value
+        if expires_at <= clock.monotonic():
+            del self.local[key]
+            return None
+        self.local.move_to_end(key)
+        return cached_value
+
+    def _set_local(
+        self, key: str, value: bytes | dict[str, bytes],  # noqa: WPS110
+        time: Optional[Seconds | timedelta] = None
+    ) -> None:
+        lifetime = _to_seconds(self.config.local_cache_lifetime)
+        if time:
+            lifetime = min(lifetime, _to_seconds(time))
+        self.local[key] = (clock.monotonic() + lifetime, value)
+        self.local.move_to_end(key)
+        while len(self.local) > self.config.local_max_size:
+            self.local.popitem(last=False)
+
+    def _get_invalidation(self, key: str) -> tuple[str, str]:
+        return self.config.invalidation_channel, f'{self.node_id} {key}'
+
+    async def _publish_invalidation(self, key: str) -> None:
+        try:
+            await self.redis.publish(
+                self.config.invalidation_channel, f'{self.node_id} {key}'
+            )
+        except Exception as e:
+            self.config.logger.warning(e, exc_info=True)
+
+    async def _listen_invalidations(self) -> None:
+        while True:
+            try:
+                async for message in self.pubsub.listen():
+                    node_id, key = message['data'].decode().split(' ', 1)
+                    if node_id != self.node_id:
+                        self.local.pop(key, None)
+                        self.config.logger.debug(f'Invalidated local key: {key}')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # invalidations may have been lost while disconnected
+                self.config.logger.warning(e, exc_info=True)
+                self.local.clear()
+                await asyncio.sleep(1)
@@ -0,0 +1,128 @@
+import struct
+import zlib
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, ClassVar
+
+import msgspec
+
+
+class CacheCodecError(Exception): ...
+
+
+COMPRESSED_FLAG = 0b01
+SOFT_TTL_FLAG = 0b10
+SOFT_TTL_META = struct.Struct('>dd')
+
+
+@dataclass
+class CacheEntry:
+    payload: bytes
+    soft_expires_at: float | None = None
+    build_time: float = 0.0
+    # the version a document was built at or patched to
+    version: int | None = None
+
+
+@dataclass
+class BaseCacheCodec(ABC):
+    # header: version, format_id, flags[, soft expiry, build time]
+    # a version or format mismatch reads as a miss
+    format_id: ClassVar[int]
+
+    version: int = 1
+    compress_min_size: int | None = None
+    compress_level: int = 6
+
+    def encode(
+        self, value: Any,  # noqa: WPS110
+        soft_expires_at: float | None = None, build_time: float = 0.0
+    ) -> bytes:
+        payload = self.serialize(value)
+        flags = 0
+        min_size = self.compress_min_size
+        if min_size is not None and len(payload) >= min_size:
+            payload = zlib.compress(payload, self.compress_level)
+            flags |= COMPRESSED_FLAG
+        meta = b''
+        if soft_expires_at is not None:
+            meta = SOFT_TTL_META.pack(soft_expires_at, build_time)
+            flags |= SOFT_TTL_FLAG
+        return bytes((self.version, self.format_id, flags)) + meta + payload
+
+    def decode(self, data: bytes) -> Any | None:
+        entry = self.unpack(data)
+        if entry is None:
+            return None
+        try:
+            return self.deserialize(entry.payload)
+        except msgspec.DecodeError as e:
+            raise CacheCodecError from e
+
+    def decode_json(self, data: bytes) -> bytes | None:
+        entry = self.decode_json_entry(data)
+        return None if entry is None else entry.payload
+
+    def decode_json_entry(self, data: bytes) -> CacheEntry | None:
+        entry = self.unpack(data)
+        if entry is None:
+            return None
+        try:
+            entry.payload = self.payload_to_json(entry.payload)
+        except msgspec.DecodeError as e:
+            raise CacheCodecError from e
+        return entry
+
+    def unpack(self, data: bytes) -> CacheEntry | None:
+        if len(data) < 3 or data[0] != self.version or data[1] != self.format_id:
+            return None
+        flags, payload = data[2], data[3:]
+        entry = CacheEntry(payload)
+        try:
+            if flags & SOFT_TTL_FLAG:
+                meta = SOFT_TTL_META.unpack_from(payload)
+                entry.soft_expires_at, entry.build_time = meta
+                payload = payload[SOFT_TTL_META.size:]
+            if flags & COMPRESSED_FLAG:
+                payload = zlib.decompress(payload)
+            entry.payload = payload
+        except (struct.error, zlib.error) as e:
+            raise CacheCodecError from e
+        return entry
+
+    @abstractmethod
+    def serialize(self, value: Any) -> bytes: ...  # noqa: WPS110
+
+    @abstractmethod
+    def deserialize(self, payload: bytes) -> Any: ...
+
+    @abstractmethod
+    def payload_to_json(self, payload: bytes) -> bytes: ...
+
+
+@dataclass
+class JSONCacheCodec(BaseCacheCodec):
+    format_id: ClassVar[int] = 1
+
+    def serialize(self, value: Any) -> bytes:  # noqa: WPS110
+        return msgspec.json.encode(value)
+
+    def deserialize(self, payload: bytes) -> Any:
+        return msgspec.json.decode(payload)
+
+    def payload_to_json(self, payload: bytes) -> bytes:
+        return payload
+
+
+@dataclass
+class MsgPackCacheCodec(BaseCacheCodec):
+    format_id: ClassVar[int] = 2
+
+    def serialize(self, value: Any) -> bytes:  # noqa: WPS110
+        return msgspec.msgpack.encode(value)
+
+    def deserialize(self, payload: bytes) -> Any:
+        return msgspec.msgpack.decode(payload)
+
+    def payload_to_json(self, payload: bytes) -> bytes:
+        return msgspec.json.encode(msgspec.msgpack.decode(payload))
@@ -1,14 +1,17 @@
 import logging
 from datetime import timedelta
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
+from app.caches.codecs import BaseCacheCodec, JSONCacheCodec
 from app.types import Seconds
 
 
 class BaseTTLCacheConfig(BaseModel):
     logger: logging.Logger
     default_cache_lifetime: Seconds | timedelta = 60
+    codec: BaseCacheCodec = Field(default_factory=JSONCacheCodec)
+    early_refresh_beta: float = 1.0
 
     class Config:
         arbitrary_types_allowed = True
@@ -17,3 +20,11 @@ class BaseTTLCacheConfig(BaseModel):
 class RedisConfig(BaseTTLCacheConfig):
     redis_host: str
     redis_port: int
+    rebuild_lock_lease: Seconds | timedelta | None = None
+    rebuild_lock_poll_interval: float = 0.05
+
+
+class TwoTierConfig(RedisConfig):
+    local_max_size: int = 1024
+    local_cache_lifetime: Seconds | timedelta = 5
+    invalidation_channel: str = 'cache-invalidation'
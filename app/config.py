@@ -1,5 +1,6 @@
 # flake8-in-file-ignores: noqa: WPS201
 
+import json
 import logging
 import os
 from dataclasses import dataclass, field
@@ -15,18 +16,27 @@ from litestar.logging import LoggingConfig
 from litestar.openapi import OpenAPIConfig
 from litestar.openapi.plugins import SwaggerRenderPlugin
 
-from app.caches.base import RedisAsyncCache
-from app.caches.configs import RedisConfig
+from app.brokers.base import RedisAsyncBroker
+from app.brokers.configs import RedisBrokerConfig
+from app.caches.base import TwoTierAsyncCache
+from app.caches.codecs import JSONCacheCodec
+from app.caches.configs import TwoTierConfig
 from app.db.sqlalchemy.base import AsyncSQLAlchemyDB
 from app.db.sqlalchemy.config import SQLAlchemyDBConfig
 from app.db.wow_api.base import WoWHeadAPI
 from app.db.wow_api.configs import WoWHeadAPIConfig
+from app.hashers.base import PasslibAsyncHasher
+from app.hashers.configs import PasslibConfig
 from app.mailers.base import AsyncSMTPMailer
 from app.mailers.configs import SMTPConfig
+from app.mailers.outbox import MailOutbox
+from app.mailers.templates import EmailTemplate, EmailTemplates, text_to_html
 from app.task_managers.base import KapustaTaskManager
 from app.task_managers.configs import KapustaConfig
 from app.tokens.base import JWToken
 from app.tokens.configs import JWTokenConfig
+from app.tokens.families import RefreshTokenFamilies
+from app.types import Seconds
 
 SERVICE_NAME = 'LootX'
 VERSION = '0.0.0'
@@ -95,20 +105,36 @@ DataBaseConfig = SQLAlchemyDBConfig(
     session_maker_kwargs={'expire_on_commit': False}
 )
 
-Cache = RedisAsyncCache
-CacheConfig = RedisConfig(
+Cache = TwoTierAsyncCache
+CacheConfig = TwoTierConfig(
     logger=logging.getLogger('redis'),
     redis_host=os.getenv('REDIS_HOST'),  # type: ignore
-    redis_port=int(os.getenv('REDIS_PORT'))  # type: ignore
+    redis_port=int(os.getenv('REDIS_PORT')),  # type: ignore
+    codec=JSONCacheCodec(compress_min_size=4096),
+    rebuild_lock_lease=5
 )
 
 
 @dataclass(frozen=True)
 class CacheKeys:
     team_name: str = 'tn: {}'
+    team_name_lifetime: Seconds = 60
     full_team: str = 'ft: {}'
+    full_team_queue: str = 'q: {:010d}'
+    full_team_lifetime: Seconds = 600
+    full_team_soft_lifetime: Seconds = 60
+    team_version: str = 'tv: {}'
+    team_version_lifetime: Seconds = 600
 
 
+Broker = RedisAsyncBroker
+BrokerConfig = RedisBrokerConfig(
+    logger=logging.getLogger('broker'),
+    redis_host=os.getenv('REDIS_HOST'),  # type: ignore
+    redis_port=int(os.getenv('REDIS_PORT')),  # type: ignore
+    channel_prefix='queue-events: '
+)
+
 Mailer = AsyncSMTPMailer
 MailerConfig = SMTPConfig(
     logger=logging.getLogger('smtp'),
@@ -118,6 +144,7 @@ MailerConfig = SMTPConfig(
     smtp_password=os.getenv('EMAIL_PASSWORD'),  # type: ignore
     smtp_port=int(os.getenv('SMTP_PORT'))  # type: ignore
 )
+Outbox = MailOutbox
 
 Token = JWToken
 TokenConfigType = JWTokenConfig
@@ -125,9 +152,15 @@ TokenConfig = TokenConfigType(
     logger=logging.getLogger('tokens'),
     alg=os.getenv('JWT_ALGORITHM'),  # type: ignore
     typ='JWT',
-    key=os.getenv('JWT_KEY'),  # type: ignore
+    key=os.getenv('JWT_KEY'),
+    keys=(
+        json.loads(Path(os.environ['JWT_KEYS_FILE']).read_text(encoding='utf-8'))
+        if os.getenv('JWT_KEYS_FILE') else []
+    )
 )
 
+TokenFamilies = RefreshTokenFamilies
+
 TaskManager = KapustaTaskManager
 TaskManagerConfig = KapustaConfig(
     logger=logging.getLogger('kapusta'),
@@ -145,6 +178,15 @@ WoWAPIConfig = WoWHeadAPIConfig(
     icon_url='https://wow.zamimg.com/images/wow/icons/large/{icon}.jpg'
 )
 
+Hasher = PasslibAsyncHasher
+HasherConfig = PasslibConfig(
+    logger=logging.getLogger('hasher'),
+    schemes=['bcrypt'],
+    executor='thread',
+    max_workers=4,
+    max_concurrency=4
+)
+
 
 @dataclass(frozen=True)
 class BaseConfig:
@@ -162,6 +204,7 @@ class AuthConfig(BaseConfig):
     registration_token_exp: timedelta = timedelta(minutes=5)
     access_token_exp: timedelta = timedelta(hours=1)
     refresh_token_exp: timedelta = timedelta(weeks=5)
+    verified_access_tokens_max_size: int = 10000
 
     del_inactive_user_after: timedelta = timedelta(minutes=5)
 
@@ -193,12 +236,12 @@ class RaiderConfig(BaseConfig):
 
 @dataclass(frozen=True)
 class ItemConfig(BaseConfig):
-    ...
+    placeholder_backfill_interval: Seconds = 60
 
 
 @dataclass(frozen=True)
 class QueueConfig(BaseConfig):
-    ...
+    stream_keepalive: Seconds = 15
 
 
 @dataclass(frozen=True)
@@ -211,6 +254,11 @@ class CoreConfig(BaseConfig):
     ...
 
 
+@dataclass(frozen=True)
+class StatsConfig(BaseConfig):
+    log_interval: Seconds = 60
+
+
 EMAIL_REGISTRATION_SUBJECT = MappingProxyType({
     Language.en: 'LootX: Registration',
     Language.ru: 'LootX: Регистрация',
@@ -226,45 +274,45 @@ EMAIL_REGISTRATION_SUBJECT = MappingProxyType({
 EMAIL_REGISTRATION_BODY = MappingProxyType({
     Language.en: (
         'To confirm your registration, visit '
-        'http://localhost:8000/auth/verify-email/{}\n'
+        'http://localhost:8000/auth/verify-email/{token}\n'
         'Use the link within 5 minutes. Do not share it with anyone.'
     ),
     Language.ru: (
         'Для подтверждения регистрации перейдите по ссылке '
-        'http://localhost:8000/auth/verify-email/{}\n'
+        'http://localhost:8000/auth/verify-email/{token}\n'
         'Перейдите по ссылке в течении 5 минут. Никому не передавайте её.'
     ),
     Language.de: (
         'Um Ihre Registrierung zu bestätigen, besuchen Sie '
-        'http://localhost:8000/auth/verify-email/{}\n'
+        'http://localhost:8000/auth/verify-email/{token}\n'
         'Nutzen Sie den Link innerhalb von 5 Minuten. Geben Sie ihn niemandem weiter.'
     ),
     Language.es: (
         'Para confirmar su registro, visite '
-        'http://localhost:8000/auth/verify-email/{}\n'
+        'http://localhost:8000/auth/verify-email/{token}\n'
         'Use el enlace en 5 minutos. No lo comparta con nadie.'
     ),
     Language.fr: (
         'Pour confirmer votre inscription, visitez '
-        'http://localhost:8000/auth/verify-email/{}\n'
+        'http://localhost:8000/auth/verify-email/{token}\n'
         'Utilisez le lien dans les 5 minutes. Ne le partagez avec personne.'
     ),
     Language.it: (
         'Per confermare la registrazione, visita '
-        'http://localhost:8000/auth/verify-email/{}\n'
+        'http://localhost:8000/auth/verify-email/{token}\n'
         'Usa il link entro 5 minuti. Non condividerlo con nessuno.'
     ),
     Language.pt: (
         'Para confirmar seu registro, visite '
-        'http://localhost:8000/auth/verify-email/{}\n'
+        'http://localhost:8000/auth/verify-email/{token}\n'
         'Use o link em 5 minutos. Não o compartilhe com ninguém.'
     ),
     Language.ko: (
-        '등록을 확인하려면 http://localhost:8000/auth/verify-email/{} 에 방문하세요.\n'
+        '등록을 확인하려면 http://localhost:8000/auth/verify-email/{token} 에 방문하세요.\n'
         '5분 이내에 링크를 사용하세요. 다른 사람과 공유하지 마세요.'
     ),
     Language.cn: (
-        '要确认您的注册，请访问 http://localhost:8000/auth/verify-email/{}\n'
+        '要确认您的注册，请访问 http://localhost:8000/auth/verify-email/{token}\n'
         '请在 5 分钟内使用该链接。请勿与他人分享。'
     ),
 })
@@ -284,47 +332,47 @@ EMAIL_CHANGE_PASSWORD_SUBJECT = MappingProxyType({
 EMAIL_CHANGE_PASSWORD_BODY = MappingProxyType({
     Language.en: (
         'To reset your password, visit '
-        'http://localhost:8000/user/change-password/{}\n'
+        'http://localhost:8000/user/change-password/{token}\n'
         'Use the link within 5 minutes.'
     ),
     Language.ru: (
         'Для смены пароля перейдите по ссылке '
-        'http://localhost:8000/user/change-password/{}\n'
+        'http://localhost:8000/user/change-password/{token}\n'
         'Перейдите по ссылке в течении 5 минут.'
     ),
     Language.de: (
         'Um Ihr Passwort zu ändern, besuchen Sie '
-        'http://localhost:8000/user/change-password/{}\n'
+        'http://localhost:8000/user/change-password/{token}\n'
         'Nutzen Sie den Link innerhalb von 5 Minuten.'
     ),
     Language.es: (
         'Para cambiar su contraseña, visite '
-        'http://localhost:8000/user/change-password/{}\n'
+        'http://localhost:8000/user/change-password/{token}\n'
         'Use el enlace en 5 minutos.'
     ),
     Language.fr: (
         'Pour changer votre mot de passe, visitez '
-        'http://localhost:8000/user/change-password/{}\n'
+        'http://localhost:8000/user/change-password/{token}\n'
         'Utilisez le lien dans les 5 minutes.'
     ),
     Language.it: (
         'Per cambiare la password, visita '
-        'http://localhost:8000/user/change-password/{}\n'
+        'http://localhost:8000/user/change-password/{token}\n'
         'Usa il link entro 5 minuti.'
     ),
     Language.pt: (
         'Para alterar sua senha, visite '
-        'http://localhost:8000/user/change-password/{}\n'
+        'http://localhost:8000/user/change-password/{token}\n'
         'Use o link em 5 minutos.'
     ),
     Language.ko: (
         '비밀번호를 변경하려면 '
-        'http://localhost:8000/user/change-password/{} 에 방문하세요.\n'
+        'http://localhost:8000/user/change-password/{token} 에 방문하세요.\n'
         '5분 이내에 링크를 사용하세요.'
     ),
     Language.cn: (
         '要更改您的密码，请访问 '
-        'http://localhost:8000/user/change-password/{}\n'
+        'http://localhost:8000/user/change-password/{token}\n'
         '请在 5 分钟内使用该链接。'
     ),
 })
@@ -344,47 +392,60 @@ EMAIL_DELETE_TEAM_SUBJECT = MappingProxyType({
 EMAIL_DELETE_TEAM_BODY = MappingProxyType({
     Language.en: (
         'To confirm team deletion, visit '
-        'http://localhost:8000/team/delete/{}\n'
+        'http://localhost:8000/team/delete/{token}\n'
         'Use the link within 5 minutes.'
     ),
     Language.ru: (
         'Для подтверждения удаления команды перейдите по ссылке '
-        'http://localhost:8000/team/delete/{}\n'
+        'http://localhost:8000/team/delete/{token}\n'
         'Перейдите по ссылке в течении 5 минут.'
     ),
     Language.de: (
         'Um das Löschen des Teams zu bestätigen, besuchen Sie '
-        'http://localhost:8000/team/delete/{}\n'
+        'http://localhost:8000/team/delete/{token}\n'
         'Nutzen Sie den Link innerhalb von 5 Minuten.'
     ),
     Language.es: (
         'Para confirmar la eliminación del equipo, visite '
-        'http://localhost:8000/team/delete/{}\n'
+        'http://localhost:8000/team/delete/{token}\n'
         'Use el enlace en 5 minutos.'
     ),
     Language.fr: (
         'Pour confirmer la suppression de l’équipe, visitez '
-        'http://localhost:8000/team/delete/{}\n'
+        'http://localhost:8000/team/delete/{token}\n'
         'Utilisez le lien dans les 5 minutes.'
     ),
     Language.it: (
         'Per confermare l’eliminazione della squadra, visita '
-        'http://localhost:8000/team/delete/{}\n'
+        'http://localhost:8000/team/delete/{token}\n'
         'Usa il link entro 5 minuti.'
     ),
     Language.pt: (
         'Para confirmar a exclusão da equipe, visite '
-        'http://localhost:8000/team/delete/{}\n'
+        'http://localhost:8000/team/delete/{token}\n'
         'Use o link em 5 minutos.'
     ),
     Language.ko: (
         '팀 삭제를 확인하려면 '
-        'http://localhost:8000/team/delete/{} 에 방문하세요.\n'
+        'http://localhost:8000/team/delete/{token} 에 방문하세요.\n'
         '5분 이내에 링크를 사용하세요.'
     ),
     Language.cn: (
         '要确认删除团队，请访问 '
-        'http://localhost:8000/team/delete/{}\n'
+        'http://localhost:8000/team/delete/{token}\n'
         '请在 5 分钟内使用该链接。'
     ),
 })
+
+EMAIL_TEMPLATES = EmailTemplates(default_lang=Language.en)
+for email_name, email_subject, email_body in (
+    ('registration', EMAIL_REGISTRATION_SUBJECT, EMAIL_REGISTRATION_BODY),
+    ('change_password', EMAIL_CHANGE_PASSWORD_SUBJECT, EMAIL_CHANGE_PASSWORD_BODY),
+    ('delete_team', EMAIL_DELETE_TEAM_SUBJECT, EMAIL_DELETE_TEAM_BODY)
+):
+    for email_lang in Language:
+        EMAIL_TEMPLATES.add(email_name, email_lang, EmailTemplate(
+            subject=email_subject[email_lang],
+            text=email_body[email_lang],
+            html=text_to_html(email_body[email_lang])
+        ))
@@ -1,16 +1,20 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from datetime import datetime
-from typing import Generic, Literal, Sequence, TypeVar
+from datetime import datetime, timedelta
+from typing import Generic, Literal, Mapping, Sequence, TypeVar
 
 from ulid import ULID
 
 from app.db.abc.configs import BaseDBConfig
-from app.db.abc.models import (LogProtocol, QueueProtocol, RaiderProtocol,
-                               TeamProtocol, UserProtocol, WoWItemProtocol)
+from app.db.abc.models import (LogProtocol, OutboxEmailProtocol,
+                               QueueProtocol, RaiderProtocol, TeamProtocol,
+                               UserProtocol, WoWItemProtocol)
 from app.db.enums import EnumAddons, EnumClasses, EnumLanguages
-from app.db.wow_api.base import BaseAsyncWoWAPI
-from app.types import RaiderId, Sentinel, TeamId, UserId, Username, WoWItemId
+from app.db.wow_api.base import BaseAsyncWoWAPI, WoWAPIItem
+from app.hashers.base import BaseAsyncHasher
+from app.mailers.base import Email
+from app.types import (LogId, OutboxEmailId, RaiderId, Sentinel, TeamId,
+                       UserId, Username, WoWItemId)
 
 DBConfig = TypeVar('DBConfig', bound=BaseDBConfig)
 
@@ -42,17 +46,21 @@ class BaseAsyncDB(ABC, Generic[DBConfig]):
     @abstractmethod
     async def get_user_email(self, id: UserId) -> str: ...
 
+    # outbox_email is stored in the same transaction as the user
     @abstractmethod
     async def create_user(
         self, username: str, password: str, email: str, is_active: bool,
-        id: UserId = Sentinel
+        hasher: BaseAsyncHasher, id: UserId = Sentinel,
+        outbox_email: Email | None = None
     ) -> UserProtocol: ...
 
     @abstractmethod
     async def del_user(self, id: UserId) -> None: ...
 
     @abstractmethod
-    async def change_user_password(self, id: UserId, new_password: str) -> None: ...
+    async def change_user_password(
+        self, id: UserId, new_password: str, hasher: BaseAsyncHasher
+    ) -> None: ...
 
     @abstractmethod
     async def is_user_username_email_unique(
@@ -61,7 +69,7 @@ class BaseAsyncDB(ABC, Generic[DBConfig]):
 
     @abstractmethod
     async def verify_username_password(
-        self, username: Username, password: str
+        self, username: Username, password: str, hasher: BaseAsyncHasher
     ) -> UserId: ...
 
     @abstractmethod
@@ -94,18 +102,21 @@ class BaseAsyncDB(ABC, Generic[DBConfig]):
     @abstractmethod
     async def get_team_id_by_name(self, name: str) -> TeamId: ...
 
+    @abstractmethod
+    async def get_team_version(self, team_id: TeamId) -> int: ...
+
     @abstractmethod
     async def create_team(
         self, name: str, addon: EnumAddons, owner_id: str, password: str,
-        id: TeamId = Sentinel, vip_end: datetime | None = None,
-        is_vip: bool | None = None
+        hasher: BaseAsyncHasher, id: TeamId = Sentinel,
+        vip_end: datetime | None = None, is_vip: bool | None = None
     ) -> TeamProtocol: ...
 
     @abstractmethod
     async def update_team(
-        self, id: TeamId, name: str | None = None, addon: EnumAddons | None = None,
-        is_vip: bool | None = None, vip_end: datetime | None = None,
-        password: str | None = None
+        self, id: TeamId, hasher: BaseAsyncHasher, name: str | None = None,
+        addon: EnumAddons | None = None, is_vip: bool | None = None,
+        vip_end: datetime | None = None, password: str | None = None
     ) -> TeamProtocol: ...
 
     @abstractmethod
@@ -140,6 +151,27 @@ class BaseAsyncDB(ABC, Generic[DBConfig]):
         wow_api: BaseAsyncWoWAPI
     ) -> WoWItemProtocol | None: ...
 
+    @abstractmethod
+    async def get_wow_item_langs(
+        self, wow_ids: Sequence[int], addon: EnumAddons
+    ) -> dict[int, set[EnumLanguages]]: ...
+
+    @abstractmethod
+    async def create_wow_items(
+        self, wow_items: Sequence[WoWAPIItem], batch_size: int = 1000
+    ) -> int: ...
+
+    @abstractmethod
+    async def get_wow_items_by_wow_ids(
+        self, wow_ids: Sequence[int], addon: EnumAddons, lang: EnumLanguages,
+        wow_api: BaseAsyncWoWAPI, placeholders: bool = False
+    ) -> dict[int, WoWItemProtocol]: ...
+
+    @abstractmethod
+    async def backfill_wow_items(
+        self, wow_api: BaseAsyncWoWAPI, batch_size: int = 100
+    ) -> int: ...
+
     ###
     # Queue model
     ###
@@ -161,6 +193,12 @@ class BaseAsyncDB(ABC, Generic[DBConfig]):
         wow_api: BaseAsyncWoWAPI
     ) -> Sequence[QueueProtocol]: ...
 
+    @abstractmethod
+    async def create_queues(
+        self, team_id: TeamId, queues: Mapping[int, Sequence[RaiderId]],
+        addon: EnumAddons, lang: EnumLanguages, wow_api: BaseAsyncWoWAPI
+    ) -> dict[int, Sequence[QueueProtocol]]: ...
+
     @abstractmethod
     async def del_queue(self, team_id: TeamId, wow_item_id: int) -> None: ...
 
@@ -174,10 +212,42 @@ class BaseAsyncDB(ABC, Generic[DBConfig]):
     @abstractmethod
     async def get_logs(
         self, team_id: TeamId, wow_item_id: int | None = None,
-        limit: int | None = None, offset: int | None = None
+        limit: int | None = None, offset: int | None = None,
+        after: tuple[datetime, LogId] | None = None
     ) -> Sequence[LogProtocol]: ...
 
     @abstractmethod
     async def create_log(
-        self, team_id: TeamId, user_id: UserId, wow_item_id: int, queue: str
+        self, team_id: TeamId, user_id: UserId, wow_item_id: int,
+        queue: list[dict]
     ) -> LogProtocol: ...
+
+    @abstractmethod
+    async def create_logs(
+        self, team_id: TeamId, user_id: UserId, queues: Mapping[int, list[dict]]
+    ) -> Sequence[LogProtocol]: ...
+
+    ###
+    # OutboxEmail model
+    ###
+
+    @abstractmethod
+    async def create_outbox_email(
+        self, subject: str, body: str, to_email: str, html: str | None = None
+    ) -> OutboxEmailProtocol: ...
+
+    @abstractmethod
+    async def claim_outbox_emails(
+        self, limit: int, lease: timedelta
+    ) -> Sequence[OutboxEmailProtocol]: ...
+
+    @abstractmethod
+    async def del_outbox_emails(self, ids: Sequence[OutboxEmailId]) -> None: ...
+
+    @abstractmethod
+    async def retry_outbox_email(
+        self, id: OutboxEmailId, delay: timedelta, error: str
+    ) -> None: ...
+
+    @abstractmethod
+    async def fail_outbox_email(self, id: OutboxEmailId, error: str) -> None: ...
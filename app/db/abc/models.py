@@ -4,7 +4,8 @@ from datetime import datetime
 from typing import Protocol
 
 from app.db.enums import EnumAddons, EnumClasses, EnumLanguages
-from app.types import LogId, QueueId, RaiderId, TeamId, UserId, WoWItemId
+from app.types import (LogId, OutboxEmailId, QueueId, RaiderId, TeamId,
+                       UserId, WoWItemId)
 
 
 class UserProtocol(Protocol):
@@ -25,6 +26,7 @@ class TeamProtocol(Protocol):
     vip_end: datetime | None
     owner_id: UserId
     password: str
+    version: int
     owner: 'UserProtocol'
     raiders: list['RaiderProtocol']
     logs: list['LogProtocol']
@@ -49,6 +51,9 @@ class WoWItemProtocol(Protocol):
     html_tooltip: str
     icon_url: str
     origin_link: str
+    is_placeholder: bool
+    backfill_attempted_at: datetime | None
+    backfill_failed_at: datetime | None
 
 
 class QueueProtocol(Protocol):
@@ -67,6 +72,19 @@ class LogProtocol(Protocol):
     user_id: UserId
     wow_item_id: int
     created_at: datetime
-    queue: str
+    queue: list[dict]
     team: 'TeamProtocol'
     user: 'UserProtocol'
+
+
+class OutboxEmailProtocol(Protocol):
+    id: OutboxEmailId
+    subject: str
+    body: str
+    html: str | None
+    to_email: str
+    created_at: datetime
+    next_attempt_at: datetime
+    attempts: int
+    error: str | None
+    failed_at: datetime | None
@@ -1,19 +1,29 @@
 # flake8-in-file-ignores: noqa: WPS204, WPS203
 
+import ast
+import asyncio
 from contextlib import asynccontextmanager
-from dataclasses import dataclass
-from datetime import datetime
-from typing import AsyncGenerator, Literal, NoReturn, Sequence
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import (Any, AsyncGenerator, Coroutine, Literal, Mapping,
+                    NoReturn, Sequence)
 
-from sqlalchemy import case, delete, exists, select
+from sqlalchemy import (JSON, Column, Connection, Integer, MetaData, Select,
+                        String, Table, bindparam, case, column, delete,
+                        exists, func, insert, inspect, select, tuple_,
+                        update, values)
+from sqlalchemy.dialects.postgresql import Insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import (AsyncSession, async_sessionmaker,
                                     create_async_engine)
-from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm import (aliased, contains_eager, joinedload,
+                            selectinload)
 
 from app.db.abc.base import BaseAsyncDB, get_id
-from app.db.abc.models import (LogProtocol, QueueProtocol, RaiderProtocol,
-                               TeamProtocol, UserProtocol, WoWItemProtocol)
+from app.db.abc.models import (LogProtocol, OutboxEmailProtocol,
+                               QueueProtocol, RaiderProtocol, TeamProtocol,
+                               UserProtocol, WoWItemProtocol)
 from app.db.enums import EnumAddons, EnumClasses, EnumLanguages
 from app.db.exc import (ActivateUserError, DatabaseError,
                         InvalidCredentialsError, RaiderNotFoundError,
@@ -21,10 +31,14 @@ from app.db.exc import (ActivateUserError, DatabaseError,
                         UniqueTeamNameError, UniqueUsernameError,
                         UserNotFoundError, WoWItemNotFoundError)
 from app.db.sqlalchemy.config import SQLAlchemyDBConfig
-from app.db.sqlalchemy.models import (Base, Log, Queue, Raider, Team, User,
+from app.db.sqlalchemy.models import (Base, CompressedString, Log,
+                                      OutboxEmail, Queue, Raider, Team, User,
                                       WoWItem)
 from app.db.wow_api.base import BaseAsyncWoWAPI, WoWAPIItem
-from app.types import RaiderId, Sentinel, TeamId, UserId, Username, WoWItemId
+from app.hashers.base import BaseAsyncHasher
+from app.mailers.base import Email
+from app.types import (LogId, OutboxEmailId, RaiderId, Sentinel, TeamId,
+                       UserId, Username, WoWItemId)
 
 
 class DatabaseWriteError(Exception): ...
@@ -32,6 +46,7 @@ class DatabaseWriteError(Exception): ...
 
 @dataclass
 class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
+    background_tasks: set[asyncio.Task] = field(default_factory=set)
 
     async def connect(self) -> None:
         self.engine = create_async_engine(
@@ -42,9 +57,21 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
             bind=self.engine,
             **self.config.session_maker_kwargs
         )
+        # set on this engine's dialect, as the column type is shared by every
+        # engine in the process
+        setattr(
+            self.engine.dialect, CompressedString.MIN_SIZE_ATTR,
+            self.config.tooltip_compress_min_size
+        )
 
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(self._migrate_indexes)
+            await conn.run_sync(self._migrate_log_queue)
+            await conn.run_sync(self._migrate_team_version)
+            await conn.run_sync(self._migrate_wow_item_tooltip)
+            await conn.run_sync(self._migrate_wow_item_placeholder)
+            await conn.run_sync(self._migrate_wow_item_backfill)
 
     @asynccontextmanager
     async def get_read_session(self) -> AsyncGenerator[AsyncSession, None]:
@@ -70,8 +97,10 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
 
     async def create_user(
         self, username: str, password: str, email: str, is_active: bool,
-        id: UserId = Sentinel
+        hasher: BaseAsyncHasher, id: UserId = Sentinel,
+        outbox_email: Email | None = None
     ) -> UserProtocol:
+        hashed_password = await hasher.hash(password)
         try:
             async with self.get_write_session() as session:
                 new_user = User(
@@ -79,9 +108,17 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
                     username=username,
                     email=email,
                     is_active=is_active,
-                    password=password
+                    password=hashed_password
                 )
                 session.add(new_user)
+                if outbox_email is not None:
+                    session.add(OutboxEmail(
+                        id=get_id(),
+                        subject=outbox_email.subject,
+                        body=outbox_email.body,
+                        html=outbox_email.html,
+                        to_email=outbox_email.to_email
+                    ))
 
         except DatabaseError as e:
             if isinstance(e.__cause__, IntegrityError):
@@ -118,11 +155,14 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
         async with self.get_write_session() as session:
             await session.execute(delete(User).where(User.id == id))
 
-    async def change_user_password(self, id: UserId, new_password: str) -> None:
+    async def change_user_password(
+        self, id: UserId, new_password: str, hasher: BaseAsyncHasher
+    ) -> None:
+        hashed_password = await hasher.hash(new_password)
         async with self.get_write_session() as session:
             user = await session.get(User, id)
             if user:
-                user.password = new_password
+                user.password = hashed_password
                 session.add(user)
             else:
                 raise UserNotFoundError(f'User with id {id} is not found')
@@ -171,9 +211,10 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
 
     async def create_team(
         self, name: str, addon: EnumAddons, owner_id: str, password: str,
-        id: TeamId = Sentinel, vip_end: datetime | None = None,
-        is_vip: bool | None = None
+        hasher: BaseAsyncHasher, id: TeamId = Sentinel,
+        vip_end: datetime | None = None, is_vip: bool | None = None
     ) -> TeamProtocol:
+        hashed_password = await hasher.hash(password)
         async with self.get_write_session() as session:
             try:
                 team = Team(
@@ -183,7 +224,7 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
                     is_vip=is_vip,
                     vip_end=vip_end,
                     owner_id=owner_id,
-                    password=password
+                    password=hashed_password
                 )
                 session.add(team)
 
@@ -226,19 +267,22 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
                 raise TeamsNotExistsError(f"Team with id {id} does not exist")
 
     async def update_team(
-        self, id: TeamId, name: str | None = None, addon: EnumAddons | None = None,
-        is_vip: bool | None = None, vip_end: datetime | None = None,
-        password: str | None = None, owner_id: str | None = None
+        self, id: TeamId, hasher: BaseAsyncHasher, name: str | None = None,
+        addon: EnumAddons | None = None, is_vip: bool | None = None,
+        vip_end: datetime | None = None, password: str | None = None,
+        owner_id: str | None = None
     ) -> TeamProtocol:
         team = await self.get_team(id=id)
+        hashed_password = await hasher.hash(password) if password else None
         async with self.get_write_session() as session:
             if name: team.name = name  # noqa: WPS220
             if addon: team.addon = addon  # noqa: WPS220
             if is_vip: team.is_vip = is_vip  # noqa: WPS220
             if vip_end: team.vip_end = vip_end  # noqa: WPS220
             if owner_id: team.owner_id = owner_id  # noqa: WPS220
-            if password: team.password = password  # noqa: WPS220
+            if hashed_password: team.password = hashed_password  # noqa: WPS220
             session.add(team)
+            await self._bump_team_version(session, id)
             return team  # type: ignore
 
     async def get_team_by_name_with_owner(self, team_name: str) -> TeamProtocol:
@@ -257,17 +301,7 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
 
     async def get_team_with_owner(self, team_id: TeamId) -> TeamProtocol:
         async with self.get_read_session() as session:
-            stmt = (
-                select(Team)
-                .options(joinedload(Team.owner))
-                .where(Team.id == team_id)
-            )
-            team = (await session.execute(stmt)).scalar_one_or_none()
-            if not team:
-                raise TeamsNotExistsError(
-                    f"Team with id {team_id} does not exist"
-                )
-            return team  # type: ignore
+            return await self._get_team_with_owner(session, team_id)
 
     async def get_team_id_by_name(self, name: str) -> TeamId:
         async with self.get_read_session() as session:
@@ -277,6 +311,15 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
                 raise TeamsNotExistsError(f"Team with name {name} does not exist")
             return team_id
 
+    async def get_team_version(self, team_id: TeamId) -> int:
+        async with self.get_read_session() as session:
+            version = await session.scalar(
+                select(Team.version).where(Team.id == team_id)
+            )
+            if version is None:
+                raise TeamsNotExistsError(f"Team with id {team_id} does not exist")
+            return version
+
     async def get_team_owner(self, team_id: TeamId) -> UserProtocol:
         async with self.get_read_session() as session:
             stmt = (
@@ -292,7 +335,7 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
             return owner  # type: ignore
 
     async def verify_username_password(
-        self, username: Username, password: str
+        self, username: Username, password: str, hasher: BaseAsyncHasher
     ) -> UserId:
         async with self.get_read_session() as session:
             stmt = (
@@ -303,10 +346,11 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
                 )
             )
             user = (await session.execute(stmt)).scalar_one_or_none()
-            if user and user.check_password(password):
-                return user.id
-            else:
-                raise InvalidCredentialsError('Invalid username or password')
+
+        if user and await hasher.verify(password, user.password):
+            return user.id
+        else:
+            raise InvalidCredentialsError('Invalid username or password')
 
     async def get_raider(self, id: RaiderId) -> RaiderProtocol:
         async with self.get_read_session() as session:
@@ -345,6 +389,7 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
                 is_active=is_active
             )
             session.add(raider)
+            await self._bump_team_version(session, team_id)
             return raider  # type: ignore
 
     async def set_raider_inactive(self, id: RaiderId) -> None:
@@ -352,6 +397,7 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
         async with self.get_write_session() as session:
             raider.is_active = False
             session.add(raider)
+            await self._bump_team_version(session, raider.team_id)
 
     async def get_wow_item(self, id: WoWItemId) -> WoWItemProtocol:
         async with self.get_read_session() as session:
@@ -365,31 +411,150 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
         self, wow_id: int, addon: EnumAddons, lang: EnumLanguages,
         wow_api: BaseAsyncWoWAPI
     ) -> WoWItemProtocol | None:
-        use_wow_api = False
+        wow_items = await self.get_wow_items_by_wow_ids(
+            wow_ids=[wow_id],
+            addon=addon,
+            lang=lang,
+            wow_api=wow_api
+        )
+        return wow_items.get(wow_id)
 
+    async def get_wow_items_by_wow_ids(
+        self, wow_ids: Sequence[int], addon: EnumAddons, lang: EnumLanguages,
+        wow_api: BaseAsyncWoWAPI, placeholders: bool = False
+    ) -> dict[int, WoWItemProtocol]:
+        # placeholders are fetched again and returned while WoWHead is still
+        # unavailable; with `placeholders` ids that could not be fetched get
+        # new ones instead of being left out
         async with self.get_read_session() as session:
             stmt = select(WoWItem).where(
-                WoWItem.wow_id == wow_id,
+                WoWItem.wow_id.in_(wow_ids),
                 WoWItem.addon == addon,
-                WoWItem.lang == lang
+                WoWItem.lang == lang,
+                WoWItem.backfill_failed_at.is_(None)
             )
-            wow_item = (await session.execute(stmt)).scalar_one_or_none()
+            wow_items = {
+                wow_item.wow_id: wow_item
+                for wow_item in (await session.execute(stmt)).scalars().all()
+            }
 
-        if not wow_item:
-            wow_item = self._wowapi_item_to_wow_item(
-                await wow_api.get_item(
-                    id=wow_id,
-                    addon=addon,
-                    lang=lang
+        missing_ids = [
+            wow_id for wow_id in dict.fromkeys(wow_ids)
+            if wow_id not in wow_items or wow_items[wow_id].is_placeholder
+        ]
+        if not missing_ids:
+            return wow_items  # type: ignore
+
+        wow_api_items = await wow_api.get_items(
+            ids=missing_ids, addon=addon, lang=lang
+        )
+        unknown_ids = [
+            wow_id for wow_id in missing_ids
+            if wow_id in wow_items and wow_id in wow_api_items
+            and wow_api_items[wow_id] is None
+        ]
+        if unknown_ids:
+            await self._fail_wow_item_placeholders(unknown_ids, addon, lang)
+            for wow_id in unknown_ids:
+                del wow_items[wow_id]
+
+        new_rows = [
+            self._wowapi_item_to_row(wow_api_item)
+            for wow_api_item in wow_api_items.values() if wow_api_item
+        ]
+        if placeholders:
+            new_rows.extend(
+                self._placeholder_row(wow_id, addon, lang) for wow_id in missing_ids
+                if wow_id not in wow_api_items and wow_id not in wow_items
+            )
+        if not new_rows:
+            return wow_items  # type: ignore
+
+        # a concurrent worker may have stored the same items; keep its rows
+        upsert = self._insert_wow_items_stmt(new_rows).returning(WoWItem)
+        async with self.get_write_session() as session:
+            for wow_item in (await session.scalars(upsert)).all():
+                wow_items[wow_item.wow_id] = wow_item
+            conflicted_ids = [
+                row['wow_id'] for row in new_rows if row['wow_id'] not in wow_items
+            ]
+            if conflicted_ids:
+                stmt = select(WoWItem).where(
+                    WoWItem.wow_id.in_(conflicted_ids),
+                    WoWItem.addon == addon,
+                    WoWItem.lang == lang,
+                    WoWItem.backfill_failed_at.is_(None)
                 )
+                for wow_item in (await session.scalars(stmt)).all():
+                    wow_items[wow_item.wow_id] = wow_item
+
+        return wow_items  # type: ignore
+
+    async def backfill_wow_items(
+        self, wow_api: BaseAsyncWoWAPI, batch_size: int = 100
+    ) -> int:
+        # least recently attempted first, so placeholders WoWHead keeps
+        # failing on do not hold back the rest
+        async with self.get_read_session() as session:
+            stmt = (
+                select(WoWItem.id, WoWItem.wow_id, WoWItem.addon, WoWItem.lang)
+                .where(
+                    WoWItem.is_placeholder,
+                    WoWItem.backfill_failed_at.is_(None)
+                )
+                .order_by(WoWItem.backfill_attempted_at.nulls_first(), WoWItem.id)
+                .limit(batch_size)
             )
-            use_wow_api = True
+            rows = (await session.execute(stmt)).all()
+        placeholder_ids: dict[tuple[EnumAddons, EnumLanguages], list[int]] = {}
+        for _, wow_id, addon, lang in rows:
+            placeholder_ids.setdefault((addon, lang), []).append(wow_id)
 
-        if use_wow_api and wow_item:
+        backfilled = 0
+        for (addon, lang), wow_ids in placeholder_ids.items():
+            wow_items = await self.get_wow_items_by_wow_ids(
+                wow_ids, addon, lang, wow_api
+            )
+            backfilled += sum(
+                not wow_item.is_placeholder for wow_item in wow_items.values()
+            )
+
+        if rows:
             async with self.get_write_session() as session:
-                session.add(wow_item)
+                await session.execute(
+                    update(WoWItem)
+                    .where(WoWItem.id.in_([row.id for row in rows]))
+                    .values(backfill_attempted_at=datetime.now())
+                )
+        return backfilled
 
-        return wow_item  # type: ignore
+    async def get_wow_item_langs(
+        self, wow_ids: Sequence[int], addon: EnumAddons
+    ) -> dict[int, set[EnumLanguages]]:
+        async with self.get_read_session() as session:
+            stmt = select(WoWItem.wow_id, WoWItem.lang).where(
+                WoWItem.wow_id.in_(wow_ids),
+                WoWItem.addon == addon,
+                WoWItem.backfill_failed_at.is_(None)
+            )
+            wow_item_langs: dict[int, set[EnumLanguages]] = {}
+            for wow_id, lang in (await session.execute(stmt)).all():
+                wow_item_langs.setdefault(wow_id, set()).add(lang)
+        return wow_item_langs
+
+    async def create_wow_items(
+        self, wow_items: Sequence[WoWAPIItem], batch_size: int = 1000
+    ) -> int:
+        # idempotent: items that are already stored are left as they are
+        rows = [self._wowapi_item_to_row(wow_item) for wow_item in wow_items]
+        created = 0
+        async with self.get_write_session() as session:
+            for start in range(0, len(rows), batch_size):
+                stmt = self._insert_wow_items_stmt(
+                    rows[start:start + batch_size]
+                ).returning(WoWItem.id)
+                created += len((await session.scalars(stmt)).all())
+        return created
 
     async def get_queue_by_item(
         self, team_id: TeamId, wow_item_id: int
@@ -410,52 +575,79 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
         self, team_id: TeamId
     ) -> list[Sequence[QueueProtocol]]:
         async with self.get_read_session() as session:
-            stmt = (
-                select(Queue)
-                .options(joinedload(Queue.raider))
-                .where(Queue.team_id == team_id)
-                .order_by(Queue.wow_item_id, Queue.position)
-            )
-            queues = (await session.execute(stmt)).scalars().all()
-
-            grouped_queues = {}
-            for queue in queues:
-                grouped_queues.setdefault(queue.wow_item_id, []).append(queue)
-
-            return list(grouped_queues.values())
+            return await self._get_queues(session, team_id)
 
     async def create_queue(
         self, team_id: TeamId, wow_item_id: int, addon: EnumAddons,
         lang: EnumLanguages, raiders: Sequence[RaiderId],
         wow_api: BaseAsyncWoWAPI
     ) -> Sequence[QueueProtocol]:
-        wow_item = await self.get_wow_item_by_wow_id(
-            wow_id=wow_item_id,
+        queues = await self.create_queues(
+            team_id=team_id,
+            queues={wow_item_id: raiders},
             addon=addon,
             lang=lang,
             wow_api=wow_api
         )
-        if not wow_item:
-            raise WoWItemNotFoundError(f"Item with id {wow_item_id} does not exist")
+        return queues[wow_item_id]
 
-        await self.del_queue(team_id, wow_item_id)
-        try:
-            async with self.get_write_session() as session:
-                for i, raider_id in enumerate(raiders, start=1):
-                    queue = Queue(
-                        position=i,
-                        team_id=team_id,
-                        raider_id=raider_id,
-                        wow_item_id=wow_item_id
-                    )
-                    session.add(queue)
-        except DatabaseError as e:
-            if isinstance(e.__cause__, IntegrityError):
-                raise RaiderNotFoundError('Raiders not exists') from e
-            else:
-                raise e
+    async def create_queues(
+        self, team_id: TeamId, queues: Mapping[int, Sequence[RaiderId]],
+        addon: EnumAddons, lang: EnumLanguages, wow_api: BaseAsyncWoWAPI
+    ) -> dict[int, Sequence[QueueProtocol]]:
+        # an item stored in any language exists; only unknown items wait for
+        # WoWHead, tooltips in the requester's language are loaded afterwards
+        wow_item_langs = await self.get_wow_item_langs(list(queues), addon)
+        unknown_ids = [wow_id for wow_id in queues if wow_id not in wow_item_langs]
+        if unknown_ids:
+            # items WoWHead could not be asked about are queued with a
+            # placeholder, only items it does not know are rejected
+            wow_items = await self.get_wow_items_by_wow_ids(
+                wow_ids=unknown_ids,
+                addon=addon,
+                lang=lang,
+                wow_api=wow_api,
+                placeholders=True
+            )
+            missing_ids = set(unknown_ids) - wow_items.keys()
+            if missing_ids:
+                raise WoWItemNotFoundError(
+                    f"Items with ids {sorted(missing_ids)} do not exist"
+                )
+        unlocalized_ids = [
+            wow_id for wow_id, langs in wow_item_langs.items() if lang not in langs
+        ]
+        if unlocalized_ids:
+            self._run_in_background(
+                self.get_wow_items_by_wow_ids(unlocalized_ids, addon, lang, wow_api)
+            )
+
+        delete_queues = delete(Queue).where(
+            Queue.team_id == team_id,
+            Queue.wow_item_id.in_(queues)
+        )
+        new_rows = [
+            (get_id(), i, raider_id, wow_item_id)
+            for wow_item_id, raiders in queues.items()
+            for i, raider_id in enumerate(raiders, start=1)
+        ]
+        created_queues: dict[int, list[Queue]] = {
+            wow_item_id: [] for wow_item_id in queues
+        }
+
+        async with self.get_write_session() as session:
+            await session.execute(delete_queues)
+            if new_rows:
+                inserted = (
+                    await session.execute(self._insert_queues_stmt(team_id, new_rows))
+                ).scalars().all()
+                if len(inserted) != len(new_rows):
+                    raise RaiderNotFoundError('Raiders not exists')
+                for queue in inserted:
+                    created_queues[queue.wow_item_id].append(queue)
+            await self._bump_team_version(session, team_id)
 
-        return await self.get_queue_by_item(team_id, wow_item_id)
+        return created_queues  # type: ignore
 
     async def del_queue(self, team_id: TeamId, wow_item_id: int) -> None:
         async with self.get_write_session() as session:
@@ -465,6 +657,7 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
                     Queue.wow_item_id == wow_item_id
                 )
             )
+            await self._bump_team_version(session, team_id)
 
     async def is_queue_exists(self, team_id: TeamId, wow_item_id: int) -> bool:
         async with self.get_read_session() as session:
@@ -479,7 +672,8 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
             ))
 
     async def create_log(
-        self, team_id: TeamId, user_id: UserId, wow_item_id: int, queue: str
+        self, team_id: TeamId, user_id: UserId, wow_item_id: int,
+        queue: list[dict]
     ) -> LogProtocol:
         async with self.get_write_session() as session:
             log = Log(
@@ -491,9 +685,28 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
             session.add(log)
         return log  # type: ignore
 
+    async def create_logs(
+        self, team_id: TeamId, user_id: UserId, queues: Mapping[int, list[dict]]
+    ) -> Sequence[LogProtocol]:
+        async with self.get_write_session() as session:
+            logs = (await session.scalars(
+                insert(Log).returning(Log, sort_by_parameter_order=True),
+                [
+                    {
+                        'id': get_id(),
+                        'team_id': team_id,
+                        'user_id': user_id,
+                        'wow_item_id': wow_item_id,
+                        'queue': queue
+                    } for wow_item_id, queue in queues.items()
+                ]
+            )).all()
+        return logs  # type: ignore
+
     async def get_logs(
         self, team_id: TeamId, wow_item_id: int | None = None,
-        limit: int | None = None, offset: int | None = None
+        limit: int | None = None, offset: int | None = None,
+        after: tuple[datetime, LogId] | None = None
     ) -> Sequence[LogProtocol]:
         async with self.get_read_session() as session:
             stmt = (
@@ -501,25 +714,306 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
                 .where(
                     Log.team_id == team_id,
                 )
-                .order_by(Log.created_at.desc())
+                .order_by(Log.created_at.desc(), Log.id.desc())
                 .limit(limit)
-                .offset(offset)
             )
             if wow_item_id:
-                stmt.where(Log.wow_item_id == wow_item_id)
+                stmt = stmt.where(Log.wow_item_id == wow_item_id)
+            if after:
+                stmt = stmt.where(tuple_(Log.created_at, Log.id) < tuple_(*after))
+            else:
+                stmt = stmt.offset(offset)
             logs = (await session.execute(stmt)).scalars().all()
         return logs  # type: ignore
 
     async def get_full_team(  # noqa: WPS234
         self, team_id: TeamId
     ) -> tuple[TeamProtocol, list[Sequence[QueueProtocol]]]:
-        team = await self.get_team_with_owner(team_id)
-        queues = await self.get_queues(team.id)
+        # one snapshot, so the team version matches the queues read with it
+        async with self.get_read_session() as session:
+            await session.connection(
+                execution_options={'isolation_level': 'REPEATABLE READ'}
+            )
+            team = await self._get_team_with_owner(session, team_id)
+            queues = await self._get_queues(session, team.id)
         return team, queues
 
+    async def create_outbox_email(
+        self, subject: str, body: str, to_email: str, html: str | None = None
+    ) -> OutboxEmailProtocol:
+        async with self.get_write_session() as session:
+            outbox_email = OutboxEmail(
+                id=get_id(),
+                subject=subject,
+                body=body,
+                html=html,
+                to_email=to_email
+            )
+            session.add(outbox_email)
+        return outbox_email  # type: ignore
+
+    async def claim_outbox_emails(
+        self, limit: int, lease: timedelta
+    ) -> Sequence[OutboxEmailProtocol]:
+        # SKIP LOCKED lets several app instances claim disjoint batches
+        now = datetime.now()
+        due_ids = (
+            select(OutboxEmail.id)
+            .where(
+                OutboxEmail.failed_at.is_(None),
+                OutboxEmail.next_attempt_at <= now
+            )
+            .order_by(OutboxEmail.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        async with self.get_write_session() as session:
+            stmt = (
+                update(OutboxEmail)
+                .where(OutboxEmail.id.in_(due_ids.scalar_subquery()))
+                .values(
+                    next_attempt_at=now + lease,
+                    attempts=OutboxEmail.attempts + 1
+                )
+                .returning(OutboxEmail)
+            )
+            outbox_emails = (await session.scalars(stmt)).all()
+        return outbox_emails  # type: ignore
+
+    async def del_outbox_emails(self, ids: Sequence[OutboxEmailId]) -> None:
+        async with self.get_write_session() as session:
+            await session.execute(delete(OutboxEmail).where(OutboxEmail.id.in_(ids)))
+
+    async def retry_outbox_email(
+        self, id: OutboxEmailId, delay: timedelta, error: str
+    ) -> None:
+        async with self.get_write_session() as session:
+            await session.execute(
+                update(OutboxEmail)
+                .where(OutboxEmail.id == id)
+                .values(next_attempt_at=datetime.now() + delay, error=error)
+            )
+
+    async def fail_outbox_email(self, id: OutboxEmailId, error: str) -> None:
+        async with self.get_write_session() as session:
+            await session.execute(
+                update(OutboxEmail)
+                .where(OutboxEmail.id == id)
+                .values(failed_at=datetime.now(), error=error)
+            )
+
     async def close(self) -> None:
+        await asyncio.gather(*self.background_tasks, return_exceptions=True)
         await self.engine.dispose()
 
+    def _run_in_background(self, coro: Coroutine[Any, Any, Any]) -> None:
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self._on_background_task_done)
+
+    def _on_background_task_done(self, task: asyncio.Task) -> None:
+        self.background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.config.logger.warning(task.exception(), exc_info=task.exception())
+
+    def _insert_queues_stmt(
+        self, team_id: TeamId, rows: list[tuple[str, int, RaiderId, int]]
+    ) -> Select[tuple[Queue]]:
+        # raiders of other teams are filtered out, so a short result means
+        # that some of them do not exist
+        new_queue = values(
+            column('id', String),
+            column('position', Integer),
+            column('raider_id', String),
+            column('wow_item_id', Integer),
+            name='new_queue'
+        ).data(rows)
+        inserted_queue = (
+            insert(Queue)
+            .from_select(
+                ['id', 'position', 'team_id', 'raider_id', 'wow_item_id'],
+                select(
+                    new_queue.c.id,
+                    new_queue.c.position,
+                    Raider.team_id,
+                    Raider.id,
+                    new_queue.c.wow_item_id
+                )
+                .join(Raider, Raider.id == new_queue.c.raider_id)
+                .where(Raider.team_id == team_id)
+            )
+            .returning(*Queue.__table__.c)
+            .cte('inserted_queue')
+        )
+        queue_alias = aliased(Queue, inserted_queue)
+        return (
+            select(queue_alias)
+            .join(queue_alias.raider)
+            .options(contains_eager(queue_alias.raider))
+            .order_by(queue_alias.wow_item_id, queue_alias.position)
+        )
+
+    async def _get_team_with_owner(
+        self, session: AsyncSession, team_id: TeamId
+    ) -> TeamProtocol:
+        stmt = (
+            select(Team)
+            .options(joinedload(Team.owner))
+            .where(Team.id == team_id)
+        )
+        team = (await session.execute(stmt)).scalar_one_or_none()
+        if not team:
+            raise TeamsNotExistsError(
+                f"Team with id {team_id} does not exist"
+            )
+        return team  # type: ignore
+
+    async def _get_queues(
+        self, session: AsyncSession, team_id: TeamId
+    ) -> list[Sequence[QueueProtocol]]:
+        stmt = (
+            select(Queue)
+            .options(joinedload(Queue.raider))
+            .where(Queue.team_id == team_id)
+            .order_by(Queue.wow_item_id, Queue.position)
+        )
+        queues = (await session.execute(stmt)).scalars().all()
+
+        grouped_queues = {}
+        for queue in queues:
+            grouped_queues.setdefault(queue.wow_item_id, []).append(queue)
+
+        return list(grouped_queues.values())
+
+    async def _bump_team_version(self, session: AsyncSession, team_id: TeamId) -> None:
+        # every change visible in the full team must go through here
+        await session.execute(
+            update(Team)
+            .where(Team.id == team_id)
+            .values(version=Team.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    def _migrate_indexes(self, conn: Connection) -> None:
+        # create_all skips indexes of already existing tables
+        wow_item_indexes = {
+            index['name'] for index in inspect(conn).get_indexes(WoWItem.__tablename__)
+        }
+        if 'ix_wow_items_wow_id_addon_lang' not in wow_item_indexes:
+            conn.execute(
+                delete(WoWItem).where(
+                    WoWItem.id.not_in(
+                        select(func.min(WoWItem.id))
+                        .group_by(WoWItem.wow_id, WoWItem.addon, WoWItem.lang)
+                    )
+                )
+            )
+
+        # the log indexes gained an id column for the cursor pagination
+        for name in (
+            'ix_logs_team_id_created_at', 'ix_logs_team_id_wow_item_id_created_at'
+        ):
+            conn.exec_driver_sql(f'DROP INDEX IF EXISTS {name}')
+
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+    def _migrate_log_queue(self, conn: Connection) -> None:
+        # Log.queue used to be a str() of a list parsed back with literal_eval
+        queue_column = next(
+            column for column in inspect(conn).get_columns(Log.__tablename__)
+            if column['name'] == 'queue'
+        )
+        if isinstance(queue_column['type'], JSON):
+            return
+
+        json_type = Log.queue.type
+        conn.exec_driver_sql(
+            'ALTER TABLE logs ADD COLUMN queue_json '
+            f'{json_type.compile(dialect=conn.dialect)}'
+        )
+        legacy_logs = Table(
+            Log.__tablename__, MetaData(),
+            Column('id', String, primary_key=True),
+            Column('queue', String),
+            Column('queue_json', json_type)
+        )
+
+        last_id = ''
+        while batch := conn.execute(
+            select(legacy_logs.c.id, legacy_logs.c.queue)
+            .where(legacy_logs.c.id > last_id)
+            .order_by(legacy_logs.c.id)
+            .limit(self.config.migration_batch_size)
+        ).all():
+            last_id = batch[-1].id
+            conn.execute(
+                update(legacy_logs)
+                .where(legacy_logs.c.id == bindparam('log_id'))
+                .values(queue_json=bindparam('queue_json')),
+                [
+                    {'log_id': log_id, 'queue_json': self._parse_log_queue(queue)}
+                    for log_id, queue in batch
+                ]
+            )
+
+        conn.exec_driver_sql('ALTER TABLE logs DROP COLUMN queue')
+        conn.exec_driver_sql('ALTER TABLE logs RENAME COLUMN queue_json TO queue')
+        conn.exec_driver_sql('ALTER TABLE logs ALTER COLUMN queue SET NOT NULL')
+        self.config.logger.info('Log queues migrated to JSON')
+
+    def _migrate_team_version(self, conn: Connection) -> None:
+        team_columns = {
+            column['name'] for column in inspect(conn).get_columns(Team.__tablename__)
+        }
+        if 'version' not in team_columns:
+            conn.exec_driver_sql(
+                'ALTER TABLE teams ADD COLUMN version INTEGER NOT NULL DEFAULT 1'
+            )
+
+    def _migrate_wow_item_tooltip(self, conn: Connection) -> None:
+        # WoWItem.html_tooltip used to be plain text; keep old rows as raw
+        tooltip_column = next(
+            column for column in inspect(conn).get_columns(WoWItem.__tablename__)
+            if column['name'] == 'html_tooltip'
+        )
+        if not isinstance(tooltip_column['type'], String):
+            return
+        conn.exec_driver_sql(
+            'ALTER TABLE wow_items ALTER COLUMN html_tooltip TYPE BYTEA '
+            "USING '\\x00'::bytea || convert_to(html_tooltip, 'UTF8')"
+        )
+
+    def _migrate_wow_item_placeholder(self, conn: Connection) -> None:
+        wow_item_columns = {
+            column['name']
+            for column in inspect(conn).get_columns(WoWItem.__tablename__)
+        }
+        if 'is_placeholder' not in wow_item_columns:
+            conn.exec_driver_sql(
+                'ALTER TABLE wow_items ADD COLUMN is_placeholder BOOLEAN '
+                'NOT NULL DEFAULT false'
+            )
+
+    def _migrate_wow_item_backfill(self, conn: Connection) -> None:
+        wow_item_columns = {
+            column['name']
+            for column in inspect(conn).get_columns(WoWItem.__tablename__)
+        }
+        for name in ('backfill_attempted_at', 'backfill_failed_at'):
+            if name not in wow_item_columns:
+                conn.exec_driver_sql(
+                    f'ALTER TABLE wow_items ADD COLUMN {name} TIMESTAMP'
+                )
+
+    def _parse_log_queue(self, queue: str | None) -> list[dict]:
+        try:
+            return ast.literal_eval(queue) if queue else []
+        except (ValueError, SyntaxError):
+            self.config.logger.warning(f'Unparsable log queue: {queue!r}')
+            return []
+
     def _raise_user_unique_error(self, e: IntegrityError | Sequence) -> NoReturn:
         if isinstance(e, IntegrityError):
             constraint: str = getattr(e.orig, 'constraint_name')  # noqa: B009
@@ -538,16 +1032,62 @@ class AsyncSQLAlchemyDB(BaseAsyncDB[SQLAlchemyDBConfig]):
 
         raise ValueError('Argument e of unsupported type')
 
-    def _wowapi_item_to_wow_item(
-        self, wow_api_item: WoWAPIItem | None
-    ) -> WoWItem | None:
-        if not wow_api_item:
-            return None
-        return WoWItem(
-            wow_id=wow_api_item.wow_id,
-            addon=wow_api_item.addon,
-            lang=wow_api_item.lang,
-            html_tooltip=wow_api_item.html_tooltip,
-            icon_url=wow_api_item.icon_url,
-            origin_link=wow_api_item.origin_link
+    def _insert_wow_items_stmt(self, rows: list[dict]) -> Insert:
+        # only a placeholder is replaced, and only by a fetched item
+        stmt = pg_insert(WoWItem).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=['wow_id', 'addon', 'lang'],
+            set_={
+                'html_tooltip': stmt.excluded.html_tooltip,
+                'icon_url': stmt.excluded.icon_url,
+                'origin_link': stmt.excluded.origin_link,
+                'is_placeholder': False,
+                'backfill_failed_at': None
+            },
+            where=WoWItem.is_placeholder & ~stmt.excluded.is_placeholder
         )
+
+    async def _fail_wow_item_placeholders(
+        self, wow_ids: Sequence[int], addon: EnumAddons, lang: EnumLanguages
+    ) -> None:
+        async with self.get_write_session() as session:
+            await session.execute(
+                update(WoWItem)
+                .where(
+                    WoWItem.wow_id.in_(wow_ids),
+                    WoWItem.addon == addon,
+                    WoWItem.lang == lang,
+                    WoWItem.is_placeholder
+                )
+                .values(backfill_failed_at=datetime.now())
+            )
+        self.config.logger.warning(
+            f'WoW items {sorted(wow_ids)} are unknown to WoWHead, '
+            'their placeholders are no longer backfilled'
+        )
+
+    def _wowapi_item_to_row(self, wow_api_item: WoWAPIItem) -> dict:
+        return {
+            'id': get_id(),
+            'wow_id': wow_api_item.wow_id,
+            'addon': wow_api_item.addon,
+            'lang': wow_api_item.lang,
+            'html_tooltip': wow_api_item.html_tooltip,
+            'icon_url': wow_api_item.icon_url,
+            'origin_link': wow_api_item.origin_link,
+            'is_placeholder': False
+        }
+
+    def _placeholder_row(
+        self, wow_id: int, addon: EnumAddons, lang: EnumLanguages
+    ) -> dict:
+        return {
+            'id': get_id(),
+            'wow_id': wow_id,
+            'addon': addon,
+            'lang': lang,
+            'html_tooltip': '',
+            'icon_url': '',
+            'origin_link': '',
+            'is_placeholder': True
+        }
@@ -8,3 +8,5 @@ from app.db.abc.configs import BaseDBConfig
 class SQLAlchemyDBConfig(BaseDBConfig):
     engine_kwargs: Mapping[str, Any] = Field(default_factory=dict)
     session_maker_kwargs: Mapping[str, Any] = Field(default_factory=dict)
+    migration_batch_size: int = 1000
+    tooltip_compress_min_size: int | None = 256
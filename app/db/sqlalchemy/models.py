@@ -1,59 +1,65 @@
 # flake8-in-file-ignores: noqa: WPS432, WPS202, WPS226, WPS110
 
+import zlib
 from datetime import datetime
+from typing import Any
 
-from passlib.context import CryptContext
-from sqlalchemy import Boolean, DateTime
+from sqlalchemy import Boolean, DateTime, Dialect, false, text
 from sqlalchemy import Enum as SAEnum
-from sqlalchemy import ForeignKey, Integer, String
-from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy import (JSON, ForeignKey, Index, Integer, LargeBinary, String,
+                        TypeDecorator)
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 from app.db.abc.base import get_id
 from app.db.enums import EnumAddons, EnumClasses, EnumLanguages
-from app.types import WoWItemId, LogId, QueueId, RaiderId, TeamId, UserId
-
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
-
-
-class PasswordHashingError(Exception): ...
+from app.types import (WoWItemId, LogId, OutboxEmailId, QueueId, RaiderId,
+                       TeamId, UserId)
 
 
 class Base(DeclarativeBase):
     pass
 
 
-class ModelWithPassword(Base):
-    __abstract__ = True
-
-    _password: Mapped[str] = mapped_column(
-        String(64), nullable=False, name='password'
-    )
-
-    def __init__(self, is_password_hash_check_enabled: bool = True, **kwargs) -> None:
-        self.is_password_hash_check_enabled = is_password_hash_check_enabled
-        password = kwargs.pop('password', None)
-        if password:
-            self.password = password
-        super().__init__(**kwargs)
+class CompressedString(TypeDecorator[str]):
+    # a flag byte and UTF-8 text, zlib-compressed when that makes it smaller;
+    # min_size None stores everything raw, either kind is read back. A
+    # dialect carrying MIN_SIZE_ATTR overrides min_size for its engine
+    impl = LargeBinary
+    cache_ok = True
+
+    RAW = b'\x00'
+    ZLIB = b'\x01'
+    MIN_SIZE_ATTR = 'compress_min_size'
+
+    def __init__(self, min_size: int | None = 256) -> None:
+        super().__init__()
+        self.min_size = min_size
+
+    def process_bind_param(self, value: str | None, dialect: Dialect) -> bytes | None:
+        if value is None:
+            return None
+        data = value.encode()
+        min_size = getattr(dialect, self.MIN_SIZE_ATTR, self.min_size)
+        if min_size is not None and len(data) >= min_size:
+            compressed = zlib.compress(data, 9)
+            if len(compressed) < len(data):
+                return self.ZLIB + compressed
+        return self.RAW + data
+
+    def process_result_value(self, value: Any | None, dialect: Dialect) -> str | None:
+        if value is None:
+            return None
+        value = bytes(value)
+        if value[:1] == self.ZLIB:
+            return zlib.decompress(value[1:]).decode()
+        return value[1:].decode()
 
-    @hybrid_property
-    def password(self) -> str:  # type: ignore[reportRedeclaration]
-        return self._password
 
-    @password.expression  # type: ignore[reportRedeclaration]
-    def password(cls) -> str:  # type: ignore[reportRedeclaration]  # noqa: B902
-        return cls._password
-
-    @password.setter
-    def password(self, value: str) -> None:
-        self._password = pwd_context.hash(value)  # noqa: WPS60
-
-    def is_password_hashed(self) -> bool:
-        return pwd_context.identify(self._password) is not None
+class ModelWithPassword(Base):
+    __abstract__ = True
 
-    def check_password(self, password: str) -> bool:
-        return pwd_context.verify(password, self._password)
+    password: Mapped[str] = mapped_column(String(64), nullable=False)
 
 
 class User(ModelWithPassword):
@@ -82,6 +88,9 @@ class Team(ModelWithPassword):
     is_vip: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
     vip_end: Mapped[datetime | None] = mapped_column(DateTime, default=None)
     owner_id: Mapped[UserId] = mapped_column(ForeignKey('users.id'), nullable=False)
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1, server_default='1'
+    )
     owner: Mapped['User'] = relationship(back_populates='teams')
     raiders: Mapped[list['Raider']] = relationship(back_populates='team')
     logs: Mapped[list['Log']] = relationship(back_populates='team')
@@ -104,22 +113,41 @@ class Raider(Base):
 
 class WoWItem(Base):
     __tablename__ = 'wow_items'
+    __table_args__ = (
+        Index('ix_wow_items_wow_id_addon_lang', 'wow_id', 'addon', 'lang', unique=True),
+    )
 
     id: Mapped[WoWItemId] = mapped_column(String, primary_key=True, default=get_id)
-    wow_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    wow_id: Mapped[int] = mapped_column(Integer, nullable=False)
     addon: Mapped[EnumAddons] = mapped_column(
         SAEnum(EnumAddons, name='addons'), nullable=False
     )
     lang: Mapped[EnumLanguages] = mapped_column(
         SAEnum(EnumLanguages, name='languages', nullable=False)
     )
-    html_tooltip: Mapped[str] = mapped_column(String, nullable=False)
+    html_tooltip: Mapped[str] = mapped_column(CompressedString(), nullable=False)
     icon_url: Mapped[str] = mapped_column(String, nullable=False)
     origin_link: Mapped[str] = mapped_column(String, nullable=False)
+    # stored while WoWHead was unavailable, to be backfilled
+    is_placeholder: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, default=False, server_default=false()
+    )
+    backfill_attempted_at: Mapped[datetime | None] = mapped_column(
+        DateTime, default=None
+    )
+    # set once WoWHead reported the item as unknown; it is not backfilled
+    # again and reads as missing
+    backfill_failed_at: Mapped[datetime | None] = mapped_column(
+        DateTime, default=None
+    )
 
 
 class Queue(Base):
     __tablename__ = 'queues'
+    __table_args__ = (
+        Index('ix_queues_team_id_wow_item_id_position',
+              'team_id', 'wow_item_id', 'position'),
+    )
 
     id: Mapped[QueueId] = mapped_column(String, primary_key=True, default=get_id)
     position: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -134,6 +162,11 @@ class Queue(Base):
 
 class Log(Base):
     __tablename__ = 'logs'
+    __table_args__ = (
+        Index('ix_logs_team_id_created_at_id', 'team_id', 'created_at', 'id'),
+        Index('ix_logs_team_id_wow_item_id_created_at_id',
+              'team_id', 'wow_item_id', 'created_at', 'id'),
+    )
 
     id: Mapped[LogId] = mapped_column(String, primary_key=True, default=get_id)
     team_id: Mapped[TeamId] = mapped_column(ForeignKey('teams.id'), nullable=False)
@@ -142,6 +175,35 @@ class Log(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime, nullable=False, default=datetime.now
     )
-    queue: Mapped[str] = mapped_column(String)
+    # JSONB is already a binary format and TOAST compresses snapshots over
+    # 2 kB, so a msgpack bytea column would save little and cost a decode
+    queue: Mapped[list[dict]] = mapped_column(
+        JSON().with_variant(JSONB, 'postgresql'), nullable=False
+    )
     team: Mapped['Team'] = relationship(back_populates='logs')
     user: Mapped['User'] = relationship(back_populates='logs')
+
+
+class OutboxEmail(Base):
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        Index('ix_email_outbox_next_attempt_at', 'next_attempt_at',
+              postgresql_where=text('failed_at IS NULL')),
+    )
+
+    id: Mapped[OutboxEmailId] = mapped_column(String, primary_key=True, default=get_id)
+    subject: Mapped[str] = mapped_column(String, nullable=False)
+    body: Mapped[str] = mapped_column(String, nullable=False)
+    html: Mapped[str | None] = mapped_column(String, default=None)
+    to_email: Mapped[str] = mapped_column(String(254), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.now
+    )
+    # claiming an email moves it forward by a lease, so a worker that died
+    # while sending it leaves it to be claimed again
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.now
+    )
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    error: Mapped[str | None] = mapped_column(String, default=None)
+    failed_at: Mapped[datetime | None] = mapped_column(DateTime, default=None)
@@ -1,17 +1,26 @@
+import asyncio
+import random
+import re
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from typing import Generic, Self, TypeVar
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Generic, Self, Sequence, TypeVar
 from xml.etree import ElementTree as ET
 
 import httpx
 
 from app.db.enums import EnumAddons, EnumLanguages
+from app.db.wow_api.circuit_breaker import CircuitBreaker, CircuitBreakerStats
 from app.db.wow_api.configs import BaseWoWAPIConfig, WoWHeadAPIConfig
+from app.db.wow_api.negative_cache import NegativeCache, NegativeCacheStats
+from app.utils.single_flight import SingleFlight
 
 
 class WoWAPIError(Exception): ...
 
 
+class WoWAPIUnavailableError(WoWAPIError): ...
+
+
 @dataclass
 class WoWAPIItem:
     wow_id: int
@@ -22,6 +31,15 @@ class WoWAPIItem:
     origin_link: str
 
 
+@dataclass
+class WoWAPIStats:
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+
+
 WoWAPIConfig = TypeVar('WoWAPIConfig', bound=BaseWoWAPIConfig)
 
 
@@ -37,44 +55,283 @@ class BaseAsyncWoWAPI(ABC, Generic[WoWAPIConfig]):
         self, id: int, addon: EnumAddons, lang: EnumLanguages
     ) -> WoWAPIItem | None: ...
 
+    # found items map to WoWAPIItem and missing ones to None; ids that could
+    # not be fetched are left out, so the result may be partial
+    @abstractmethod
+    async def get_items(
+        self, ids: Sequence[int], addon: EnumAddons, lang: EnumLanguages
+    ) -> dict[int, WoWAPIItem | None]: ...
+
+    @abstractmethod
+    def get_stats(self) -> WoWAPIStats: ...
+
+    @abstractmethod
+    def get_negative_cache_stats(self) -> NegativeCacheStats: ...
+
+    @abstractmethod
+    def get_circuit_breaker_stats(self) -> CircuitBreakerStats: ...
+
     @abstractmethod
     async def close(self) -> None: ...
 
 
+@dataclass
+class RateLimiter:
+    # token bucket; waiters are served in arrival order
+    rate: float
+    burst: int
+    tokens: float = field(init=False)
+    updated_at: float = field(init=False)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def __post_init__(self) -> None:
+        self.tokens = self.burst
+        self.updated_at = 0
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            if self.updated_at:
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated_at) * self.rate
+                )
+            self.updated_at = now
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.tokens = 1
+                self.updated_at = loop.time()
+            self.tokens -= 1
+
+
+RETRY_STATUS_CODES = frozenset((429, 500, 502, 503, 504))
+ITEM_FIELDS = frozenset(('icon', 'htmlTooltip', 'link'))
+TAG_SPACES = re.compile(r'(<[^<>]*>)\s+(?=(<[^<>]*>))')
+# whitespace next to these tags never renders
+BLOCK_TAG = re.compile(r'</?(?:table|tbody|tr|td|th|div|br|p)\b', re.IGNORECASE)
+ResultType = TypeVar('ResultType')
+
+
+def minify_html(html: str) -> str:
+    # only whitespace between two tags is touched, text is kept as is
+    return TAG_SPACES.sub(_minify_tag_spaces, html).strip()
+
+
+def _minify_tag_spaces(match: re.Match[str]) -> str:
+    tag, next_tag = match.groups()
+    if BLOCK_TAG.match(tag) or BLOCK_TAG.match(next_tag):
+        return tag
+    return f'{tag} '
+
+
 @dataclass
 class WoWHeadAPI(BaseAsyncWoWAPI[WoWHeadAPIConfig]):
 
     async def connect(self) -> Self:
-        self.client: httpx.AsyncClient = self.config.httpx_client
+        self.client: httpx.AsyncClient = self.config.httpx_client or httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.config.max_concurrency,
+                max_keepalive_connections=self.config.max_concurrency
+            )
+        )
+        self.semaphore = asyncio.Semaphore(self.config.max_concurrency)
+        self.rate_limiters: dict[str, RateLimiter] = {}
+        # ids WoWHead reported as missing are not asked for again for a while
+        self.negative_cache = NegativeCache(
+            max_size=self.config.negative_cache_max_size,
+            lifetime=self.config.negative_cache_lifetime
+        )
+        self.single_flight = SingleFlight()
+        self.circuit_breaker = CircuitBreaker(
+            window=self.config.circuit_breaker_window,
+            min_calls=self.config.circuit_breaker_min_calls,
+            failure_rate_threshold=self.config.circuit_breaker_failure_rate,
+            open_duration=self.config.circuit_breaker_open_duration,
+            half_open_probes=self.config.circuit_breaker_half_open_probes
+        )
+        self.stats = WoWAPIStats()
         return self
 
     async def get_item(
         self, id: int, addon: EnumAddons, lang: EnumLanguages
     ) -> WoWAPIItem | None:
-        url = self.config.url.format(
+        key = (id, addon, lang)
+        if key in self.negative_cache:
+            return None
+
+        async def fetch_item() -> WoWAPIItem | None:
+            item = await self._fetch(
+                self._get_url(id, addon, lang),
+                lambda response: self._read_item(response, id, addon, lang)
+            )
+            if item is None:
+                self.negative_cache.add(key)
+            return item
+
+        # concurrent callers asking for the same item share one request
+        return await self.single_flight.run(key, fetch_item)
+
+    async def get_items(
+        self, ids: Sequence[int], addon: EnumAddons, lang: EnumLanguages
+    ) -> dict[int, WoWAPIItem | None]:
+        unique_ids = list(dict.fromkeys(ids))
+        results = await asyncio.gather(
+            *(self.get_item(id, addon, lang) for id in unique_ids),
+            return_exceptions=True
+        )
+        items: dict[int, WoWAPIItem | None] = {}
+        for id, result in zip(unique_ids, results):
+            if isinstance(result, WoWAPIError):
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            items[id] = result
+        return items
+
+    def get_stats(self) -> WoWAPIStats:
+        return WoWAPIStats(**self.stats.__dict__)
+
+    def get_negative_cache_stats(self) -> NegativeCacheStats:
+        return self.negative_cache.get_stats()
+
+    def get_circuit_breaker_stats(self) -> CircuitBreakerStats:
+        return self.circuit_breaker.get_stats()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    def _get_url(self, id: int, addon: EnumAddons, lang: EnumLanguages) -> str:
+        return self.config.url.format(
             id=id,
             addon=addon.value if addon != EnumAddons.retail else '',
             lang=lang.value if lang != EnumLanguages.en else ''
         )
-        response = await self.client.get(url)
+
+    async def _read_item(
+        self, response: httpx.Response, id: int, addon: EnumAddons,
+        lang: EnumLanguages
+    ) -> WoWAPIItem | None:
         if response.status_code != 200:  # noqa: WPS432
             return None
-
-        root = ET.fromstring(response.text)
-        item_elem = root.find('item')
-        if item_elem is None:
+        fields = await self._read_item_fields(response)
+        if fields is None:
             return None
 
         return WoWAPIItem(
             wow_id=int(id),
             addon=addon,
             lang=lang,
-            html_tooltip=item_elem.findtext('htmlTooltip', ''),
-            icon_url=self.config.icon_url.format(
-                icon=item_elem.findtext('icon', '')
-            ),
-            origin_link=item_elem.findtext('link', '')
+            html_tooltip=minify_html(fields.get('htmlTooltip', '')),
+            icon_url=self.config.icon_url.format(icon=fields.get('icon', '')),
+            origin_link=fields.get('link', '')
         )
 
-    async def close(self) -> None:
-        await self.client.aclose()
+    async def _read_item_fields(
+        self, response: httpx.Response
+    ) -> dict[str, str] | None:
+        # pull-parse the body as it arrives and stop parsing once the fields
+        # are read; elements already seen are cleared, so no full tree is kept.
+        # The rest of the body is still drained to keep the connection alive
+        parser = ET.XMLPullParser(events=('end',))
+        fields: dict[str, str] = {}
+        is_read = False
+        try:
+            async for chunk in response.aiter_bytes():
+                if is_read:
+                    continue
+                parser.feed(chunk)
+                for _, elem in parser.read_events():
+                    if elem.tag in ITEM_FIELDS:
+                        fields[elem.tag] = elem.text or ''
+                        is_read = len(fields) == len(ITEM_FIELDS)
+                    elif elem.tag == 'item':
+                        is_read = True
+                    elem.clear()
+                    if is_read:
+                        break
+            if not is_read:
+                parser.close()
+        except ET.ParseError as e:
+            self.config.logger.warning(f'WoWHead: bad response {response.url}: {e}')
+            raise WoWAPIError from e
+        return fields if is_read else None
+
+    async def _fetch(
+        self, url: str, read: Callable[[httpx.Response], Awaitable[ResultType]]
+    ) -> ResultType:
+        # retries 5xx, 429, timeouts and transport errors with jittered backoff;
+        # the deadline covers reading the body as well. While the circuit is
+        # open requests fail at once instead of waiting on a sick host
+        rate_limiter = self._get_rate_limiter(httpx.URL(url).host)
+        retry_after: str | None = None
+        for attempt in range(self.config.max_retries + 1):
+            if attempt:
+                self.stats.retries += 1
+                await asyncio.sleep(self._get_backoff(attempt, retry_after))
+                retry_after = None
+            async with self.semaphore:
+                if not self.circuit_breaker.allow():
+                    raise WoWAPIUnavailableError(f'Circuit to {url} is open')
+                success: bool | None = None
+                try:
+                    await rate_limiter.acquire()
+                    self.stats.requests += 1
+                    self.stats.in_flight += 1
+                    self.stats.max_in_flight = max(
+                        self.stats.max_in_flight, self.stats.in_flight
+                    )
+                    try:
+                        async with asyncio.timeout(self.config.request_timeout):
+                            async with self.client.stream('GET', url) as response:
+                                success = response.status_code not in RETRY_STATUS_CODES
+                                if success:
+                                    return await read(response)
+                                retry_after = response.headers.get('Retry-After')
+                    except (TimeoutError, httpx.TransportError) as e:
+                        success = False
+                        self.config.logger.info(
+                            f'WoWHead: {url} attempt {attempt}: {e!r}'
+                        )
+                        continue
+                    finally:
+                        self.stats.in_flight -= 1
+                finally:
+                    self._record_call(success)
+            self.config.logger.info(
+                f'WoWHead: {url} attempt {attempt}: {response.status_code}'
+            )
+
+        self.stats.failures += 1
+        self.config.logger.warning(
+            f'WoWHead: {url} failed after {attempt + 1} attempts'
+        )
+        raise WoWAPIError(f'Request to {url} failed')
+
+    def _record_call(self, success: bool | None) -> None:
+        state = self.circuit_breaker.state
+        if success is None:
+            self.circuit_breaker.release()
+        else:
+            self.circuit_breaker.record(success)
+        if self.circuit_breaker.state is not state:
+            self.config.logger.warning(
+                f'WoWHead: circuit {state.value} -> {self.circuit_breaker.state.value}'
+            )
+
+    def _get_rate_limiter(self, host: str) -> RateLimiter:
+        rate_limiter = self.rate_limiters.get(host)
+        if rate_limiter is None:
+            rate_limiter = RateLimiter(
+                self.config.rate_limit, self.config.rate_limit_burst
+            )
+            self.rate_limiters[host] = rate_limiter
+        return rate_limiter
+
+    def _get_backoff(self, attempt: int, retry_after: str | None) -> float:
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), self.config.retry_backoff_max)
+        # full jitter
+        backoff = self.config.retry_backoff * 2 ** attempt
+        return random.uniform(  # noqa: S311
+            0, min(backoff, self.config.retry_backoff_max)
+        )
@@ -0,0 +1,108 @@
+import time as clock
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+
+
+class CircuitState(Enum):
+    closed = 'closed'
+    open = 'open'
+    half_open = 'half_open'
+
+
+@dataclass
+class CircuitBreakerStats:
+    state: CircuitState = CircuitState.closed
+    failure_rate: float = 0.0
+    calls: int = 0
+    opened: int = 0
+    closed: int = 0
+    rejected: int = 0
+    probes: int = 0
+
+
+@dataclass
+class CircuitBreaker:
+    # opens when at least failure_rate_threshold of the calls made in the last
+    # `window` seconds failed, given at least min_calls of them. After
+    # open_duration up to half_open_probes calls go through: one failure
+    # opens the circuit again, all of them succeeding close it
+    window: float
+    min_calls: int
+    failure_rate_threshold: float
+    open_duration: float
+    half_open_probes: int = 1
+    state: CircuitState = CircuitState.closed
+    calls: deque[tuple[float, bool]] = field(default_factory=deque)
+    stats: CircuitBreakerStats = field(default_factory=CircuitBreakerStats)
+
+    def __post_init__(self) -> None:
+        self.failures = sum(failed for _, failed in self.calls)
+        self.opened_at = 0.0
+        self.probes_started = 0
+        self.probes_succeeded = 0
+
+    def allow(self) -> bool:
+        if self.state is CircuitState.open:
+            if clock.monotonic() - self.opened_at < self.open_duration:
+                self.stats.rejected += 1
+                return False
+            self._set_state(CircuitState.half_open)
+        if self.state is CircuitState.half_open:
+            if self.probes_started >= self.half_open_probes:
+                self.stats.rejected += 1
+                return False
+            self.probes_started += 1
+            self.stats.probes += 1
+        return True
+
+    def record(self, success: bool) -> None:
+        if self.state is CircuitState.half_open:
+            if not success:
+                self._set_state(CircuitState.open)
+                return
+            self.probes_succeeded += 1
+            if self.probes_succeeded >= self.half_open_probes:
+                self._set_state(CircuitState.closed)
+            return
+        if self.state is CircuitState.open:
+            # a call started before the circuit opened
+            return
+
+        now = clock.monotonic()
+        self.calls.append((now, not success))
+        self.failures += not success
+        self._expire(now)
+        if len(self.calls) >= self.min_calls and (
+            self.failures / len(self.calls) >= self.failure_rate_threshold
+        ):
+            self._set_state(CircuitState.open)
+
+    def release(self) -> None:
+        # an allowed call ended without a verdict, e.g. it was cancelled
+        if self.state is CircuitState.half_open and self.probes_started:
+            self.probes_started -= 1
+
+    def get_stats(self) -> CircuitBreakerStats:
+        self._expire(clock.monotonic())
+        self.stats.state = self.state
+        self.stats.calls = len(self.calls)
+        self.stats.failure_rate = self.failures / len(self.calls) if self.calls else 0.0
+        return CircuitBreakerStats(**self.stats.__dict__)
+
+    def _expire(self, now: float) -> None:
+        while self.calls and now - self.calls[0][0] > self.window:
+            _, failed = self.calls.popleft()
+            self.failures -= failed
+
+    def _set_state(self, state: CircuitState) -> None:
+        self.state = state
+        self.probes_started = 0
+        self.probes_succeeded = 0
+        if state is CircuitState.open:
+            self.opened_at = clock.monotonic()
+            self.stats.opened += 1
+        elif state is CircuitState.closed:
+            self.calls.clear()
+            self.failures = 0
+            self.stats.closed += 1
@@ -3,6 +3,8 @@ import logging
 import httpx
 from pydantic import BaseModel
 
+from app.types import Seconds
+
 
 class BaseWoWAPIConfig(BaseModel):
     logger: logging.Logger
@@ -14,4 +16,21 @@ class BaseWoWAPIConfig(BaseModel):
 
 
 class WoWHeadAPIConfig(BaseWoWAPIConfig):
-    httpx_client: httpx.AsyncClient = httpx.AsyncClient()
+    # built on connect with pool limits matching max_concurrency if not given
+    httpx_client: httpx.AsyncClient | None = None
+    max_concurrency: int = 8
+    rate_limit: float = 10  # requests per second to one host
+    rate_limit_burst: int = 10
+    request_timeout: float = 5
+    max_retries: int = 3
+    retry_backoff: float = 0.25
+    retry_backoff_max: float = 4
+    negative_cache_lifetime: Seconds = 300
+    negative_cache_max_size: int = 10000
+    # the circuit opens when circuit_breaker_failure_rate of the requests in
+    # the last circuit_breaker_window failed
+    circuit_breaker_window: float = 30
+    circuit_breaker_min_calls: int = 10
+    circuit_breaker_failure_rate: float = 0.5
+    circuit_breaker_open_duration: float = 30
+    circuit_breaker_half_open_probes: int = 3
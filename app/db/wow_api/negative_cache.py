@@ -0,0 +1,46 @@
+import time as clock
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Hashable
+
+
+@dataclass
+class NegativeCacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    size: int = 0
+
+
+@dataclass
+class NegativeCache:
+    # known-missing keys with a short lifetime, evicted least recently used
+    max_size: int
+    lifetime: float
+    entries: OrderedDict[Hashable, float] = field(default_factory=OrderedDict)
+    stats: NegativeCacheStats = field(default_factory=NegativeCacheStats)
+
+    def __contains__(self, key: Hashable) -> bool:
+        expires_at = self.entries.get(key)
+        if expires_at is None:
+            self.stats.misses += 1
+            return False
+        if expires_at <= clock.monotonic():
+            del self.entries[key]
+            self.stats.misses += 1
+            return False
+        self.entries.move_to_end(key)
+        self.stats.hits += 1
+        return True
+
+    def add(self, key: Hashable) -> None:
+        self.entries[key] = clock.monotonic() + self.lifetime
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        self.stats.stores += 1
+
+    def get_stats(self) -> NegativeCacheStats:
+        return NegativeCacheStats(
+            **{**self.stats.__dict__, 'size': len(self.entries)}
+        )
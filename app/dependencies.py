@@ -7,6 +7,7 @@ from app.config import Language
 from app.errors import litestar_raise
 from app.tokens.base import (BaseToken, BaseTokenConfig, DecodeTokenError,
                              TokenExpiredError)
+from app.tokens.cache import VerifiedTokenCache
 from app.tokens.payloads import AccessTokenPayload
 
 
@@ -20,11 +21,16 @@ def get_language(request: Request) -> Language:
 
 
 def auth_client(
-    request: Request, token_type: type[BaseToken], token_config: BaseTokenConfig
+    request: Request, token_type: type[BaseToken], token_config: BaseTokenConfig,
+    token_cache: VerifiedTokenCache
 ) -> AccessTokenPayload:
     try:
+        token = request.headers['Authorization'].split(' ', 1)[1]
+        payload = token_cache.get(token)
+        if payload is not None:
+            return payload
         access_token = token_type.decode(
-            token=request.headers['Authorization'].split(' ', 1)[1],
+            token=token,
             config=token_config,
             payload_type=AccessTokenPayload
         )
@@ -38,4 +44,5 @@ def auth_client(
     except KeyError:
         raise litestar_raise(error.AuthorizationHeaderMissing)
 
+    token_cache.add(token, access_token.payload)  # type: ignore
     return access_token.payload  # type: ignore
@@ -135,6 +135,24 @@ class DeleteTeamTokenInvalid(BaseError):
         'message': 'Delete team token is invalid'
     }
 
+
+class LogCursorInvalid(BaseError):
+    status_code: int = 422
+    detail: str = HTTPStatus(422).phrase
+    extra: dict = {
+        'error_code': 'inv-6',
+        'message': 'Log cursor is invalid'
+    }
+
+
+class QueueBatchInvalid(BaseError):
+    status_code: int = 422
+    detail: str = HTTPStatus(422).phrase
+    extra: dict = {
+        'error_code': 'inv-7',
+        'message': 'Queue batch must be non-empty, for one team and unique items'
+    }
+
 ###
 # uniq-X: Error codes for uniqueness violations
 ###
@@ -256,6 +274,15 @@ class RefreshTokenExpired(BaseError):
         'message': 'Refresh token expired'
     }
 
+
+class RefreshTokenRevoked(BaseError):
+    status_code: int = 401
+    detail: str = HTTPStatus(401).phrase
+    extra: dict = {
+        'error_code': 'exp-3',
+        'message': 'Refresh token was revoked'
+    }
+
 ###
 # other-X: Error codes for other types of errors
 ###
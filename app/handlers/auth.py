@@ -7,20 +7,22 @@ from litestar.response import Response
 
 from app import errors as error
 from app import openapi_tags as tags
-from app.config import (EMAIL_REGISTRATION_BODY, EMAIL_REGISTRATION_SUBJECT,
-                        AuthConfig, DataBase, Language, Mailer, TaskManager,
-                        Token, TokenConfigType)
+from app.config import (EMAIL_TEMPLATES, AuthConfig, DataBase, Hasher,
+                        Language, Outbox, TaskManager, Token, TokenConfigType,
+                        TokenFamilies)
 from app.db.exc import (ActivateUserError, InvalidCredentialsError,
                         UniqueEmailError, UniqueUsernameError)
 from app.errors import litestar_raise, litestar_response_spec
 from app.handlers.controller import BaseController
 from app.handlers.dto import AuthDTO, RegistrationDTO
-from app.mailers.base import NonExistentEmail
 from app.task_managers.base import TaskManagerError
 from app.tokens.base import (DecodeTokenError, RefreshTokenPayload,
                              TokenExpiredError, create_access_token,
                              create_refresh_token, create_registration_token,
-                             verify_registration_token)
+                             verify_refresh_token, verify_registration_token)
+from app.tokens.cache import VerifiedTokenCache
+from app.tokens.families import (RefreshTokenReusedError,
+                                 RefreshTokenRevokedError)
 from app.tokens.payloads import RegistrationTokenPayload
 
 
@@ -34,13 +36,14 @@ class AuthController(BaseController[AuthConfig]):
         ])
     }, tags=[tags.auth_handler])
     async def authentication(
-        self, db: DataBase, token_type: type[Token], token_config: TokenConfigType,
-        data: AuthDTO
+        self, db: DataBase, hasher: Hasher, token_type: type[Token],
+        token_config: TokenConfigType, token_families: TokenFamilies, data: AuthDTO
     ) -> Response[None]:
         try:
             user_id = await db.verify_username_password(
                 username=data.username,
-                password=data.password
+                password=data.password,
+                hasher=hasher
             )
         except InvalidCredentialsError:
             raise litestar_raise(error.InvalidCredentials)
@@ -55,9 +58,12 @@ class AuthController(BaseController[AuthConfig]):
         refresh_token = create_refresh_token(
             token_type=token_type,
             token_config=token_config,
-            exp=self.config.access_token_exp,
+            exp=self.config.refresh_token_exp,
             sub=user_id
         )
+        await token_families.start(
+            refresh_token.payload, self.config.refresh_token_exp  # type: ignore
+        )
 
         return Response(
             content=None,
@@ -71,15 +77,12 @@ class AuthController(BaseController[AuthConfig]):
         409: litestar_response_spec(examples=[
             Example('UsernameNotUnique', value=error.UsernameNotUnique()),
             Example('EmailNotUnique', value=error.EmailNotUnique())
-        ]),
-        422: litestar_response_spec(examples=[
-            Example('EmailNonExistent', value=error.EmailNonExists())
         ])
     }, tags=[tags.auth_handler])
     async def registration(
-        self, db: DataBase, mailer: Mailer, lang: Language, token_type: type[Token],
-        token_config: TokenConfigType, task_manager: TaskManager,
-        data: RegistrationDTO
+        self, db: DataBase, outbox: Outbox, hasher: Hasher, lang: Language,
+        token_type: type[Token], token_config: TokenConfigType,
+        task_manager: TaskManager, data: RegistrationDTO
     ) -> None:
         try:
             await db.is_user_username_email_unique(
@@ -98,21 +101,19 @@ class AuthController(BaseController[AuthConfig]):
             sub=data.username
         ).encode()
 
-        try:
-            await mailer.send(
-                subject=EMAIL_REGISTRATION_SUBJECT[lang],
-                body=EMAIL_REGISTRATION_BODY[lang].format(registration_token),
-                to_email=data.email
-            )
-        except NonExistentEmail:
-            raise litestar_raise(error.EmailNonExists)
-
+        # the email is committed with the user; an unverified user is deleted,
+        # also when the email is not delivered
         registration_user = await db.create_user(
             username=data.username,
             password=data.password,
             email=data.email,
-            is_active=False
+            is_active=False,
+            hasher=hasher,
+            outbox_email=EMAIL_TEMPLATES.render(
+                'registration', lang, to_email=data.email, token=registration_token
+            )
         )
+        outbox.notify()
         try:
             await task_manager.del_inactive_user(
                 user_id=registration_user.id,
@@ -132,7 +133,7 @@ class AuthController(BaseController[AuthConfig]):
     }, tags=[tags.auth_handler])
     async def verify_email(
         self, db: DataBase, token_type: type[Token], token_config: TokenConfigType,
-        registration_token: str
+        token_families: TokenFamilies, registration_token: str
     ) -> Response[None]:
         try:
             encode_registration_token = verify_registration_token(
@@ -162,9 +163,12 @@ class AuthController(BaseController[AuthConfig]):
         refresh_token = create_refresh_token(
             token_type=token_type,
             token_config=token_config,
-            exp=self.config.access_token_exp,
+            exp=self.config.refresh_token_exp,
             sub=user_id
         )
+        await token_families.start(
+            refresh_token.payload, self.config.refresh_token_exp  # type: ignore
+        )
 
         return Response(
             content=None,
@@ -178,12 +182,14 @@ class AuthController(BaseController[AuthConfig]):
     @get('/refresh', responses={
         401: litestar_response_spec(examples=[
             Example('RefreshTokenExpired', value=error.RefreshTokenExpired()),
+            Example('RefreshTokenRevoked', value=error.RefreshTokenRevoked()),
             Example('RefreshTokenInvalid', value=error.RefreshTokenInvalid()),
             Example('RefreshTokenMissing', value=error.RefreshTokenHeaderMissing())
         ])
     }, tags=[tags.auth_handler])
     async def refresh(
-        self, request: Request, token_type: type[Token], token_config: TokenConfigType
+        self, request: Request, token_type: type[Token], token_config: TokenConfigType,
+        token_families: TokenFamilies, token_cache: VerifiedTokenCache
     ) -> Response[None]:
         try:
             refresh_token = token_type.decode(
@@ -214,9 +220,24 @@ class AuthController(BaseController[AuthConfig]):
         new_refresh_token = create_refresh_token(
             token_type=token_type,
             token_config=token_config,
-            exp=self.config.access_token_exp,
-            sub=refresh_token_payload.sub
+            exp=self.config.refresh_token_exp,
+            sub=refresh_token_payload.sub,
+            family_id=refresh_token_payload.fid
         )
+        try:
+            await token_families.rotate(
+                refresh_token_payload,
+                new_refresh_token.payload,  # type: ignore
+                self.config.refresh_token_exp
+            )
+        except RefreshTokenReusedError:
+            # the family may be in the wrong hands; its subject's access
+            # tokens are no longer served from the verified token cache
+            token_cache.revoke_subject(refresh_token_payload.sub)
+            raise litestar_raise(error.RefreshTokenRevoked)
+        except RefreshTokenRevokedError:
+            raise litestar_raise(error.RefreshTokenRevoked)
+
         return Response(
             content=None,
             headers={
@@ -224,3 +245,34 @@ class AuthController(BaseController[AuthConfig]):
                 'X-New-Refresh-Token': new_refresh_token.encode()
             }
         )
+
+    @post('/logout', responses={
+        401: litestar_response_spec(examples=[
+            Example('RefreshTokenInvalid', value=error.RefreshTokenInvalid()),
+            Example('RefreshTokenMissing', value=error.RefreshTokenHeaderMissing())
+        ])
+    }, tags=[tags.auth_handler])
+    async def logout(
+        self, request: Request, token_type: type[Token], token_config: TokenConfigType,
+        token_families: TokenFamilies, token_cache: VerifiedTokenCache
+    ) -> None:
+        try:
+            refresh_token = verify_refresh_token(
+                token=request.headers['Refresh-Token'],
+                token_type=token_type,
+                token_config=token_config
+            )
+
+        except TokenExpiredError:
+            return
+
+        except DecodeTokenError:
+            raise litestar_raise(error.RefreshTokenInvalid)
+
+        except KeyError:
+            raise litestar_raise(error.RefreshTokenHeaderMissing)
+
+        await token_families.revoke(
+            refresh_token.payload, self.config.refresh_token_exp  # type: ignore
+        )
+        token_cache.revoke_subject(refresh_token.payload.sub)  # type: ignore
@@ -1,9 +1,10 @@
-from typing import Generic, TypeVar
+from typing import Any, Generic, Mapping, TypeVar
 
 from litestar.controller import Controller
 
-from app.config import BaseConfig, Language
+from app.config import BaseConfig, Cache, CacheKeys, DataBase, Language
 from app.db.enums import EnumLanguages
+from app.types import TeamId
 
 ConfigType = TypeVar('ConfigType', bound=BaseConfig)
 
@@ -17,3 +18,35 @@ class BaseController(Controller, Generic[ConfigType]):
             return EnumLanguages(lang.value)
         except ValueError:
             return EnumLanguages.en
+
+    async def drop_full_team_cache(
+        self, db: DataBase, cache: Cache, cache_keys: CacheKeys, team_id: TeamId
+    ) -> None:
+        await cache.del_key(cache_keys.full_team.format(team_id))
+        await self.store_team_version(db, cache, cache_keys, team_id)
+
+    async def patch_full_team_cache(
+        self, db: DataBase, cache: Cache, cache_keys: CacheKeys, team_id: TeamId,
+        fragments: Mapping[str, Any]
+    ) -> None:
+        # the version read after the write is committed; a cached full team
+        # that is not one version behind it is dropped instead of patched
+        version = await db.get_team_version(team_id)
+        await cache.patch_document(
+            cache_keys.full_team.format(team_id), fragments, version
+        )
+        await cache.set_version(
+            cache_keys.team_version.format(team_id), version,
+            cache_keys.team_version_lifetime
+        )
+
+    async def store_team_version(
+        self, db: DataBase, cache: Cache, cache_keys: CacheKeys, team_id: TeamId
+    ) -> None:
+        # read after the write is committed; deleting the key instead would
+        # let a reader that loaded the old version put it back
+        await cache.set_version(
+            cache_keys.team_version.format(team_id),
+            await db.get_team_version(team_id),
+            cache_keys.team_version_lifetime
+        )
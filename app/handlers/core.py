@@ -1,9 +1,11 @@
 # flake8-in-file-ignores: noqa: B904, WPS110, WPS400
 
-import ast
-
+from litestar import status_codes as status
+from litestar.enums import MediaType
 from litestar.handlers import get
 from litestar.openapi.spec import Example
+from litestar.params import Parameter
+from litestar.response import Response
 
 from app import errors as error
 from app import openapi_tags as tags
@@ -13,6 +15,7 @@ from app.errors import litestar_raise, litestar_response_spec
 from app.handlers.controller import BaseController
 from app.handlers.dto import (FullTeamDTO, QueueDTO, QueueListDTO, RaiderDTO,
                               TeamDTO, UserDTO)
+from app.types import TeamId
 
 
 class CoreController(BaseController[CoreConfig]):
@@ -25,8 +28,9 @@ class CoreController(BaseController[CoreConfig]):
         ])
     }, tags=[tags.core_handler])
     async def get_team(
-        self, db: DataBase, cache: Cache, cache_keys: CacheKeys, team_name: str
-    ) -> FullTeamDTO:
+        self, db: DataBase, cache: Cache, cache_keys: CacheKeys, team_name: str,
+        if_none_match: str | None = Parameter(header='If-None-Match', default=None)
+    ) -> Response[FullTeamDTO]:
         try:
             team_id = await cache.get(
                 cache_keys.team_name.format(team_name)
@@ -34,55 +38,99 @@ class CoreController(BaseController[CoreConfig]):
             if not team_id:
                 team_id = await db.get_team_id_by_name(team_name)
                 await cache.set(
-                    cache_keys.team_name.format(team_name), team_id
+                    cache_keys.team_name.format(team_name), team_id,
+                    cache_keys.team_name_lifetime
                 )
 
-            full_team_cache = await cache.get(
-                cache_keys.full_team.format(team_id)
-            )
-            if not full_team_cache:
-                team, queues = await db.get_full_team(team_id)
-                full_team = FullTeamDTO(
-                    team=TeamDTO(
-                        id=team.id,
-                        name=team.name,
-                        addon=team.addon,
-                        is_vip=team.is_vip,
-                        vip_end=team.vip_end,
-                        owner_id=team.owner_id
-                    ),
-                    owner=UserDTO(
-                        id=team.owner.id,
-                        username=team.owner.username,
-                        email=team.owner.email,
-                        is_active=team.owner.is_active
-                    ),
-                    queues=[
-                        QueueListDTO(
-                            team_id=team.id,
-                            wow_item_id=queue[0].wow_item_id,
-                            queue=[
-                                QueueDTO(
-                                    position=index.position,
-                                    raider=RaiderDTO(
-                                        id=index.raider.id,
-                                        name=index.raider.name,
-                                        team_id=index.raider.team_id,
-                                        class_name=index.raider.class_name,
-                                        is_active=index.raider.is_active
-                                    ),
-                                ) for index in queue
-                            ]
-                        ) for queue in queues
-                    ]
+            # the latest version answers a matching poll without the document;
+            # a served document carries the version it was read at
+            version = await cache.get(cache_keys.team_version.format(team_id))
+            if not version:
+                version = await db.get_team_version(team_id)
+                await cache.set_version(
+                    cache_keys.team_version.format(team_id), version,
+                    cache_keys.team_version_lifetime
                 )
-                await cache.set(
-                    cache_keys.full_team.format(team_id), str(full_team.model_dump())
+            etag = get_etag(team_id, version)
+            if if_none_match and is_etag_matched(if_none_match, etag):
+                return Response(
+                    content=None, status_code=status.HTTP_304_NOT_MODIFIED,
+                    headers={'ETag': etag}
                 )
-            else:
-                full_team = FullTeamDTO(**ast.literal_eval(full_team_cache))
 
-            return full_team
+            full_team, full_team_version = await cache.get_or_build_document_json(
+                cache_keys.full_team.format(team_id), 'queues',
+                lambda: build_full_team(db, cache_keys, team_id),
+                time=cache_keys.full_team_lifetime,
+                soft_time=cache_keys.full_team_soft_lifetime
+            )
+            return Response(
+                content=full_team, media_type=MediaType.JSON,
+                headers={'ETag': get_etag(team_id, full_team_version)}
+            )
 
         except TeamsNotExistsError:
             raise litestar_raise(error.TeamNotExists)
+
+
+def get_etag(team_id: TeamId, version: int | str) -> str:
+    return f'"{team_id}-{version}"'
+
+
+def is_etag_matched(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison
+    return any(
+        tag == '*' or tag.removeprefix('W/') == etag
+        for tag in map(str.strip, if_none_match.split(','))
+    )
+
+
+async def build_full_team(
+    db: DataBase, cache_keys: CacheKeys, team_id: TeamId
+) -> tuple[dict, dict, int]:
+    # full team without queues, its queues by cache fragment name and the team
+    # version they were read at
+    team, queues = await db.get_full_team(team_id)
+    full_team = FullTeamDTO(
+        team=TeamDTO(
+            id=team.id,
+            name=team.name,
+            addon=team.addon,
+            is_vip=team.is_vip,
+            vip_end=team.vip_end,
+            owner_id=team.owner_id
+        ),
+        owner=UserDTO(
+            id=team.owner.id,
+            username=team.owner.username,
+            email=team.owner.email,
+            is_active=team.owner.is_active
+        ),
+        queues=[
+            QueueListDTO(
+                team_id=team.id,
+                wow_item_id=queue[0].wow_item_id,
+                queue=[
+                    QueueDTO(
+                        position=index.position,
+                        raider=RaiderDTO(
+                            id=index.raider.id,
+                            name=index.raider.name,
+                            team_id=index.raider.team_id,
+                            class_name=index.raider.class_name,
+                            is_active=index.raider.is_active
+                        ),
+                    ) for index in queue
+                ]
+            ) for queue in queues
+        ]
+    )
+    return (
+        full_team.model_dump(mode='json', exclude={'queues'}),
+        {
+            cache_keys.full_team_queue.format(queue.wow_item_id):
+                queue.model_dump(mode='json')
+            for queue in full_team.queues
+        },
+        team.version
+    )
@@ -34,6 +34,7 @@ class ItemDTO(BaseDTO):
     html_tooltip: str
     icon_url: str
     origin_link: str
+    is_placeholder: bool = False
 
 
 class RaiderDTO(BaseDTO):
@@ -116,6 +117,8 @@ class LogListDTO(BaseDTO):
     wow_item_id: int | None
     limit: int | None
     offset: int | None
+    cursor: str | None = None
+    next_cursor: str | None = None
     logs: list[LogDTO]
 
 
@@ -35,7 +35,8 @@ class ItemController(BaseController[ItemConfig]):
                 lang=wow_item.lang,
                 html_tooltip=wow_item.html_tooltip,
                 icon_url=wow_item.icon_url,
-                origin_link=wow_item.origin_link
+                origin_link=wow_item.origin_link,
+                is_placeholder=wow_item.is_placeholder
             )
         except WoWItemNotFoundError:
             raise litestar_raise(error.ItemNotExists)
@@ -65,7 +66,8 @@ class ItemController(BaseController[ItemConfig]):
                 lang=wow_item.lang,
                 html_tooltip=wow_item.html_tooltip,
                 icon_url=wow_item.icon_url,
-                origin_link=wow_item.origin_link
+                origin_link=wow_item.origin_link,
+                is_placeholder=wow_item.is_placeholder
             )
         except WoWItemNotFoundError:
             raise litestar_raise(error.ItemNotExists)
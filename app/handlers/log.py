@@ -1,37 +1,69 @@
-import ast
+# flake8-in-file-ignores: noqa: B904
+
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
 
 from litestar.handlers import get
+from litestar.openapi.spec import Example
 
+from app import errors as error
 from app import openapi_tags as tags
 from app.config import DataBase, LogConfig
+from app.db.abc.models import LogProtocol
+from app.errors import litestar_raise, litestar_response_spec
 from app.handlers.controller import BaseController
 from app.handlers.dto import LogDTO, LogListDTO
-from app.types import TeamId
+from app.types import LogId, TeamId
 
 
 class LogController(BaseController[LogConfig]):
     config = LogConfig()
     path = '/log'
 
-    @get('/logs', tags=[tags.log_handler])
+    @get('/logs', responses={
+        422: litestar_response_spec(examples=[
+            Example('LogCursorInvalid', value=error.LogCursorInvalid())
+        ])
+    }, tags=[tags.log_handler])
     async def get_logs(
         self, db: DataBase, team_id: TeamId, limit: int | None = None,
-        offset: int | None = None, wow_item_id: int | None = None
+        offset: int | None = None, wow_item_id: int | None = None,
+        cursor: str | None = None
     ) -> LogListDTO:
+        logs = await db.get_logs(
+            team_id=team_id,
+            limit=limit,
+            offset=offset,
+            wow_item_id=wow_item_id,
+            after=self.decode_cursor(cursor) if cursor else None
+        )
         return LogListDTO(
             team_id=team_id,
             wow_item_id=wow_item_id,
             limit=limit,
             offset=offset,
+            cursor=cursor,
+            next_cursor=(
+                self.encode_cursor(logs[-1]) if limit and len(logs) == limit
+                else None
+            ),
             logs=[
                 LogDTO(
                     created_at=log.created_at,
-                    queue=ast.literal_eval(log.queue)
-                ) for log in await db.get_logs(
-                    team_id=team_id,
-                    limit=limit,
-                    offset=offset,
-                    wow_item_id=wow_item_id
-                )
+                    queue=log.queue  # type: ignore
+                ) for log in logs
             ]
         )
+
+    def encode_cursor(self, log: LogProtocol) -> str:
+        return urlsafe_b64encode(
+            f'{log.created_at.isoformat()} {log.id}'.encode()
+        ).decode()
+
+    def decode_cursor(self, cursor: str) -> tuple[datetime, LogId]:
+        try:
+            created_at, log_id = urlsafe_b64decode(cursor).decode().split(' ')
+            return datetime.fromisoformat(created_at), log_id
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise litestar_raise(error.LogCursorInvalid)
@@ -1,11 +1,18 @@
 # flake8-in-file-ignores: noqa: B904, WPS110, WPS400
 
+import asyncio
+from typing import AsyncGenerator
+
+import msgspec
 from litestar.handlers import delete, get, post
 from litestar.openapi.spec import Example
+from litestar.response import ServerSentEvent, ServerSentEventMessage
 
 from app import errors as error
 from app import openapi_tags as tags
-from app.config import DataBase, Language, QueueConfig, WoWAPI, Cache, CacheKeys
+from app.config import (Broker, Cache, CacheKeys, DataBase, Language,
+                        QueueConfig, WoWAPI)
+from app.db.abc.models import QueueProtocol
 from app.db.exc import (RaiderNotFoundError, TeamsNotExistsError,
                         WoWItemNotFoundError)
 from app.errors import litestar_raise, litestar_response_spec
@@ -19,6 +26,19 @@ class QueueController(BaseController[QueueConfig]):
     config = QueueConfig()
     path = '/queue'
 
+    @staticmethod
+    def queue_to_dto(queue: QueueProtocol) -> QueueDTO:
+        return QueueDTO(
+            position=queue.position,
+            raider=RaiderDTO(
+                id=queue.raider.id,
+                name=queue.raider.name,
+                team_id=queue.raider.team_id,
+                class_name=queue.raider.class_name,
+                is_active=queue.raider.is_active
+            ),
+        )
+
     @get('/', tags=[tags.queue_handler])
     async def get_queue(
         self, db: DataBase, team_id: TeamId, wow_item_id: int
@@ -27,20 +47,46 @@ class QueueController(BaseController[QueueConfig]):
             team_id=team_id,
             wow_item_id=wow_item_id,
             queue=[
-                QueueDTO(
-                    position=queue.position,
-                    raider=RaiderDTO(
-                        id=queue.raider.id,
-                        name=queue.raider.name,
-                        team_id=queue.raider.team_id,
-                        class_name=queue.raider.class_name,
-                        is_active=queue.raider.is_active
-                    ),
-                ) for queue
+                self.queue_to_dto(queue) for queue
                 in await db.get_queue_by_item(team_id, wow_item_id)
             ]
         )
 
+    @get('/stream', responses={
+        422: litestar_response_spec(examples=[
+            Example('TeamNotExists', value=error.TeamNotExists())
+        ])
+    }, tags=[tags.queue_handler])
+    async def stream_queue(
+        self, db: DataBase, broker: Broker, team_id: TeamId
+    ) -> ServerSentEvent:
+        try:
+            await db.get_team(team_id)
+        except TeamsNotExistsError:
+            raise litestar_raise(error.TeamNotExists)
+
+        return ServerSentEvent(self.queue_events(broker, team_id))
+
+    async def queue_events(
+        self, broker: Broker, team_id: TeamId
+    ) -> AsyncGenerator[ServerSentEventMessage, None]:
+        async with broker.subscribe(team_id) as subscription:
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        anext(subscription), self.config.stream_keepalive
+                    )
+                except asyncio.TimeoutError:
+                    yield ServerSentEventMessage(comment='keepalive')
+                    continue
+                except StopAsyncIteration:
+                    break
+                yield ServerSentEventMessage(data=message.decode(), event='queue')
+
+        if subscription.is_dropped:
+            # the client fell behind; it has to reload the full team
+            yield ServerSentEventMessage(event='dropped')
+
     @post('/', responses={
         401: litestar_response_spec(examples=[
             Example('AccessTokenInvalid', value=error.AccessTokenInvalid()),
@@ -58,7 +104,8 @@ class QueueController(BaseController[QueueConfig]):
     }, tags=[tags.queue_handler])
     async def update_queue(
         self, auth_client: AccessTokenPayload, db: DataBase, cache: Cache,
-        cache_keys: CacheKeys, lang: Language, wow_api: WoWAPI, data: CreateQueueDTO
+        cache_keys: CacheKeys, broker: Broker, lang: Language, wow_api: WoWAPI,
+        data: CreateQueueDTO
     ) -> QueueListDTO:
         try:
             team = await db.get_team_with_owner(data.team_id)
@@ -73,16 +120,7 @@ class QueueController(BaseController[QueueConfig]):
                 team_id=data.team_id,
                 wow_item_id=data.wow_item_id,
                 queue=[
-                    QueueDTO(
-                        position=queue.position,
-                        raider=RaiderDTO(
-                            id=queue.raider.id,
-                            name=queue.raider.name,
-                            team_id=queue.raider.team_id,
-                            class_name=queue.raider.class_name,
-                            is_active=queue.raider.is_active
-                        ),
-                    ) for queue
+                    self.queue_to_dto(queue) for queue
                     in await db.create_queue(
                         team_id=data.team_id,
                         wow_item_id=data.wow_item_id,
@@ -97,17 +135,110 @@ class QueueController(BaseController[QueueConfig]):
                 team_id=data.team_id,
                 user_id=auth_client.sub,
                 wow_item_id=data.wow_item_id,
-                queue=str([queue.model_dump() for queue in queue_list.queue])
+                queue=[queue.model_dump(mode='json') for queue in queue_list.queue]
             )
-            await cache.del_key(
-                cache_keys.full_team.format(team.id)
+            await self.patch_full_team_cache(
+                db, cache, cache_keys, team.id,
+                {
+                    cache_keys.full_team_queue.format(data.wow_item_id): (
+                        queue_list.model_dump(mode='json') if queue_list.queue else None
+                    )
+                }
             )
+            await broker.publish(team.id, msgspec.json.encode({
+                'op': 'set',
+                'wow_item_id': data.wow_item_id,
+                'raiders': [queue.raider.id for queue in queue_list.queue]
+            }))
             return queue_list
         except RaiderNotFoundError:
             raise litestar_raise(error.RaiderNotExists)
         except WoWItemNotFoundError:
             raise litestar_raise(error.ItemNotExists)
 
+    @post('/batch', responses={
+        401: litestar_response_spec(examples=[
+            Example('AccessTokenInvalid', value=error.AccessTokenInvalid()),
+            Example('AccessTokenExpired', value=error.AccessTokenExpired()),
+            Example('AuthorizationHeaderMissing', value=error.AuthorizationHeaderMissing())  # noqa
+        ]),
+        403: litestar_response_spec(examples=[
+            Example('UserNotTeamOwner', value=error.UserNotTeamOwner())
+        ]),
+        422: litestar_response_spec(examples=[
+            Example('QueueBatchInvalid', value=error.QueueBatchInvalid()),
+            Example('TeamNotExists', value=error.TeamNotExists()),
+            Example('RaiderNotExists', value=error.RaiderNotExists()),
+            Example('ItemNotExists', value=error.ItemNotExists())
+        ])
+    }, tags=[tags.queue_handler])
+    async def update_queues(
+        self, auth_client: AccessTokenPayload, db: DataBase, cache: Cache,
+        cache_keys: CacheKeys, broker: Broker, lang: Language, wow_api: WoWAPI,
+        data: list[CreateQueueDTO]
+    ) -> list[QueueListDTO]:
+        # all queues are replaced in one transaction; the team is checked,
+        # logged, invalidated and versioned once for the whole batch
+        team_ids = {queue.team_id for queue in data}
+        wow_item_ids = {queue.wow_item_id for queue in data}
+        if len(team_ids) != 1 or len(wow_item_ids) != len(data):
+            raise litestar_raise(error.QueueBatchInvalid)
+        team_id = team_ids.pop()
+
+        try:
+            team = await db.get_team_with_owner(team_id)
+        except TeamsNotExistsError:
+            raise litestar_raise(error.TeamNotExists)
+
+        if team.owner.id != auth_client.sub:
+            raise litestar_raise(error.UserNotTeamOwner)
+
+        try:
+            queues = await db.create_queues(
+                team_id=team_id,
+                queues={queue.wow_item_id: queue.raiders for queue in data},
+                addon=team.addon,
+                lang=self.lang_to_enumlang(lang),
+                wow_api=wow_api
+            )
+        except RaiderNotFoundError:
+            raise litestar_raise(error.RaiderNotExists)
+        except WoWItemNotFoundError:
+            raise litestar_raise(error.ItemNotExists)
+
+        queue_lists = [
+            QueueListDTO(
+                team_id=team_id,
+                wow_item_id=wow_item_id,
+                queue=[self.queue_to_dto(queue) for queue in queue]
+            ) for wow_item_id, queue in queues.items()
+        ]
+        await db.create_logs(
+            team_id=team_id,
+            user_id=auth_client.sub,
+            queues={
+                queue_list.wow_item_id: [
+                    queue.model_dump(mode='json') for queue in queue_list.queue
+                ] for queue_list in queue_lists
+            }
+        )
+        await self.patch_full_team_cache(
+            db, cache, cache_keys, team_id,
+            {
+                cache_keys.full_team_queue.format(queue_list.wow_item_id): (
+                    queue_list.model_dump(mode='json') if queue_list.queue else None
+                ) for queue_list in queue_lists
+            }
+        )
+        await asyncio.gather(*(
+            broker.publish(team_id, msgspec.json.encode({
+                'op': 'set',
+                'wow_item_id': queue_list.wow_item_id,
+                'raiders': [queue.raider.id for queue in queue_list.queue]
+            })) for queue_list in queue_lists
+        ))
+        return queue_lists
+
     @delete('/', responses={
         401: litestar_response_spec(examples=[
             Example('AccessTokenInvalid', value=error.AccessTokenInvalid()),
@@ -124,7 +255,7 @@ class QueueController(BaseController[QueueConfig]):
     }, tags=[tags.queue_handler])
     async def delete_queue(
         self, auth_client: AccessTokenPayload, db: DataBase, cache: Cache,
-        cache_keys: CacheKeys, team_id: TeamId, wow_item_id: int
+        cache_keys: CacheKeys, broker: Broker, team_id: TeamId, wow_item_id: int
     ) -> None:
         try:
             owner = await db.get_team_owner(team_id)
@@ -137,8 +268,12 @@ class QueueController(BaseController[QueueConfig]):
         if not await db.is_queue_exists(team_id, wow_item_id):
             raise litestar_raise(error.QueueNotExists)
 
-        await cache.del_key(
-            cache_keys.full_team.format(team_id)
-        )
-
         await db.del_queue(team_id, wow_item_id)
+
+        await self.patch_full_team_cache(
+            db, cache, cache_keys, team_id,
+            {cache_keys.full_team_queue.format(wow_item_id): None}
+        )
+        await broker.publish(team_id, msgspec.json.encode({
+            'op': 'del', 'wow_item_id': wow_item_id
+        }))
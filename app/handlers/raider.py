@@ -5,7 +5,7 @@ from litestar.openapi.spec import Example
 
 from app import errors as error
 from app import openapi_tags as tags
-from app.config import DataBase, RaiderConfig
+from app.config import Cache, CacheKeys, DataBase, RaiderConfig
 from app.db.exc import (RaiderNotFoundError, RaiderNotUnique,
                         TeamsNotExistsError)
 from app.errors import litestar_raise, litestar_response_spec
@@ -54,8 +54,8 @@ class RaiderController(BaseController[RaiderConfig]):
         ])
     }, tags=[tags.raider_handler])
     async def create_raider(
-        self, auth_client: AccessTokenPayload, db: DataBase,
-        data: CreateRaiderDTO
+        self, auth_client: AccessTokenPayload, db: DataBase, cache: Cache,
+        cache_keys: CacheKeys, data: CreateRaiderDTO
     ) -> RaiderDTO:
         try:
             owner = await db.get_team_owner(data.team_id)
@@ -74,6 +74,7 @@ class RaiderController(BaseController[RaiderConfig]):
             )
         except RaiderNotUnique:
             raise litestar_raise(error.RaiderNotUnique)
+        await self.drop_full_team_cache(db, cache, cache_keys, data.team_id)
 
         return RaiderDTO(
             id=raider.id,
@@ -95,7 +96,8 @@ class RaiderController(BaseController[RaiderConfig]):
         ])
     }, tags=[tags.raider_handler])
     async def delete_raider(
-        self, auth_client: AccessTokenPayload, db: DataBase, raider_id: RaiderId
+        self, auth_client: AccessTokenPayload, db: DataBase, cache: Cache,
+        cache_keys: CacheKeys, raider_id: RaiderId
     ) -> None:
         try:
             raider = await db.get_raider(raider_id)
@@ -107,3 +109,4 @@ class RaiderController(BaseController[RaiderConfig]):
             raise litestar_raise(error.UserNotTeamOwner)
 
         await db.set_raider_inactive(raider_id)
+        await self.drop_full_team_cache(db, cache, cache_keys, raider.team_id)
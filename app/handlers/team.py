@@ -5,15 +5,13 @@ from litestar.openapi.spec import Example
 
 from app import errors as error
 from app import openapi_tags as tags
-from app.config import (EMAIL_DELETE_TEAM_BODY, EMAIL_DELETE_TEAM_SUBJECT,
-                        DataBase, Language, Mailer, TeamConfig, Token,
-                        TokenConfigType)
+from app.config import (EMAIL_TEMPLATES, Cache, CacheKeys, DataBase, Hasher,
+                        Language, Outbox, TeamConfig, Token, TokenConfigType)
 from app.db.exc import TeamsNotExistsError, UniqueTeamNameError
 from app.dependencies import DecodeTokenError
 from app.errors import litestar_raise, litestar_response_spec
 from app.handlers.controller import BaseController
 from app.handlers.dto import CreateTeamDTO, TeamDTO, UpdateTeamDTO
-from app.mailers.base import NonExistentEmail
 from app.tokens.base import (DeleteTeamTokenPayload, create_delete_team_token,
                              verify_delete_team_token)
 from app.tokens.payloads import AccessTokenPayload
@@ -73,7 +71,8 @@ class TeamController(BaseController[TeamConfig]):
         ])
     }, tags=[tags.team_handler])
     async def create_team(
-        self, auth_client: AccessTokenPayload, db: DataBase, data: CreateTeamDTO
+        self, auth_client: AccessTokenPayload, db: DataBase, hasher: Hasher,
+        data: CreateTeamDTO
     ) -> TeamDTO:
         if data.name in self.config.restricted_name_list:
             raise litestar_raise(error.TeamNameNotUnique)
@@ -84,6 +83,7 @@ class TeamController(BaseController[TeamConfig]):
                 addon=data.addon,
                 owner_id=auth_client.sub,
                 password=data.password,
+                hasher=hasher
             )
         except UniqueTeamNameError:
             raise litestar_raise(error.TeamNameNotUnique)
@@ -111,8 +111,8 @@ class TeamController(BaseController[TeamConfig]):
         ])
     }, tags=[tags.team_handler])
     async def update_team(
-        self, db: DataBase, auth_client: AccessTokenPayload, team_id: str,
-        data: UpdateTeamDTO
+        self, db: DataBase, hasher: Hasher, cache: Cache, cache_keys: CacheKeys,
+        auth_client: AccessTokenPayload, team_id: str, data: UpdateTeamDTO
     ) -> TeamDTO:
         try:
             owner = await db.get_team_owner(team_id)
@@ -127,10 +127,12 @@ class TeamController(BaseController[TeamConfig]):
 
         team = await db.update_team(
             id=team_id,
+            hasher=hasher,
             name=data.name,
             addon=data.addon,
             password=data.password
         )
+        await self.drop_full_team_cache(db, cache, cache_keys, team_id)
         return TeamDTO(
             id=team.id,
             name=team.name,
@@ -150,12 +152,11 @@ class TeamController(BaseController[TeamConfig]):
             Example('UserNotTeamOwner', value=error.UserNotTeamOwner())
         ]),
         422: litestar_response_spec(examples=[
-            Example('EmailNonExistent', value=error.EmailNonExists()),
             Example('TeamNotExists', value=error.TeamNotExists())
         ])
     }, tags=[tags.team_handler])
     async def delete_request_team(
-        self, auth_client: AccessTokenPayload, db: DataBase, mailer: Mailer,
+        self, auth_client: AccessTokenPayload, db: DataBase, outbox: Outbox,
         token_type: type[Token], token_config: TokenConfigType, lang: Language,
         team_name: str
     ) -> None:
@@ -174,16 +175,10 @@ class TeamController(BaseController[TeamConfig]):
             sub=team.id
         )
 
-        try:
-            await mailer.send(
-                subject=EMAIL_DELETE_TEAM_SUBJECT[lang],
-                body=EMAIL_DELETE_TEAM_BODY[lang].format(
-                    delete_team_token.encode()
-                ),
-                to_email=team.owner.email
-            )
-        except NonExistentEmail:
-            raise litestar_raise(error.EmailNonExists)
+        await outbox.send(EMAIL_TEMPLATES.render(
+            'delete_team', lang, to_email=team.owner.email,
+            token=delete_team_token.encode()
+        ))
 
     @delete('delete/{delete_team_token:str}', responses={
         401: litestar_response_spec(examples=[
@@ -5,14 +5,12 @@ from litestar.openapi.spec import Example
 
 from app import errors as error
 from app import openapi_tags as tags
-from app.config import (EMAIL_CHANGE_PASSWORD_BODY,
-                        EMAIL_CHANGE_PASSWORD_SUBJECT, DataBase, Language,
-                        Mailer, Token, TokenConfigType, UserConfig)
+from app.config import (EMAIL_TEMPLATES, DataBase, Hasher, Language, Outbox,
+                        Token, TokenConfigType, UserConfig)
 from app.db.exc import UserNotFoundError
 from app.errors import litestar_raise, litestar_response_spec
 from app.handlers.controller import BaseController
 from app.handlers.dto import ChangeUserPasswordDTO, UserDTO
-from app.mailers.base import NonExistentEmail
 from app.tokens.base import (ChangePasswordTokenPayload, DecodeTokenError,
                              create_change_password_token,
                              verify_change_password_token)
@@ -69,12 +67,11 @@ class UserController(BaseController[UserConfig]):
             Example('AuthorizationHeaderMissing', value=error.AuthorizationHeaderMissing())  # noqa
         ]),
         422: litestar_response_spec(examples=[
-            Example('UserNotExists', value=error.UserNotExists()),
-            Example('EmailNonExistent', value=error.EmailNonExists())
+            Example('UserNotExists', value=error.UserNotExists())
         ])
     }, tags=[tags.user_handler])
     async def change_password_request(
-        self, auth_client: AccessTokenPayload, db: DataBase, mailer: Mailer,
+        self, auth_client: AccessTokenPayload, db: DataBase, outbox: Outbox,
         lang: Language, token_type: type[Token], token_config: TokenConfigType
     ) -> None:
         try:
@@ -89,16 +86,10 @@ class UserController(BaseController[UserConfig]):
             sub=auth_client.sub
         )
 
-        try:
-            await mailer.send(
-                subject=EMAIL_CHANGE_PASSWORD_SUBJECT[lang],
-                body=EMAIL_CHANGE_PASSWORD_BODY[lang].format(
-                    change_password_token.encode()
-                ),
-                to_email=user_email
-            )
-        except NonExistentEmail:
-            raise litestar_raise(error.EmailNonExists)
+        await outbox.send(EMAIL_TEMPLATES.render(
+            'change_password', lang, to_email=user_email,
+            token=change_password_token.encode()
+        ))
 
     @patch('change-password/{change_password_token:str}', responses={
         401: litestar_response_spec(examples=[
@@ -114,9 +105,9 @@ class UserController(BaseController[UserConfig]):
         ])
     }, tags=[tags.user_handler])
     async def change_password(
-        self, auth_client: AccessTokenPayload, db: DataBase, token_type: type[Token],
-        token_config: TokenConfigType, data: ChangeUserPasswordDTO,
-        change_password_token: str
+        self, auth_client: AccessTokenPayload, db: DataBase, hasher: Hasher,
+        token_type: type[Token], token_config: TokenConfigType,
+        data: ChangeUserPasswordDTO, change_password_token: str
     ) -> None:
         try:
             encode_change_password_token = verify_change_password_token(
@@ -135,5 +126,6 @@ class UserController(BaseController[UserConfig]):
 
         await db.change_user_password(
             id=auth_client.sub,
-            new_password=data.password
+            new_password=data.password,
+            hasher=hasher
         )
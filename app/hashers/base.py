@@ -0,0 +1,117 @@
+import asyncio
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Generic, Self, TypeVar
+
+from passlib.context import CryptContext
+
+from app.hashers.configs import BaseHasherConfig, PasslibConfig
+
+
+class HasherError(Exception): ...
+
+
+HasherConfig = TypeVar('HasherConfig', bound=BaseHasherConfig)
+ResultType = TypeVar('ResultType')
+
+
+@dataclass
+class HasherStats:
+    in_flight: int = 0
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    completed: int = 0
+
+
+@dataclass
+class BaseAsyncHasher(ABC, Generic[HasherConfig]):
+    config: HasherConfig
+
+    @abstractmethod
+    async def connect(self) -> Self: ...
+
+    @abstractmethod
+    async def hash(self, password: str) -> str: ...
+
+    @abstractmethod
+    async def verify(self, password: str, hashed_password: str) -> bool: ...
+
+    @abstractmethod
+    def get_stats(self) -> HasherStats: ...
+
+    @abstractmethod
+    async def close(self) -> None: ...
+
+
+@lru_cache
+def _get_crypt_context(schemes: tuple[str, ...]) -> CryptContext:
+    return CryptContext(schemes=list(schemes), deprecated='auto')
+
+
+def _hash(schemes: tuple[str, ...], password: str) -> str:
+    return _get_crypt_context(schemes).hash(password)
+
+
+def _verify(schemes: tuple[str, ...], password: str, hashed_password: str) -> bool:
+    return _get_crypt_context(schemes).verify(password, hashed_password)
+
+
+@dataclass
+class PasslibAsyncHasher(BaseAsyncHasher[PasslibConfig]):
+
+    async def connect(self) -> Self:
+        self.schemes = tuple(self.config.schemes)
+        executor_type: type[Executor] = (
+            ProcessPoolExecutor if self.config.executor == 'process'
+            else ThreadPoolExecutor
+        )
+        self.executor = executor_type(max_workers=self.config.max_workers)
+        self.semaphore = asyncio.Semaphore(self.config.max_concurrency)
+        self.stats = HasherStats()
+        self.config.logger.info(f'Passlib: connect ({self.config.executor} pool)')
+        return self
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, self.schemes, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        try:
+            return await self._run(_verify, self.schemes, password, hashed_password)
+        except ValueError:
+            return False
+
+    def get_stats(self) -> HasherStats:
+        return HasherStats(**self.stats.__dict__)
+
+    async def close(self) -> None:
+        self.executor.shutdown(wait=True)
+        self.config.logger.info('Passlib: close')
+
+    async def _run(
+        self, func: Callable[..., ResultType], *args
+    ) -> ResultType:
+        self.stats.queue_depth += 1
+        self.stats.max_queue_depth = max(
+            self.stats.max_queue_depth, self.stats.queue_depth
+        )
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.stats.queue_depth -= 1
+
+        self.stats.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, func, *args
+            )
+        except ValueError:
+            raise
+        except Exception as e:
+            self.config.logger.warning(e, exc_info=True)
+            raise HasherError from e
+        finally:
+            self.stats.in_flight -= 1
+            self.stats.completed += 1
+            self.semaphore.release()
@@ -0,0 +1,18 @@
+import logging
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+
+class BaseHasherConfig(BaseModel):
+    logger: logging.Logger
+    max_concurrency: int = 4
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class PasslibConfig(BaseHasherConfig):
+    schemes: list[str] = Field(default_factory=lambda: ['bcrypt'])
+    executor: Literal['thread', 'process'] = 'thread'
+    max_workers: int = 4
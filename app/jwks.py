@@ -0,0 +1,22 @@
+"""Print the public JWT signing keys as a JWK set.
+
+Services that verify access tokens themselves load this set and pick the key
+by the token's `kid` header, so they never call the app:
+
+```bash
+python -m app.jwks > jwks.json
+```
+"""
+
+import json
+
+from app.config import TokenConfig
+from app.tokens.base import get_jwks
+
+
+def main() -> None:
+    print(json.dumps(get_jwks(TokenConfig), indent=2))
+
+
+if __name__ == '__main__':
+    main()
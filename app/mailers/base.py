@@ -1,8 +1,13 @@
+import asyncio
+import time as clock
 from abc import ABC, abstractmethod
+from base64 import encodebytes
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from typing import Generic, Self, TypeVar
+from email.header import Header
+from functools import lru_cache
+from typing import AsyncIterator, Generic, Self, Sequence, TypeVar
+from uuid import uuid4
 
 import aiosmtplib
 
@@ -16,6 +21,45 @@ class NonExistentEmail(MailerError): ...
 MailerConfig = TypeVar('MailerConfig', bound=BaseMailerConfig)
 
 
+@dataclass(frozen=True)
+class Email:
+    subject: str
+    body: str
+    to_email: str
+    html: str | None = None
+
+
+@lru_cache(256)
+def encode_header(value: str) -> str:
+    # subjects come from a few templates, each is encoded once
+    return Header(value, 'us-ascii' if value.isascii() else 'utf-8').encode()
+
+
+def build_message(email: Email, from_email: str) -> bytes:
+    # a multipart/alternative message with base64 UTF-8 parts, which is what
+    # email.mime builds at a fraction of the cost
+    if any(char in email.to_email for char in '\r\n'):
+        raise NonExistentEmail(f'Invalid email {email.to_email!r}')
+    boundary = f'==={uuid4().hex}'
+    parts = [
+        f'From: {from_email}\r\n'
+        f'To: {email.to_email}\r\n'
+        f'Subject: {encode_header(email.subject)}\r\n'
+        'MIME-Version: 1.0\r\n'
+        f'Content-Type: multipart/alternative; boundary="{boundary}"\r\n'
+    ]
+    for subtype, content in (('plain', email.body), ('html', email.html)):
+        if content is not None:
+            parts.append(
+                f'\r\n--{boundary}\r\n'
+                f'Content-Type: text/{subtype}; charset="utf-8"\r\n'
+                'Content-Transfer-Encoding: base64\r\n\r\n'
+                + encodebytes(content.encode()).decode()
+            )
+    parts.append(f'\r\n--{boundary}--\r\n')
+    return ''.join(parts).encode()
+
+
 @dataclass
 class BaseAsyncMailer(ABC, Generic[MailerConfig]):
     config: MailerConfig
@@ -25,27 +69,52 @@ class BaseAsyncMailer(ABC, Generic[MailerConfig]):
 
     @abstractmethod
     async def send(self, subject: str, body: str,
-                   to_email: str) -> None: ...
+                   to_email: str, html: str | None = None) -> None: ...
+
+    async def send_many(self, emails: Sequence[Email]) -> list[MailerError | None]:
+        # the error of every email that was not sent
+        errors: list[MailerError | None] = []
+        for email in emails:
+            try:
+                await self.send(email.subject, email.body, email.to_email, email.html)
+            except MailerError as e:
+                errors.append(e)
+            else:
+                errors.append(None)
+        return errors
 
     @abstractmethod
     async def close(self) -> None: ...
 
 
+@dataclass
+class SMTPSession:
+    smtp: aiosmtplib.SMTP
+    used_at: float = 0.0
+
+
 @dataclass
 class AsyncSMTPMailer(BaseAsyncMailer[SMTPConfig]):
+    # a pool of pool_size SMTP sessions, so concurrent sends do not queue up
+    # on one connection. A session idle for longer than health_check_interval
+    # is checked with NOOP before use; a dropped one is reconnected, and a
+    # send that fails on a dropped connection is retried on a fresh one
 
     async def connect(self) -> Self:
-        try:
-            self.smtp_session = aiosmtplib.SMTP(
+        self.sessions: asyncio.Queue[SMTPSession] = asyncio.Queue()
+        for _ in range(self.config.pool_size):
+            self.sessions.put_nowait(SMTPSession(aiosmtplib.SMTP(
                 hostname=self.config.smtp_server,
                 port=self.config.smtp_port,
                 username=self.config.smtp_user,
                 password=self.config.smtp_password,
                 use_tls=False,
                 start_tls=False
-            )
-            await self.smtp_session.connect()
-            await self.smtp_session.noop()
+            )))
+        try:
+            # fail fast on a misconfigured server, other sessions connect lazily
+            async with self._acquire() as session:
+                await session.smtp.noop()
             self.config.logger.info('SMTP: connect')
 
         except Exception as e:
@@ -54,24 +123,109 @@ class AsyncSMTPMailer(BaseAsyncMailer[SMTPConfig]):
 
         return self
 
-    async def send(self, subject: str, body: str, to_email: str) -> None:
+    async def send(
+        self, subject: str, body: str, to_email: str, html: str | None = None
+    ) -> None:
+        error, = await self.send_many([Email(subject, body, to_email, html)])
+        if error is not None:
+            raise error
+
+    async def send_many(self, emails: Sequence[Email]) -> list[MailerError | None]:
+        # one session sends the whole batch, so it is checked out and health
+        # checked once; a dropped connection resumes from the unsent email
+        messages: list[bytes | MailerError] = []
+        for email in emails:
+            try:
+                messages.append(build_message(email, self.config.self_email))
+            except NonExistentEmail as e:
+                messages.append(e)
+
+        errors: list[MailerError | None] = []
+        retries = self.config.send_retries
+        while len(errors) < len(messages):
+            try:
+                async with self._acquire() as session:
+                    while len(errors) < len(messages):
+                        errors.append(await self._send_message(
+                            session, emails[len(errors)].to_email, messages[len(errors)]
+                        ))
+
+            except (aiosmtplib.SMTPServerDisconnected, ConnectionError) as e:
+                if retries:
+                    retries -= 1
+                    self.config.logger.info(f'SMTP: {e}, retrying')
+                    continue
+                self._fail_unsent(errors, len(messages), e)
+
+            except Exception as e:
+                self._fail_unsent(errors, len(messages), e)
+
+        return errors
+
+    async def close(self) -> None:
+        while not self.sessions.empty():
+            session = self.sessions.get_nowait()
+            if session.smtp.is_connected:
+                session.smtp.close()
+        self.config.logger.info('SMTP: close')
+
+    @asynccontextmanager
+    async def _acquire(self) -> AsyncIterator[SMTPSession]:
+        session = await self.sessions.get()
         try:
-            msg = MIMEMultipart()
-            msg['From'] = self.config.self_email
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            msg.attach(MIMEText(body, 'plain'))
-            await self.smtp_session.send_message(msg)
+            await self._check_session(session)
+            yield session
+            session.used_at = clock.monotonic()
+        except (aiosmtplib.SMTPResponseException, aiosmtplib.SMTPRecipientsRefused):
+            # the server rejected the message, the session is still usable
+            raise
+        except BaseException:
+            if session.smtp.is_connected:
+                session.smtp.close()
+            raise
+        finally:
+            self.sessions.put_nowait(session)
+
+    async def _check_session(self, session: SMTPSession) -> None:
+        if session.smtp.is_connected and (
+            clock.monotonic() - session.used_at > self.config.health_check_interval
+        ):
+            try:
+                await session.smtp.noop()
+            except (aiosmtplib.SMTPException, ConnectionError):
+                session.smtp.close()
+        if not session.smtp.is_connected:
+            await session.smtp.connect()
+            self.config.logger.info('SMTP: session connected')
+        session.used_at = clock.monotonic()
+
+    async def _send_message(
+        self, session: SMTPSession, to_email: str, message: bytes | MailerError
+    ) -> MailerError | None:
+        if isinstance(message, MailerError):
+            return message
+        try:
+            await session.smtp.sendmail(self.config.self_email, [to_email], message)
 
         except aiosmtplib.SMTPRecipientsRefused as e:
             self.config.logger.debug('SMTP: Recipients refused')
-            raise NonExistentEmail from e
+            error: MailerError = NonExistentEmail(to_email)
+            error.__cause__ = e
+            return error
 
-        except Exception as e:
+        except aiosmtplib.SMTPResponseException as e:
             self.config.logger.warning(e, exc_info=True)
-            raise MailerError from e
-
-    async def close(self) -> None:
-        if self.smtp_session:
-            self.smtp_session.close()
-        self.config.logger.info('SMTP: close')
+            error = MailerError(to_email)
+            error.__cause__ = e
+            return error
+
+        return None
+
+    def _fail_unsent(
+        self, errors: list[MailerError | None], count: int, e: Exception
+    ) -> None:
+        self.config.logger.warning(e, exc_info=True)
+        while len(errors) < count:
+            error = MailerError(str(e))
+            error.__cause__ = e
+            errors.append(error)
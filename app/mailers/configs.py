@@ -2,6 +2,8 @@ import logging
 
 from pydantic import BaseModel
 
+from app.types import Seconds
+
 
 class BaseMailerConfig(BaseModel):
     self_email: str
@@ -16,3 +18,6 @@ class SMTPConfig(BaseMailerConfig):
     smtp_port: int
     smtp_user: str
     smtp_password: str
+    pool_size: int = 4
+    health_check_interval: Seconds = 30
+    send_retries: int = 1
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+from contextlib import suppress
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from app.db.abc.base import BaseAsyncDB
+from app.db.abc.models import OutboxEmailProtocol
+from app.mailers.base import (BaseAsyncMailer, Email, MailerError,
+                              NonExistentEmail)
+from app.types import Seconds
+
+
+@dataclass
+class MailOutboxStats:
+    enqueued: int = 0
+    sent: int = 0
+    retried: int = 0
+    failed: int = 0
+    queued: int = 0
+
+
+@dataclass
+class MailOutbox:
+    # mail is stored in the outbox table first, so a handler returns as soon
+    # as it is committed and nothing is lost on a restart. A dispatcher
+    # claims due emails in batches and hands them to `workers` senders that
+    # share the mailer's connection pool, each sending up to send_batch_size
+    # emails at a time with send_many. A sent email is deleted, a failed
+    # one is retried with exponential backoff and given up after max_attempts
+    # or a refused recipient. Delivery is at least once: an email claimed by
+    # a worker that died is claimed again when its lease is over
+    db: BaseAsyncDB
+    mailer: BaseAsyncMailer
+    logger: logging.Logger = field(default_factory=lambda: logging.getLogger('outbox'))
+    workers: int = 4
+    batch_size: int = 50
+    send_batch_size: int = 10
+    poll_interval: Seconds = 5
+    lease: timedelta = timedelta(minutes=5)
+    retry_delay: timedelta = timedelta(seconds=30)
+    max_attempts: int = 5
+    close_timeout: Seconds = 10
+    stats: MailOutboxStats = field(default_factory=MailOutboxStats)
+
+    async def connect(self) -> None:
+        self.queue: asyncio.Queue[OutboxEmailProtocol] = asyncio.Queue(
+            self.workers * self.send_batch_size
+        )
+        self.wakeup = asyncio.Event()
+        self.dispatcher = asyncio.create_task(self._dispatch())
+        self.senders = [
+            asyncio.create_task(self._work()) for _ in range(self.workers)
+        ]
+
+    async def send(self, email: Email) -> None:
+        await self.db.create_outbox_email(
+            email.subject, email.body, email.to_email, email.html
+        )
+        self.notify()
+
+    def notify(self) -> None:
+        # for an email the caller committed itself, e.g. along with its user
+        self.stats.enqueued += 1
+        self.wakeup.set()
+
+    async def close(self) -> None:
+        self.dispatcher.cancel()
+        with suppress(asyncio.CancelledError):
+            await self.dispatcher
+        # emails that are not sent in time stay claimed until their lease ends
+        with suppress(TimeoutError):
+            await asyncio.wait_for(self.queue.join(), self.close_timeout)
+        for sender in self.senders:
+            sender.cancel()
+        await asyncio.gather(*self.senders, return_exceptions=True)
+
+    def get_stats(self) -> MailOutboxStats:
+        self.stats.queued = self.queue.qsize()
+        return MailOutboxStats(**self.stats.__dict__)
+
+    async def _dispatch(self) -> None:
+        while True:
+            # cleared before claiming, so an email enqueued meanwhile wakes us
+            self.wakeup.clear()
+            try:
+                outbox_emails = await self.db.claim_outbox_emails(
+                    self.batch_size, self.lease
+                )
+            except Exception as e:
+                self.logger.error(f'Outbox: claim failed: {e}', exc_info=True)
+                outbox_emails = []
+
+            for outbox_email in outbox_emails:
+                await self.queue.put(outbox_email)
+            if len(outbox_emails) < self.batch_size:
+                with suppress(TimeoutError):
+                    await asyncio.wait_for(self.wakeup.wait(), self.poll_interval)
+
+    async def _work(self) -> None:
+        while True:
+            outbox_emails = [await self.queue.get()]
+            while len(outbox_emails) < self.send_batch_size and not self.queue.empty():
+                outbox_emails.append(self.queue.get_nowait())
+            try:
+                await self._send(outbox_emails)
+            except Exception as e:
+                # the emails are claimed again once their lease is over
+                self.logger.error(f'Outbox: {e}', exc_info=True)
+            finally:
+                for _ in outbox_emails:
+                    self.queue.task_done()
+
+    async def _send(self, outbox_emails: list[OutboxEmailProtocol]) -> None:
+        try:
+            errors = await self.mailer.send_many([
+                Email(
+                    subject=outbox_email.subject,
+                    body=outbox_email.body,
+                    to_email=outbox_email.to_email,
+                    html=outbox_email.html
+                ) for outbox_email in outbox_emails
+            ])
+        except Exception as e:
+            error = MailerError(repr(e))
+            errors = [error] * len(outbox_emails)
+
+        for outbox_email, error in zip(outbox_emails, errors):
+            if error is None:
+                continue
+            if isinstance(error, NonExistentEmail):
+                await self._fail(outbox_email, 'Recipient refused')
+            elif outbox_email.attempts >= self.max_attempts:
+                await self._fail(outbox_email, repr(error.__cause__ or error))
+            else:
+                await self.db.retry_outbox_email(
+                    outbox_email.id,
+                    self.retry_delay * 2 ** (outbox_email.attempts - 1),
+                    repr(error.__cause__ or error)
+                )
+                self.stats.retried += 1
+
+        sent_ids = [
+            outbox_email.id
+            for outbox_email, error in zip(outbox_emails, errors) if error is None
+        ]
+        if sent_ids:
+            await self.db.del_outbox_emails(sent_ids)
+            self.stats.sent += len(sent_ids)
+
+    async def _fail(self, outbox_email: OutboxEmailProtocol, error: str) -> None:
+        await self.db.fail_outbox_email(outbox_email.id, error)
+        self.stats.failed += 1
+        self.logger.warning(f'Outbox: {outbox_email.id} not sent: {error}')
@@ -0,0 +1,78 @@
+import html
+import re
+from dataclasses import dataclass, field
+from string import Formatter
+from typing import Hashable
+
+from app.mailers.base import Email
+
+URL_PATTERN = re.compile(r'https?://\S+')
+
+
+def compile_template(template: str) -> tuple[tuple[str, str | None], ...]:
+    # literal text and the name of the field that follows it
+    segments = []
+    for literal, field_name, format_spec, conversion in Formatter().parse(template):
+        if field_name is not None and (not field_name or format_spec or conversion):
+            raise ValueError(f'Only named fields are supported: {template!r}')
+        segments.append((literal, field_name))
+    return tuple(segments)
+
+
+def text_to_html(text: str) -> str:
+    # an HTML version of a text template: escaped lines as paragraphs and
+    # URLs, fields included, as links
+    paragraphs = []
+    for line in html.escape(text, quote=False).splitlines():
+        paragraphs.append('<p>{0}</p>'.format(
+            URL_PATTERN.sub(r'<a href="\g<0>">\g<0></a>', line)
+        ))
+    return '\n'.join(paragraphs)
+
+
+@dataclass
+class EmailTemplate:
+    # parsed once, so rendering is a join of the literals and the values.
+    # Values are escaped in the HTML part
+    subject: str
+    text: str
+    html: str | None = None
+
+    def __post_init__(self) -> None:
+        self.text_segments = compile_template(self.text)
+        self.html_segments = compile_template(self.html) if self.html else None
+
+    def render(self, to_email: str, **values: object) -> Email:
+        return Email(
+            subject=self.subject,
+            body=''.join(
+                literal + (str(values[name]) if name else '')
+                for literal, name in self.text_segments
+            ),
+            to_email=to_email,
+            html=''.join(
+                literal + (html.escape(str(values[name])) if name else '')
+                for literal, name in self.html_segments
+            ) if self.html_segments else None
+        )
+
+
+@dataclass
+class EmailTemplates:
+    # templates by name and language, falling back to default_lang
+    default_lang: Hashable
+    templates: dict[tuple[str, Hashable], EmailTemplate] = field(default_factory=dict)
+
+    def add(self, name: str, lang: Hashable, template: EmailTemplate) -> None:
+        self.templates[name, lang] = template
+
+    def get(self, name: str, lang: Hashable) -> EmailTemplate:
+        template = self.templates.get((name, lang))
+        if template is None:
+            return self.templates[name, self.default_lang]
+        return template
+
+    def render(
+        self, name: str, lang: Hashable, to_email: str, **values: object
+    ) -> Email:
+        return self.get(name, lang).render(to_email, **values)
@@ -1,5 +1,6 @@
 # flake8-in-file-ignores: noqa: WPS201, WPS202, WPS203
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from typing import AsyncIterator, NoReturn
@@ -9,11 +10,14 @@ from litestar import status_codes as status
 from litestar.di import Provide
 from litestar.exceptions import HTTPException
 
+from app.brokers.base import BaseAsyncBroker
 from app.caches.base import BaseAsyncTTLCache
-from app.config import (SERVICE_NAME, Cache, CacheConfig, CacheKeys, DataBase,
-                        DataBaseConfig, Mailer, MailerConfig, TaskManager,
-                        TaskManagerConfig, Token, TokenConfig, WoWAPI,
-                        WoWAPIConfig, cors_config, logging_config,
+from app.config import (SERVICE_NAME, AuthConfig, Broker, BrokerConfig, Cache,
+                        CacheConfig, CacheKeys, DataBase, DataBaseConfig,
+                        Hasher, HasherConfig, ItemConfig, Mailer,
+                        MailerConfig, Outbox, StatsConfig, TaskManager,
+                        TaskManagerConfig, Token, TokenConfig, TokenFamilies,
+                        WoWAPI, WoWAPIConfig, cors_config, logging_config,
                         openapi_config)
 from app.db.abc.base import BaseAsyncDB
 from app.db.exc import DatabaseError
@@ -27,10 +31,14 @@ from app.handlers.queue import QueueController
 from app.handlers.raider import RaiderController
 from app.handlers.team import TeamController
 from app.handlers.user import UserController
+from app.hashers.base import BaseAsyncHasher
 from app.mailers.base import BaseAsyncMailer, MailerError
+from app.mailers.outbox import MailOutbox
 from app.task_managers.base import BaseAsyncTaskManager, Tasks
 from app.tokens.base import BaseToken
+from app.tokens.cache import VerifiedTokenCache
 from app.tokens.configs import BaseTokenConfig
+from app.tokens.families import RefreshTokenFamilies
 from app.tokens.payloads import AccessTokenPayload
 from app.types import UserId
 
@@ -42,8 +50,11 @@ async def lifespan(app: Litestar) -> AsyncIterator[None]:  # noqa: WPS213
     app.state.db = DataBase(DataBaseConfig)
     app.state.cache = Cache(CacheConfig)
     app.state.cache_keys = CacheKeys()
+    app.state.broker = Broker(BrokerConfig)
     app.state.mailer = Mailer(MailerConfig)
+    app.state.outbox = Outbox(app.state.db, app.state.mailer)
     app.state.wow_api = WoWAPI(WoWAPIConfig)
+    app.state.hasher = Hasher(HasherConfig)
     app.state.task_manager = TaskManager(
         TaskManagerConfig,
         Tasks(
@@ -52,19 +63,34 @@ async def lifespan(app: Litestar) -> AsyncIterator[None]:  # noqa: WPS213
     )
     app.state.token_type = Token
     app.state.token_config = TokenConfig
+    app.state.token_families = TokenFamilies(app.state.cache)
+    app.state.token_cache = VerifiedTokenCache(
+        max_size=AuthConfig.verified_access_tokens_max_size
+    )
     await app.state.db.connect()
     await app.state.cache.connect()
+    await app.state.broker.connect()
     await app.state.mailer.connect()
     await app.state.wow_api.connect()
+    await app.state.hasher.connect()
     await app.state.task_manager.connect()
+    await app.state.outbox.connect()
+    backfill_task = asyncio.create_task(backfill_wow_items_task())
+    stats_task = asyncio.create_task(log_stats_task())
 
     logger.info(f'{SERVICE_NAME}: App started')
     yield
 
+    backfill_task.cancel()
+    stats_task.cancel()
+    await app.state.outbox.close()
+
     await app.state.db.close()
     await app.state.cache.close()
+    await app.state.broker.close()
     await app.state.mailer.close()
     await app.state.wow_api.close()
+    await app.state.hasher.close()
     await app.state.task_manager.close()
 
 
@@ -73,6 +99,51 @@ async def del_inactive_user_task(user_id: UserId) -> None:
         await provide_db().del_user(user_id)
 
 
+async def backfill_wow_items_task() -> None:
+    # items queued while WoWHead was unavailable are stored as placeholders
+    while True:
+        await asyncio.sleep(ItemConfig.placeholder_backfill_interval)
+        try:
+            backfilled = await provide_db().backfill_wow_items(provide_wow_api())
+        except Exception as e:
+            logger.error(f'WoW items backfill failed: {e}', exc_info=True)
+            continue
+        if backfilled:
+            logger.info(f'{backfilled} WoW items backfilled')
+
+
+async def log_stats_task() -> None:
+    # the counters are kept in memory, so each worker reports its own
+    while True:
+        await asyncio.sleep(StatsConfig.log_interval)
+        for tier, cache_stats in provide_cache().get_stats().items():
+            logger.info(
+                f'Cache {tier}: {cache_stats.hits} hits, {cache_stats.misses} '
+                f'misses, {cache_stats.hit_ratio:.1%} hit ratio'
+            )
+        refresh_stats = provide_cache().get_refresh_stats()
+        logger.info(
+            f'Cache refresh: {refresh_stats.stale_serves} stale serves, '
+            f'{refresh_stats.early_refreshes} early, '
+            f'{refresh_stats.background_refreshes} background, '
+            f'{refresh_stats.failed_refreshes} failed'
+        )
+        negative_stats = provide_wow_api().get_negative_cache_stats()
+        logger.info(
+            f'WoWHead negative cache: {negative_stats.hits} hits, '
+            f'{negative_stats.misses} misses, {negative_stats.stores} stores, '
+            f'{negative_stats.size} ids'
+        )
+        breaker_stats = provide_wow_api().get_circuit_breaker_stats()
+        logger.info(
+            f'WoWHead circuit: {breaker_stats.state.value}, '
+            f'{breaker_stats.failure_rate:.1%} of {breaker_stats.calls} calls '
+            f'failed, {breaker_stats.opened} opened, {breaker_stats.closed} '
+            f'closed, {breaker_stats.rejected} rejected, '
+            f'{breaker_stats.probes} probes'
+        )
+
+
 def provide_db() -> BaseAsyncDB:
     return app.state.db
 
@@ -85,10 +156,18 @@ def provide_cache_keys() -> CacheKeys:
     return app.state.cache_keys
 
 
+def provide_broker() -> BaseAsyncBroker:
+    return app.state.broker
+
+
 def provide_mailer() -> BaseAsyncMailer:
     return app.state.mailer
 
 
+def provide_outbox() -> MailOutbox:
+    return app.state.outbox
+
+
 def provide_token_type() -> type[BaseToken]:
     return app.state.token_type
 
@@ -101,15 +180,28 @@ def provide_wow_api() -> BaseAsyncWoWAPI:
     return app.state.wow_api
 
 
+def provide_hasher() -> BaseAsyncHasher:
+    return app.state.hasher
+
+
 def provide_task_manager() -> BaseAsyncTaskManager:
     return app.state.task_manager
 
 
+def provide_token_families() -> RefreshTokenFamilies:
+    return app.state.token_families
+
+
+def provide_token_cache() -> VerifiedTokenCache:
+    return app.state.token_cache
+
+
 def provide_auth_client_dep(request: Request) -> AccessTokenPayload:
     return auth_client(
         request=request,
         token_type=provide_token_type(),
-        token_config=provide_token_config()
+        token_config=provide_token_config(),
+        token_cache=provide_token_cache()
     )
 
 
@@ -131,11 +223,16 @@ app = Litestar(
         'db': Provide(provide_db, sync_to_thread=False),
         'cache': Provide(provide_cache, sync_to_thread=False),
         'cache_keys': Provide(provide_cache_keys, sync_to_thread=False),
+        'broker': Provide(provide_broker, sync_to_thread=False),
         'mailer': Provide(provide_mailer, sync_to_thread=False),
+        'outbox': Provide(provide_outbox, sync_to_thread=False),
         'task_manager': Provide(provide_task_manager, sync_to_thread=False),
         'wow_api': Provide(provide_wow_api, sync_to_thread=False),
+        'hasher': Provide(provide_hasher, sync_to_thread=False),
         'token_type': Provide(provide_token_type, sync_to_thread=False),
         'token_config': Provide(provide_token_config, sync_to_thread=False),
+        'token_cache': Provide(provide_token_cache, sync_to_thread=False),
+        'token_families': Provide(provide_token_families, sync_to_thread=False),
         'lang': Provide(get_language, sync_to_thread=False),
         'auth_client': Provide(provide_auth_client_dep, sync_to_thread=False)
     },
@@ -0,0 +1,113 @@
+# flake8-in-file-ignores: noqa: WPS226, WPS421
+
+"""Preload the WoW item catalog, so WoWHead is only a fallback for requests.
+
+A dump is a JSON list of objects or a CSV file with the columns `wow_id`,
+`html_tooltip`, `icon_url` and `origin_link`, plus optional `addon` and `lang`
+overriding the command line defaults. Rows with only `wow_id` are warmed up
+from WoWHead. Loading is idempotent: items already stored are skipped.
+
+```bash
+python -m app.preload loot_tables.json --addon classic --lang en
+```
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+
+from app.config import DataBase, DataBaseConfig, WoWAPI, WoWAPIConfig
+from app.db.abc.base import BaseAsyncDB
+from app.db.enums import EnumAddons, EnumLanguages
+from app.db.wow_api.base import BaseAsyncWoWAPI, WoWAPIItem, minify_html
+
+
+@dataclass
+class PreloadStats:
+    created: int = 0
+    fetched: int = 0
+    missing: int = 0
+
+
+def read_dump(path: Path) -> list[dict]:
+    with path.open(encoding='utf-8', newline='') as dump:
+        if path.suffix.lower() == '.csv':
+            return list(csv.DictReader(dump))
+        return json.load(dump)
+
+
+async def preload(
+    db: BaseAsyncDB, wow_api: BaseAsyncWoWAPI, rows: Sequence[dict],
+    addon: EnumAddons, lang: EnumLanguages
+) -> PreloadStats:
+    stats = PreloadStats()
+    wow_items: list[WoWAPIItem] = []
+    warm_up_ids: defaultdict[tuple[EnumAddons, EnumLanguages], list[int]] = (
+        defaultdict(list)
+    )
+    for row in rows:
+        row_addon = EnumAddons(row.get('addon') or addon.value)
+        row_lang = EnumLanguages(row.get('lang') or lang.value)
+        if not row.get('html_tooltip'):
+            warm_up_ids[row_addon, row_lang].append(int(row['wow_id']))
+            continue
+        wow_items.append(WoWAPIItem(
+            wow_id=int(row['wow_id']),
+            addon=row_addon,
+            lang=row_lang,
+            html_tooltip=minify_html(row['html_tooltip']),
+            icon_url=row['icon_url'],
+            origin_link=row['origin_link']
+        ))
+
+    stats.created = await db.create_wow_items(wow_items)
+    for (row_addon, row_lang), wow_ids in warm_up_ids.items():
+        found = await db.get_wow_items_by_wow_ids(wow_ids, row_addon, row_lang, wow_api)
+        stats.fetched += len(found)
+        stats.missing += len(set(wow_ids) - found.keys())
+    return stats
+
+
+async def run(path: Path, addon: EnumAddons, lang: EnumLanguages) -> PreloadStats:
+    db = DataBase(DataBaseConfig)
+    wow_api = WoWAPI(WoWAPIConfig)
+    await db.connect()
+    await wow_api.connect()
+    try:
+        return await preload(db, wow_api, read_dump(path), addon, lang)
+    finally:
+        await wow_api.close()
+        await db.close()
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog='python -m app.preload', description='Preload the WoW item catalog'
+    )
+    parser.add_argument('dump', type=Path, help='JSON or CSV item dump')
+    parser.add_argument(
+        '--addon', default=EnumAddons.retail.value,
+        choices=[addon.value for addon in EnumAddons]
+    )
+    parser.add_argument(
+        '--lang', default=EnumLanguages.en.value,
+        choices=[lang.value for lang in EnumLanguages]
+    )
+    args = parser.parse_args(argv)
+
+    stats = asyncio.run(run(
+        args.dump, EnumAddons(args.addon), EnumLanguages(args.lang)
+    ))
+    print(
+        f'{args.dump}: {stats.created} items created, {stats.fetched} found or '
+        f'fetched from WoWHead, {stats.missing} not found'
+    )
+
+
+if __name__ == '__main__':
+    main()
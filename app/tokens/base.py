@@ -1,11 +1,14 @@
+import json
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
-from typing import Generic, Self, TypeVar
+from functools import lru_cache
+from typing import Any, Generic, Self, TypeVar
+from uuid import uuid4
 
 import jwt
 
-from app.tokens.configs import BaseTokenConfig, JWTokenConfig
+from app.tokens.configs import BaseTokenConfig, JWTKey, JWTokenConfig
 from app.tokens.payloads import (AccessTokenPayload, BaseTokenPayload,
                                  ChangePasswordTokenPayload,
                                  DeleteTeamTokenPayload, RefreshTokenPayload,
@@ -38,20 +41,31 @@ class BaseToken(ABC, Generic[TokenConfig]):
                payload_type: type[PayloadType]) -> Self: ...
 
 
+@lru_cache(maxsize=64)
+def prepare_key(alg: str, pem: str) -> Any:
+    # parsing a PEM costs more than an EdDSA or ES256 signature itself
+    return jwt.get_algorithm_by_name(alg).prepare_key(pem)
+
+
 @dataclass
 class JWToken(BaseToken[JWTokenConfig]):
 
     def encode(self) -> str:
         try:
             payload = self.payload.model_dump()
+            signing_key = self.config.get_signing_key(datetime.now(UTC))
+            alg = signing_key.alg if signing_key else self.config.alg
+            headers = {'alg': alg, 'typ': self.config.typ}
+            if signing_key:
+                headers['kid'] = signing_key.kid
             token = jwt.encode(
                 payload=payload,
-                key=self.config.key,
-                algorithm=self.config.alg,
-                headers={
-                    'alg': self.config.alg,
-                    'typ': self.config.typ
-                },
+                key=(
+                    prepare_key(alg, signing_key.private_key)  # type: ignore
+                    if signing_key else self.config.key
+                ),
+                algorithm=alg,
+                headers=headers,
                 json_encoder=self.config.json_encoder,
                 sort_headers=self.config.sort_headers
             )
@@ -67,11 +81,19 @@ class JWToken(BaseToken[JWTokenConfig]):
         cls, token: str, config: JWTokenConfig, payload_type: type[PayloadType]
     ) -> Self:
         try:
+            kid = jwt.get_unverified_header(token).get('kid')
+            key, alg = config.key, config.alg
+            if kid is not None:
+                verifying_key = config.get_verifying_key(kid, datetime.now(UTC))
+                if verifying_key is None:
+                    raise DecodeTokenError(f'Unknown or expired key {kid}')
+                key = prepare_key(verifying_key.alg, verifying_key.public_key)
+                alg = verifying_key.alg
             token_payload = payload_type(
                 **jwt.decode(
                     jwt=token,
-                    key=config.key,
-                    algorithms=config.alg
+                    key=key,
+                    algorithms=[alg]
                 )
             )
             return cls(
@@ -86,6 +108,17 @@ class JWToken(BaseToken[JWTokenConfig]):
             raise DecodeTokenError from e
 
 
+def get_jwks(config: JWTokenConfig) -> dict[str, list[dict]]:
+    # public keys as a JWK set, for services verifying tokens on their own
+    return {'keys': [get_jwk(jwt_key) for jwt_key in config.keys]}
+
+
+def get_jwk(jwt_key: JWTKey) -> dict:
+    algorithm = jwt.get_algorithm_by_name(jwt_key.alg)
+    jwk = json.loads(algorithm.to_jwk(prepare_key(jwt_key.alg, jwt_key.public_key)))
+    return {**jwk, 'kid': jwt_key.kid, 'alg': jwt_key.alg, 'use': 'sig'}
+
+
 def create_registration_token(
     token_type: type[TokenType], token_config: BaseTokenConfig, exp: timedelta,
     sub: Username
@@ -116,11 +149,13 @@ def create_access_token(
 
 def create_refresh_token(
     token_type: type[TokenType], token_config: BaseTokenConfig, exp: timedelta,
-    sub: UserId
+    sub: UserId, family_id: str | None = None
 ) -> TokenType:
     refresh_token_payload = RefreshTokenPayload(
         exp=(datetime.now() + exp).timestamp(),
-        sub=sub
+        sub=sub,
+        jti=uuid4().hex,
+        fid=family_id or uuid4().hex
     )
     return token_type(
         refresh_token_payload,
@@ -0,0 +1,86 @@
+import time as clock
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from hashlib import blake2b
+
+from app.tokens.payloads import AccessTokenPayload
+
+
+@dataclass
+class VerifiedTokenCacheStats:
+    hits: int = 0
+    misses: int = 0
+    expired: int = 0
+    evicted: int = 0
+    revoked: int = 0
+    size: int = 0
+
+
+@dataclass
+class VerifiedTokenCache:
+    # digests of access tokens that passed verification, mapped to their
+    # payloads; an entry lives until the token expires or is evicted, so a
+    # hit skips the signature check and payload validation. Raw tokens are
+    # not kept in memory
+    max_size: int
+    entries: OrderedDict[bytes, AccessTokenPayload] = field(default_factory=OrderedDict)
+    stats: VerifiedTokenCacheStats = field(default_factory=VerifiedTokenCacheStats)
+
+    def __post_init__(self) -> None:
+        self.subjects: dict[str, set[bytes]] = {}
+
+    def get(self, token: str) -> AccessTokenPayload | None:
+        digest = self._get_digest(token)
+        payload = self.entries.get(digest)
+        if payload is None:
+            self.stats.misses += 1
+            return None
+        if payload.exp <= clock.time():
+            # verifying it again reports the expiry
+            self._pop(digest)
+            self.stats.expired += 1
+            self.stats.misses += 1
+            return None
+        self.entries.move_to_end(digest)
+        self.stats.hits += 1
+        return payload
+
+    def add(self, token: str, payload: AccessTokenPayload) -> None:
+        if self.max_size <= 0:
+            return
+        digest = self._get_digest(token)
+        self.entries[digest] = payload
+        self.entries.move_to_end(digest)
+        self.subjects.setdefault(payload.sub, set()).add(digest)
+        while len(self.entries) > self.max_size:
+            self._pop(next(iter(self.entries)))
+            self.stats.evicted += 1
+
+    def revoke(self, token: str) -> None:
+        if self._pop(self._get_digest(token)):
+            self.stats.revoked += 1
+
+    def revoke_subject(self, sub: str) -> None:
+        for digest in self.subjects.get(sub, set()).copy():
+            self._pop(digest)
+            self.stats.revoked += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.subjects.clear()
+
+    def get_stats(self) -> VerifiedTokenCacheStats:
+        self.stats.size = len(self.entries)
+        return VerifiedTokenCacheStats(**self.stats.__dict__)
+
+    def _pop(self, digest: bytes) -> AccessTokenPayload | None:
+        payload = self.entries.pop(digest, None)
+        if payload is not None:
+            digests = self.subjects[payload.sub]
+            digests.discard(digest)
+            if not digests:
+                del self.subjects[payload.sub]
+        return payload
+
+    def _get_digest(self, token: str) -> bytes:
+        return blake2b(token.encode(), digest_size=32).digest()
@@ -1,8 +1,9 @@
+from datetime import UTC, datetime
 from json import JSONEncoder
 from logging import Logger
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 
 
 class BaseTokenConfig(BaseModel):
@@ -12,9 +13,67 @@ class BaseTokenConfig(BaseModel):
         arbitrary_types_allowed = True
 
 
+ASYMMETRIC_ALGORITHMS = frozenset(('EdDSA', 'ES256', 'RS256'))
+
+
+class JWTKey(BaseModel):
+    # a new key is published before active_from, so verifiers know it when
+    # tokens signed with it arrive; the old one is kept until its tokens
+    # expire and then removed or given an expires_at
+    kid: str
+    alg: str
+    public_key: str  # PEM
+    private_key: Optional[str] = None  # PEM, only needed for signing
+    active_from: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+
+    @field_validator('alg')
+    @classmethod
+    def check_alg(cls, alg: str) -> str:
+        if alg not in ASYMMETRIC_ALGORITHMS:
+            raise ValueError(f'{alg} is not one of {sorted(ASYMMETRIC_ALGORITHMS)}')
+        return alg
+
+    @field_validator('active_from', 'expires_at')
+    @classmethod
+    def to_utc(cls, moment: datetime | None) -> datetime | None:
+        # naive timestamps are taken as UTC, so they compare with aware ones
+        if moment is None:
+            return None
+        if moment.tzinfo is None:
+            return moment.replace(tzinfo=UTC)
+        return moment.astimezone(UTC)
+
+
 class JWTokenConfig(BaseTokenConfig):
+    # tokens without a kid header are signed and verified with `key`
     alg: str
     typ: str
-    key: str
+    key: Optional[str] = None
+    keys: list[JWTKey] = Field(default_factory=list)
     json_encoder: Optional[type[JSONEncoder]] = None
     sort_headers: bool = True
+
+    def get_signing_key(self, now: datetime) -> JWTKey | None:
+        # the most recently activated key with a private part
+        signing_keys = [
+            jwt_key for jwt_key in self.keys
+            if jwt_key.private_key is not None
+            and (jwt_key.active_from is None or jwt_key.active_from <= now)
+            and (jwt_key.expires_at is None or now < jwt_key.expires_at)
+        ]
+        return max(
+            signing_keys,
+            key=lambda jwt_key: jwt_key.active_from or datetime.min.replace(tzinfo=UTC),
+            default=None
+        )
+
+    def get_verifying_key(self, kid: str, now: datetime) -> JWTKey | None:
+        # active_from is not checked: another instance with a clock slightly
+        # ahead may already sign with the new key
+        for jwt_key in self.keys:
+            if jwt_key.kid == kid:
+                if jwt_key.expires_at is not None and jwt_key.expires_at <= now:
+                    return None
+                return jwt_key
+        return None
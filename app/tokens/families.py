@@ -0,0 +1,63 @@
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from app.caches.base import BaseAsyncTTLCache
+from app.tokens.base import DecodeTokenError
+from app.tokens.payloads import RefreshTokenPayload
+
+
+class RefreshTokenRevokedError(DecodeTokenError): ...
+class RefreshTokenReusedError(RefreshTokenRevokedError): ...
+
+
+REVOKED = b'revoked'
+
+
+@dataclass
+class RefreshTokenFamiliesStats:
+    started: int = 0
+    rotated: int = 0
+    rejected: int = 0
+    reused: int = 0
+    revoked: int = 0
+
+
+@dataclass
+class RefreshTokenFamilies:
+    # one key per family holding the jti of its newest refresh token, or
+    # REVOKED; it lives as long as that token. Rotating is one atomic compare
+    # and set, so a refresh costs one cache round trip. A jti other than the
+    # newest one was already rotated: it is being reused, so the family is
+    # revoked, which also locks out whoever rotated it first
+    cache: BaseAsyncTTLCache
+    key: str = 'rtf: {}'
+    stats: RefreshTokenFamiliesStats = field(default_factory=RefreshTokenFamiliesStats)
+
+    async def start(self, payload: RefreshTokenPayload, exp: timedelta) -> None:
+        await self.cache.set(self.key.format(payload.fid), payload.jti, exp)
+        self.stats.started += 1
+
+    async def rotate(
+        self, payload: RefreshTokenPayload, new_payload: RefreshTokenPayload,
+        exp: timedelta
+    ) -> None:
+        key = self.key.format(payload.fid)
+        current_jti = await self.cache.compare_and_set(
+            key, payload.jti.encode(), new_payload.jti.encode(), exp
+        )
+        if current_jti == payload.jti.encode():
+            self.stats.rotated += 1
+            return
+        self.stats.rejected += 1
+        if current_jti is None or current_jti == REVOKED:
+            raise RefreshTokenRevokedError(f'Token family {payload.fid} is revoked')
+        self.stats.reused += 1
+        await self.revoke(payload, exp)
+        raise RefreshTokenReusedError(f'Token family {payload.fid} is reused')
+
+    async def revoke(self, payload: RefreshTokenPayload, exp: timedelta) -> None:
+        await self.cache.set(self.key.format(payload.fid), REVOKED, exp)
+        self.stats.revoked += 1
+
+    def get_stats(self) -> RefreshTokenFamiliesStats:
+        return RefreshTokenFamiliesStats(**self.stats.__dict__)
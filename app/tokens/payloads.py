@@ -20,6 +20,8 @@ class AccessTokenPayload(BaseTokenPayload):
 class RefreshTokenPayload(BaseTokenPayload):
     exp: float
     sub: UserId
+    jti: str
+    fid: str  # token family, shared by the tokens rotated from one login
     type: Literal['refresh'] = 'refresh'
 
 
@@ -17,3 +17,4 @@ RaiderId: TypeAlias = str
 WoWItemId: TypeAlias = str
 QueueId: TypeAlias = str
 LogId: TypeAlias = str
+OutboxEmailId: TypeAlias = str
@@ -0,0 +1,21 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+ResultType = TypeVar('ResultType')
+
+
+@dataclass
+class SingleFlight:
+    calls: dict[Hashable, asyncio.Task] = field(default_factory=dict)
+
+    async def run(
+        self, key: Hashable, func: Callable[[], Awaitable[ResultType]]
+    ) -> ResultType:
+        call = self.calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(func())
+            self.calls[key] = call
+            call.add_done_callback(lambda _: self.calls.pop(key, None))
+        # a cancelled waiter must not cancel the rebuild for the others
+        return await asyncio.shield(call)
@@ -0,0 +1,97 @@
+# flake8-in-file-ignores: noqa: WPS432
+
+import asyncio
+import logging
+from contextlib import AsyncExitStack
+
+import pytest
+from testcontainers.core.container import DockerContainer
+from testcontainers.redis import RedisContainer
+
+from app.brokers.base import BaseAsyncBroker, RedisAsyncBroker, Subscription
+from app.brokers.configs import BaseBrokerConfig, RedisBrokerConfig
+
+
+def update_config(config: BaseBrokerConfig, testcontainer: DockerContainer) -> None:
+    if isinstance(config, RedisBrokerConfig):
+        config.redis_host = testcontainer.get_container_host_ip()  # type: ignore
+        config.redis_port = testcontainer.get_exposed_port(6379)  # type: ignore
+
+
+async def receive(subscription: Subscription, count: int) -> list[bytes]:
+    return [await anext(subscription) for _ in range(count)]
+
+
+@pytest.mark.parametrize(
+    argnames='broker_type, config, testcontainer',
+    argvalues=[
+        [
+            RedisAsyncBroker,
+            RedisBrokerConfig(
+                logger=logging.getLogger('broker'),
+                redis_host='',
+                redis_port=0,
+                subscriber_buffer_size=8
+            ),
+            RedisContainer()
+        ]
+    ]
+)
+@pytest.mark.asyncio
+async def test_broker(
+    broker_type: type[BaseAsyncBroker], config: BaseBrokerConfig,
+    testcontainer: DockerContainer
+) -> None:
+    with testcontainer as container:
+        update_config(config, container)
+        broker = await broker_type(config).connect()
+        publisher = await broker_type(config).connect()
+
+        async with AsyncExitStack() as stack:
+            idle_subscriptions = [
+                await stack.enter_async_context(broker.subscribe(f'team{index % 100}'))
+                for index in range(5000)
+            ]
+            slow_subscription = await stack.enter_async_context(
+                broker.subscribe('team0')
+            )
+            assert broker.get_stats().subscribers == 5001
+
+            for index in range(config.subscriber_buffer_size):
+                await publisher.publish('team0', f'{index}'.encode())
+            await publisher.publish('team1', b'other team')
+            team0_subscriptions = [
+                subscription for subscription in idle_subscriptions
+                if subscription.topic == 'team0'
+            ]
+            buffered = [
+                f'{index}'.encode() for index in range(config.subscriber_buffer_size)
+            ]
+            for subscription in team0_subscriptions:
+                assert await asyncio.wait_for(
+                    receive(subscription, config.subscriber_buffer_size), 5
+                ) == buffered
+            other_message = await asyncio.wait_for(anext(idle_subscriptions[1]), 5)
+            assert other_message == b'other team'
+
+            # the subscriber that never reads overflows its buffer and is dropped
+            await publisher.publish('team0', b'overflow')
+            for subscription in team0_subscriptions:
+                assert await asyncio.wait_for(anext(subscription), 5) == b'overflow'
+            assert slow_subscription.is_dropped
+            assert [message async for message in slow_subscription] == []
+
+            stats = broker.get_stats()
+            assert stats.dropped == 1
+            assert stats.subscribers == 5000
+            assert stats.received == config.subscriber_buffer_size + 2
+            assert stats.delivered == (
+                (config.subscriber_buffer_size + 1) * len(team0_subscriptions)
+                + config.subscriber_buffer_size + 50
+            )
+
+        assert broker.get_stats().subscribers == 0
+        assert broker.subscriptions == {}
+
+        await broker.close()
+        await publisher.close()
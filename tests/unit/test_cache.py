@@ -1,18 +1,35 @@
 # flake8-in-file-ignores: noqa: WPS432
 
+import asyncio
 import logging
 
+import msgspec
 import pytest
 from testcontainers.core.container import DockerContainer
 from testcontainers.redis import RedisContainer
 
-from app.caches.base import BaseAsyncTTLCache, RedisAsyncCache
-from app.caches.configs import BaseTTLCacheConfig, RedisConfig
+from app.caches.base import (BaseAsyncTTLCache, CacheRefreshStats,
+                             RedisAsyncCache, TwoTierAsyncCache)
+from app.caches.codecs import (BaseCacheCodec, CacheCodecError, JSONCacheCodec,
+                               MsgPackCacheCodec)
+from app.caches.configs import BaseTTLCacheConfig, RedisConfig, TwoTierConfig
+
+FULL_TEAM = {
+    'team': {'id': 'team-id', 'name': 'team', 'addon': 'Cataclysm', 'is_vip': False},
+    'queues': [
+        {'wow_item_id': item_id, 'queue': [
+            {
+                'position': position,
+                'raider': {'id': position, 'name': f'raider{position}'}
+            }
+            for position in range(20)
+        ]} for item_id in range(20)
+    ]
+}
 
 
 def update_config(config: BaseTTLCacheConfig, testcontainer: DockerContainer) -> None:
-    config_type = type(config)
-    if config_type == RedisConfig:
+    if isinstance(config, RedisConfig):
         config.redis_host = testcontainer.get_container_host_ip()  # type: ignore
         config.redis_port = testcontainer.get_exposed_port(6379)  # type: ignore
 
@@ -28,6 +45,15 @@ def update_config(config: BaseTTLCacheConfig, testcontainer: DockerContainer) ->
                 redis_port=0
             ),
             RedisContainer()
+        ],
+        [
+            TwoTierAsyncCache,
+            TwoTierConfig(
+                logger=logging.getLogger('redis'),
+                redis_host='',
+                redis_port=0
+            ),
+            RedisContainer()
         ]
     ]
 )
@@ -49,4 +75,303 @@ async def test_cache(
         after_delete = await cache.get('key')
         assert after_delete is None, f"Expected None, got {after_delete}"
 
+        await cache.set_object('object', FULL_TEAM)
+        assert await cache.get_object('object') == FULL_TEAM
+        assert msgspec.json.decode(await cache.get_json('object')) == FULL_TEAM
+
+        await cache.set('object', 'legacy value')
+        assert await cache.get_object('object') is None
+        assert await cache.get_json('object') is None
+
+        assert await cache.compare_and_set('swap', b'first', b'second') is None
+        await cache.set('swap', 'first')
+        assert await cache.compare_and_set('swap', b'first', b'second') == b'first'
+        assert await cache.compare_and_set('swap', b'first', b'third') == b'second'
+        assert await cache.get('swap') == 'second'
+
+        for version in (2, 1, 3):
+            await cache.set_version('version', version)
+        assert await cache.get('version') == '3'
+
+        await cache.close()
+
+
+async def wait_for_invalidation(cache: TwoTierAsyncCache, key: str) -> None:
+    for _ in range(100):
+        if key not in cache.local:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f'Local key {key} was not invalidated')
+
+
+@pytest.mark.asyncio
+async def test_two_tier_cache() -> None:
+    with RedisContainer() as container:
+        config = TwoTierConfig(
+            logger=logging.getLogger('redis'),
+            redis_host='',
+            redis_port=0,
+            local_max_size=2
+        )
+        update_config(config, container)
+        first_worker = await TwoTierAsyncCache(config).connect()
+        second_worker = await TwoTierAsyncCache(config).connect()
+
+        await first_worker.set('key', 'value')
+        assert await second_worker.get('key') == 'value'
+        assert await second_worker.get('key') == 'value'
+        stats = second_worker.get_stats()
+        assert (stats['local'].hits, stats['local'].misses) == (1, 1)
+        assert (stats['redis'].hits, stats['redis'].misses) == (1, 0)
+        assert stats['local'].hit_ratio == 0.5
+
+        await first_worker.del_key('key')
+        await wait_for_invalidation(second_worker, 'key')
+        assert await second_worker.get('key') is None
+        assert second_worker.get_stats()['redis'].misses == 1
+
+        await first_worker.set('key', 'value')
+        assert await second_worker.get('key') == 'value'
+        await first_worker.set('key', 'new value')
+        await wait_for_invalidation(second_worker, 'key')
+        assert await second_worker.get('key') == 'new value'
+        assert await first_worker.compare_and_set(
+            'key', b'new value', b'swapped value'
+        ) == b'new value'
+        await wait_for_invalidation(second_worker, 'key')
+        assert await second_worker.get('key') == 'swapped value'
+        await first_worker.set_version('version', 1)
+        assert await second_worker.get('version') == '1'
+        await first_worker.set_version('version', 2)
+        await wait_for_invalidation(second_worker, 'version')
+        assert await second_worker.get('version') == '2'
+
+        for key in ('first', 'second', 'third'):
+            await first_worker.set(key, key)
+        assert list(first_worker.local) == ['second', 'third']
+
+        await first_worker.close()
+        await second_worker.close()
+
+
+@pytest.mark.parametrize(
+    argnames='config',
+    argvalues=[
+        RedisConfig(logger=logging.getLogger('redis'), redis_host='', redis_port=0),
+        RedisConfig(
+            logger=logging.getLogger('redis'), redis_host='', redis_port=0,
+            rebuild_lock_lease=5
+        )
+    ]
+)
+@pytest.mark.asyncio
+async def test_cache_single_flight(config: RedisConfig) -> None:
+    with RedisContainer() as container:
+        update_config(config, container)
+        workers = [await RedisAsyncCache(config).connect() for _ in range(2)]
+        builds = 0
+
+        async def build() -> dict:
+            nonlocal builds
+            builds += 1
+            await asyncio.sleep(0.2)
+            return FULL_TEAM
+
+        readers = [
+            workers[reader % 2].get_or_build_json('full_team', build)
+            for reader in range(500)
+        ]
+        results = await asyncio.gather(*readers)
+
+        assert builds == (1 if config.rebuild_lock_lease else 2)
+        assert all(msgspec.json.decode(result) == FULL_TEAM for result in results)
+        assert not any(worker.single_flight.calls for worker in workers)
+        assert await workers[0].get_or_build_json('full_team', build) == results[0]
+        assert builds == (1 if config.rebuild_lock_lease else 2)
+
+        async def failed_build() -> dict:
+            await asyncio.sleep(0.1)
+            raise ValueError
+
+        readers = [
+            workers[0].get_or_build_json('failed', failed_build) for _ in range(10)
+        ]
+        failed = await asyncio.gather(*readers, return_exceptions=True)
+        assert all(isinstance(error, ValueError) for error in failed)
+        assert await workers[0].get('lock: failed') is None
+
+        for worker in workers:
+            await worker.close()
+
+
+@pytest.mark.asyncio
+async def test_cache_stale_while_revalidate() -> None:
+    with RedisContainer() as container:
+        config = RedisConfig(
+            logger=logging.getLogger('redis'), redis_host='', redis_port=0,
+            early_refresh_beta=0
+        )
+        update_config(config, container)
+        cache = await RedisAsyncCache(config).connect()
+        versions = iter(range(100))
+
+        async def build() -> dict:
+            await asyncio.sleep(0.05)
+            return {'version': next(versions)}
+
+        async def get() -> dict:
+            return msgspec.json.decode(
+                await cache.get_or_build_json('team', build, time=10, soft_time=0.2)
+            )
+
+        assert await get() == {'version': 0}
+        assert await get() == {'version': 0}
+        assert cache.get_refresh_stats() == CacheRefreshStats()
+
+        await asyncio.sleep(0.25)
+        assert [await get() for _ in range(5)] == [{'version': 0}] * 5
+        await asyncio.gather(*cache.refreshes)
+        assert await get() == {'version': 1}
+        stats = cache.get_refresh_stats()
+        assert stats.stale_serves == 5
+        assert stats.background_refreshes == 1
+
+        entry = await cache.get_json_entry('team')
+        assert entry is not None and entry.build_time >= 0.05
+
+        # with a build this slow XFetch refreshes long before the soft expiry
+        cache.config.early_refresh_beta = 100000
+        assert await get() == {'version': 1}
+        await asyncio.gather(*cache.refreshes)
+        assert cache.get_refresh_stats().early_refreshes == 1
+        assert await get() == {'version': 2}
+
+        async def failed_build() -> dict:
+            raise ValueError
+
+        await cache.get_or_build_json('failed', build, soft_time=0.01)
+        await asyncio.sleep(0.02)
+        await cache.get_or_build_json('failed', failed_build, soft_time=0.01)
+        await asyncio.gather(*cache.refreshes, return_exceptions=True)
+        assert cache.get_refresh_stats().failed_refreshes == 1
+
+        await cache.close()
+
+
+@pytest.mark.parametrize(
+    argnames='cache_type, config',
+    argvalues=[
+        [
+            RedisAsyncCache,
+            RedisConfig(logger=logging.getLogger('redis'), redis_host='', redis_port=0)
+        ],
+        [
+            TwoTierAsyncCache,
+            TwoTierConfig(
+                logger=logging.getLogger('redis'), redis_host='', redis_port=0
+            )
+        ]
+    ]
+)
+@pytest.mark.asyncio
+async def test_cache_document(
+    cache_type: type[RedisAsyncCache], config: RedisConfig
+) -> None:
+    with RedisContainer() as container:
+        update_config(config, container)
+        cache = await cache_type(config).connect()
+        reader = await cache_type(config).connect()
+        head = {key: value for key, value in FULL_TEAM.items() if key != 'queues'}
+        builds = 0
+
+        async def build() -> tuple[dict, dict, int]:
+            nonlocal builds
+            builds += 1
+            return head, {
+                f'{queue["wow_item_id"]:03d}': queue for queue in FULL_TEAM['queues']
+            }, 1
+
+        async def get(cache: RedisAsyncCache) -> tuple[dict, int]:
+            document, version = await cache.get_or_build_document_json(
+                'team', 'queues', build
+            )
+            return msgspec.json.decode(document), version
+
+        assert await get(cache) == (FULL_TEAM, 1)
+        assert await get(reader) == (FULL_TEAM, 1)
+        assert builds == 1
+
+        new_queue = {'wow_item_id': 5, 'queue': []}
+        assert await cache.patch_document(
+            'team', {'005': new_queue, '010': None}, version=2
+        )
+        expected_queues = [
+            new_queue if queue['wow_item_id'] == 5 else queue
+            for queue in FULL_TEAM['queues'] if queue['wow_item_id'] != 10
+        ]
+        if isinstance(reader, TwoTierAsyncCache):
+            await wait_for_invalidation(reader, 'team')
+        for worker in (cache, reader):
+            assert await get(worker) == ({**head, 'queues': expected_queues}, 2)
+        assert builds == 1
+
+        # a patch that skips a version drops the document
+        assert not await cache.patch_document('team', {'005': new_queue}, version=4)
+        assert await cache.get_fields('team') is None
+        assert await get(cache) == (FULL_TEAM, 1)
+        assert builds == 2
+
+        await cache.set_object('team', FULL_TEAM)
+        assert await get(cache) == (FULL_TEAM, 1)
+        assert builds == 3
+
+        await cache.del_key('team')
+        assert not await cache.patch_document('team', {'005': new_queue}, version=2)
+        assert await cache.get_fields('team') is None
+
+        async def build_empty() -> tuple[dict, dict, int]:
+            return {}, {}, 1
+
+        for _ in range(2):
+            assert await cache.get_or_build_document_json(
+                'empty', 'queues', build_empty
+            ) == (b'{"queues":[]}', 1)
+
         await cache.close()
+        await reader.close()
+
+
+@pytest.mark.parametrize(
+    argnames='codec',
+    argvalues=[
+        JSONCacheCodec(),
+        JSONCacheCodec(compress_min_size=0),
+        MsgPackCacheCodec(),
+        MsgPackCacheCodec(compress_min_size=1024)
+    ]
+)
+def test_cache_codec(codec: BaseCacheCodec) -> None:
+    encoded = codec.encode(FULL_TEAM)
+    assert codec.decode(encoded) == FULL_TEAM
+    assert msgspec.json.decode(codec.decode_json(encoded)) == FULL_TEAM  # type: ignore
+
+    uncompressed = type(codec)().encode(FULL_TEAM)
+    if codec.compress_min_size is not None:
+        assert len(encoded) < len(uncompressed)
+    else:
+        assert encoded == uncompressed
+
+    entry = codec.decode_json_entry(codec.encode(FULL_TEAM, 1000.5, 0.25))
+    assert entry is not None
+    assert msgspec.json.decode(entry.payload) == FULL_TEAM
+    assert (entry.soft_expires_at, entry.build_time) == (1000.5, 0.25)
+    assert codec.decode_json_entry(encoded).soft_expires_at is None  # type: ignore
+
+    assert type(codec)(version=codec.version + 1).decode(encoded) is None
+    other_codec = (
+        MsgPackCacheCodec if isinstance(codec, JSONCacheCodec) else JSONCacheCodec
+    )
+    assert other_codec().decode(encoded) is None
+
+    with pytest.raises(CacheCodecError):
+        codec.decode(encoded[:-1])
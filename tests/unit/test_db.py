@@ -1,13 +1,17 @@
 # flake8-in-file-ignores: noqa: WPS204, WPS218
 
+import asyncio
 import json
 import logging
-from typing import AsyncGenerator, Sequence, TypedDict
+from datetime import datetime, timedelta
+from typing import AsyncGenerator, Awaitable, Sequence, TypedDict
 
 import pytest
 import pytest_asyncio
 from deepdiff import DeepDiff
 from pytest_mock import MockerFixture
+from sqlalchemy import Integer, String, cast, event, func, insert, literal, select
+from sqlalchemy.dialects import postgresql
 from testcontainers.core.generic import DbContainer
 from testcontainers.postgres import PostgresContainer
 
@@ -16,13 +20,19 @@ from app.db.abc.configs import BaseDBConfig
 from app.db.abc.models import (LogProtocol, QueueProtocol, RaiderProtocol,
                                TeamProtocol, UserProtocol, WoWItemProtocol)
 from app.db.enums import EnumAddons, EnumClasses, EnumLanguages
-from app.db.exc import (InvalidCredentialsError, TeamsNotExistsError,
+from app.db.exc import (DatabaseError, InvalidCredentialsError,
+                        RaiderNotFoundError, TeamsNotExistsError,
                         UniqueEmailError, UniqueUsernameError,
-                        UserNotFoundError)
+                        UserNotFoundError, WoWItemNotFoundError)
 from app.db.sqlalchemy.base import AsyncSQLAlchemyDB
 from app.db.sqlalchemy.config import SQLAlchemyDBConfig
-from app.db.wow_api.base import BaseAsyncWoWAPI, WoWHeadAPI
+from app.db.sqlalchemy.models import (CompressedString, Log, OutboxEmail,
+                                      Queue, Raider, Team, WoWItem)
+from app.db.wow_api.base import BaseAsyncWoWAPI, WoWAPIItem, WoWHeadAPI
 from app.db.wow_api.configs import BaseWoWAPIConfig, WoWHeadAPIConfig
+from app.hashers.base import BaseAsyncHasher, PasslibAsyncHasher
+from app.hashers.configs import PasslibConfig
+from app.mailers.base import Email
 
 
 class RequestDBParam(TypedDict):
@@ -98,6 +108,30 @@ async def wow_api(
     await wow_api.close()
 
 
+@pytest_asyncio.fixture
+async def plan_db() -> AsyncGenerator[AsyncSQLAlchemyDB, None]:
+    # a database of its own, so the seeded rows stay out of the other tests
+    with PostgresContainer(dbname='lootx_plans', driver='asyncpg') as container:
+        plan_db = AsyncSQLAlchemyDB(SQLAlchemyDBConfig(
+            logger=logging.getLogger('db'),
+            db_url=container.get_connection_url(),
+            session_maker_kwargs={'expire_on_commit': False}
+        ))
+        await plan_db.connect()
+        yield plan_db
+        await plan_db.close()
+
+
+@pytest_asyncio.fixture(scope='module')
+async def hasher() -> AsyncGenerator[BaseAsyncHasher, None]:
+    hasher = PasslibAsyncHasher(
+        PasslibConfig(logger=logging.getLogger('hasher'))
+    )
+    await hasher.connect()
+    yield hasher
+    await hasher.close()
+
+
 def check_user(user: UserProtocol, second_user: UserProtocol) -> None:
     assert user.id == second_user.id
     assert user.username == second_user.username
@@ -131,6 +165,7 @@ def check_wow_item(
     assert wow_item.lang == second_wow_item.lang
     assert wow_item.origin_link == second_wow_item.origin_link
     assert wow_item.wow_id == second_wow_item.wow_id
+    assert wow_item.is_placeholder == second_wow_item.is_placeholder
 
 
 def check_queue(
@@ -156,15 +191,48 @@ def check_log(
     assert log.wow_item_id == second_log.wow_item_id
 
 
+async def get_query_plans(db: AsyncSQLAlchemyDB, call: Awaitable) -> list[str]:
+    statements = []
+
+    def capture_statement(  # noqa: WPS211
+        conn, cursor, statement, parameters, context, executemany  # noqa: ANN001
+    ) -> None:
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine.sync_engine, 'before_cursor_execute', capture_statement)
+    try:
+        await call
+    finally:
+        event.remove(
+            db.engine.sync_engine, 'before_cursor_execute', capture_statement
+        )
+
+    plans = []
+    async with db.engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = await conn.exec_driver_sql(f'EXPLAIN {statement}', parameters)
+            plans.append('\n'.join(row[0] for row in plan))
+    return plans
+
+
+def check_index_scan(plans: list[str], table: str, index: str) -> None:
+    assert plans, 'No queries were captured'
+    for plan in plans:
+        assert f'Seq Scan on {table}' not in plan, plan
+        assert index in plan, plan
+
+
 @pytest.mark.asyncio
-async def test_user_model(db: BaseAsyncDB) -> None:
+async def test_user_model(db: BaseAsyncDB, hasher: BaseAsyncHasher) -> None:
 
     # Method: create_user
     user = await db.create_user(
         username='username',
         password='password',
         email='email@mail.com',
-        is_active=False
+        is_active=False,
+        hasher=hasher
     )
     assert user.username == 'username'
     assert user.password != 'password'
@@ -199,7 +267,7 @@ async def test_user_model(db: BaseAsyncDB) -> None:
 
     # Method: change_user_password
     old_password = user.password
-    await db.change_user_password(user.id, 'newpassword')
+    await db.change_user_password(user.id, 'newpassword', hasher)
     user = await db.get_user(user.id)
     assert user.password != old_password, 'Password should be changed'
     assert user.password != 'newpassword', 'The password is not hashed'
@@ -215,11 +283,11 @@ async def test_user_model(db: BaseAsyncDB) -> None:
 
     # Method: verify_username_password
     assert await db.verify_username_password(
-        username=user.username, password='newpassword'
+        username=user.username, password='newpassword', hasher=hasher
     ) == user.id
     with pytest.raises(InvalidCredentialsError):
         await db.verify_username_password(
-            username=user.username, password='invalid_password'
+            username=user.username, password='invalid_password', hasher=hasher
         )
 
     # Method: del_user
@@ -229,12 +297,13 @@ async def test_user_model(db: BaseAsyncDB) -> None:
 
 
 @pytest.mark.asyncio
-async def test_team_model(db: BaseAsyncDB) -> None:
+async def test_team_model(db: BaseAsyncDB, hasher: BaseAsyncHasher) -> None:
     user = await db.create_user(
         username='team_user',
         password='password',
         email='test_team_user@mail.com',
-        is_active=True
+        is_active=True,
+        hasher=hasher
     )
 
     # Method: create_team
@@ -242,7 +311,8 @@ async def test_team_model(db: BaseAsyncDB) -> None:
         name='name',
         addon=EnumAddons.retail,
         owner_id=user.id,
-        password='password'
+        password='password',
+        hasher=hasher
     )
     assert team.name == 'name'
     assert team.addon == EnumAddons.retail
@@ -268,10 +338,16 @@ async def test_team_model(db: BaseAsyncDB) -> None:
     # Method: get_team_id_by_name
     assert await db.get_team_id_by_name(team.name) == team.id
 
+    # Method: get_team_version
+    assert await db.get_team_version(team.id) == 1
+    with pytest.raises(TeamsNotExistsError):
+        await db.get_team_version('unknown_team')
+
     # Method: update_team
     old_password = team.password
     team = await db.update_team(
         id=team.id,
+        hasher=hasher,
         name='update_name',
         addon=EnumAddons.classic,
         password='update_password'
@@ -280,6 +356,7 @@ async def test_team_model(db: BaseAsyncDB) -> None:
     assert team.addon == EnumAddons.classic
     assert team.password != 'update_password', 'The password is not hashed'
     assert team.password != old_password
+    assert await db.get_team_version(team.id) == 2
 
     # Method: del_team
     await db.del_team(team.id)
@@ -288,18 +365,20 @@ async def test_team_model(db: BaseAsyncDB) -> None:
 
 
 @pytest.mark.asyncio
-async def test_raider_model(db: BaseAsyncDB) -> None:
+async def test_raider_model(db: BaseAsyncDB, hasher: BaseAsyncHasher) -> None:
     user = await db.create_user(
         username='raider_user',
         password='password',
         email='test_raider_user@mail.com',
-        is_active=True
+        is_active=True,
+        hasher=hasher
     )
     team = await db.create_team(
         name='raider_team',
         addon=EnumAddons.retail,
         owner_id=user.id,
-        password='password'
+        password='password',
+        hasher=hasher
     )
 
     # Method: create_raider
@@ -311,6 +390,7 @@ async def test_raider_model(db: BaseAsyncDB) -> None:
     assert raider.name == 'name'
     assert raider.team_id == team.id
     assert raider.class_name == EnumClasses.warrior
+    assert await db.get_team_version(team.id) == 2
 
     # Method: get_raider
     check_raider(raider, await db.get_raider(raider.id))
@@ -319,23 +399,27 @@ async def test_raider_model(db: BaseAsyncDB) -> None:
     await db.set_raider_inactive(raider.id)
     raider = await db.get_raider(raider.id)
     assert raider.is_active is False
+    assert await db.get_team_version(team.id) == 3
 
 
 @pytest.mark.asyncio
 async def test_queue_model(
-    db: BaseAsyncDB, wow_api: BaseAsyncWoWAPI, wow_items_id: list[int]
+    db: BaseAsyncDB, wow_api: BaseAsyncWoWAPI, hasher: BaseAsyncHasher,
+    wow_items_id: list[int], mocker: MockerFixture
 ) -> None:
     user = await db.create_user(
         username='queue_user',
         password='password',
         email='test_queue_user@mail.com',
-        is_active=True
+        is_active=True,
+        hasher=hasher
     )
     team = await db.create_team(
         name='queue_team',
         addon=EnumAddons.retail,
         owner_id=user.id,
-        password='password'
+        password='password',
+        hasher=hasher
     )
     raider = await db.create_raider(
         name='queue_raider',
@@ -356,6 +440,7 @@ async def test_queue_model(
     assert queue[0].team_id == team.id
     assert queue[0].raider_id == raider.id
     assert queue[0].wow_item_id == wow_items_id[0]
+    assert await db.get_team_version(team.id) == 3
 
     # Method: get_queue_by_item
     check_queue(queue, await db.get_queue_by_item(
@@ -368,6 +453,21 @@ async def test_queue_model(
         (await db.get_queues(queue[0].team_id))[0]
     )
 
+    # A queue with an unknown raider is rejected without touching the old one
+    with pytest.raises(RaiderNotFoundError):
+        await db.create_queue(
+            team_id=team.id,
+            wow_item_id=wow_items_id[0],
+            addon=EnumAddons.retail,
+            lang=EnumLanguages.en,
+            raiders=[raider.id, 'unknown_raider'],
+            wow_api=wow_api
+        )
+    check_queue(queue, await db.get_queue_by_item(
+        team_id=queue[0].team_id, wow_item_id=queue[0].wow_item_id
+    ))
+    assert await db.get_team_version(team.id) == 3
+
     # Method: is_queue_exists
     assert await db.is_queue_exists(
         team_id=queue[0].team_id,
@@ -394,36 +494,163 @@ async def test_queue_model(
         team_id=queue[0].team_id,
         wow_item_id=queue[0].wow_item_id
     )
+    assert await db.get_team_version(team.id) == 4
+
+    # Method: create_queues
+    second_raider = await db.create_raider(
+        name='raider_two',
+        team_id=team.id,
+        class_name=EnumClasses.priest
+    )
+    queues = await db.create_queues(
+        team_id=team.id,
+        queues={
+            wow_items_id[1]: [second_raider.id, raider.id],
+            wow_items_id[2]: [raider.id],
+            wow_items_id[3]: []
+        },
+        addon=EnumAddons.retail,
+        lang=EnumLanguages.en,
+        wow_api=wow_api
+    )
+    assert [queue.raider_id for queue in queues[wow_items_id[1]]] == [
+        second_raider.id, raider.id
+    ]
+    assert [queue.position for queue in queues[wow_items_id[1]]] == [1, 2]
+    assert [queue.raider_id for queue in queues[wow_items_id[2]]] == [raider.id]
+    assert queues[wow_items_id[3]] == []
+    for wow_item_id in wow_items_id[1:3]:
+        check_queue(queues[wow_item_id], await db.get_queue_by_item(
+            team_id=team.id, wow_item_id=wow_item_id
+        ))
+    assert await db.get_team_version(team.id) == 6
+
+    # A batch with an unknown raider or item changes nothing
+    with pytest.raises(RaiderNotFoundError):
+        await db.create_queues(
+            team_id=team.id,
+            queues={wow_items_id[1]: [], wow_items_id[2]: ['unknown_raider']},
+            addon=EnumAddons.retail,
+            lang=EnumLanguages.en,
+            wow_api=wow_api
+        )
+    with pytest.raises(WoWItemNotFoundError):
+        await db.create_queues(
+            team_id=team.id,
+            queues={wow_items_id[1]: [], 999999999: [raider.id]},
+            addon=EnumAddons.retail,
+            lang=EnumLanguages.en,
+            wow_api=wow_api
+        )
+    check_queue(queues[wow_items_id[1]], await db.get_queue_by_item(
+        team_id=team.id, wow_item_id=wow_items_id[1]
+    ))
+    assert await db.get_team_version(team.id) == 6
+
+    # An item stored in another language is enough for a queue; the
+    # localized row is fetched afterwards without blocking the request
+    await db.create_wow_items([WoWAPIItem(
+        wow_id=wow_items_id[4],
+        addon=EnumAddons.retail,
+        lang=EnumLanguages.en,
+        html_tooltip='<table>en</table>',
+        icon_url='icon',
+        origin_link='link'
+    )])
+    release_fetch = asyncio.Event()
+
+    async def get_items(**kwargs) -> dict:
+        await release_fetch.wait()
+        return await wow_api.get_items(**kwargs)
+
+    mock_wow_api = mocker.Mock(spec=BaseAsyncWoWAPI)
+    mock_wow_api.get_items = mocker.AsyncMock(side_effect=get_items)
+    queues = await db.create_queues(
+        team_id=team.id,
+        queues={wow_items_id[4]: [raider.id]},
+        addon=EnumAddons.retail,
+        lang=EnumLanguages.de,
+        wow_api=mock_wow_api
+    )
+    assert [queue.raider_id for queue in queues[wow_items_id[4]]] == [raider.id]
+    assert await db.get_wow_item_langs([wow_items_id[4]], EnumAddons.retail) == {
+        wow_items_id[4]: {EnumLanguages.en}
+    }
+    release_fetch.set()
+    await asyncio.gather(*db.background_tasks)  # type: ignore
+    mock_wow_api.get_items.assert_called_once_with(
+        ids=[wow_items_id[4]], addon=EnumAddons.retail, lang=EnumLanguages.de
+    )
+    assert await db.get_wow_item_langs([wow_items_id[4]], EnumAddons.retail) == {
+        wow_items_id[4]: {EnumLanguages.en, EnumLanguages.de}
+    }
+
+    # While WoWHead is unavailable the queue is accepted with a placeholder
+    unavailable_wow_api = mocker.Mock(spec=BaseAsyncWoWAPI)
+    unavailable_wow_api.get_items = mocker.AsyncMock(return_value={})
+    queues = await db.create_queues(
+        team_id=team.id,
+        queues={wow_items_id[5]: [raider.id]},
+        addon=EnumAddons.retail,
+        lang=EnumLanguages.en,
+        wow_api=unavailable_wow_api
+    )
+    assert [queue.raider_id for queue in queues[wow_items_id[5]]] == [raider.id]
+    placeholder = await db.get_wow_item_by_wow_id(
+        wow_id=wow_items_id[5],
+        addon=EnumAddons.retail,
+        lang=EnumLanguages.en,
+        wow_api=unavailable_wow_api
+    )
+    assert placeholder is not None
+    assert placeholder.is_placeholder
+    assert await db.backfill_wow_items(unavailable_wow_api) == 0
+    assert await db.backfill_wow_items(wow_api) == 1
+    wow_item = await db.get_wow_item(placeholder.id)
+    assert not wow_item.is_placeholder
+    assert wow_item.html_tooltip
 
 
 @pytest.mark.asyncio
 async def test_log_model(
-    db: BaseAsyncDB, wow_items_id: list[int]
+    db: BaseAsyncDB, hasher: BaseAsyncHasher, wow_items_id: list[int]
 ) -> None:
     user = await db.create_user(
         username='log_user',
         password='password',
         email='test_log_user@mail.com',
-        is_active=True
+        is_active=True,
+        hasher=hasher
     )
     team = await db.create_team(
         name='log_team',
         addon=EnumAddons.retail,
         owner_id=user.id,
-        password='password'
+        password='password',
+        hasher=hasher
     )
 
     # Method: create_log
+    log_queue = [{
+        'position': 1,
+        'raider': {
+            'id': 'raider_id',
+            'name': 'log_raider',
+            'team_id': team.id,
+            'class_name': EnumClasses.warrior.value,
+            'is_active': True
+        }
+    }]
     log = await db.create_log(
         team_id=team.id,
         user_id=user.id,
         wow_item_id=wow_items_id[0],
-        queue=''
+        queue=log_queue
     )
     assert log.team_id == team.id
     assert log.user_id == user.id
     assert log.wow_item_id == wow_items_id[0]
-    assert log.queue == ''
+    assert log.queue == log_queue
 
     # Method: get_logs
     check_log(
@@ -431,6 +658,40 @@ async def test_log_model(
         (await db.get_logs(team_id=log.team_id, wow_item_id=log.wow_item_id))[0]
     )
 
+    # Method: get_logs (keyset pagination)
+    for _ in range(2):
+        await db.create_log(
+            team_id=team.id,
+            user_id=user.id,
+            wow_item_id=wow_items_id[0],
+            queue=[]
+        )
+    first_page = await db.get_logs(team_id=team.id, limit=2)
+    second_page = await db.get_logs(
+        team_id=team.id, limit=2,
+        after=(first_page[-1].created_at, first_page[-1].id)
+    )
+    assert len(first_page) == 2
+    assert len(second_page) == 1
+    check_log(log, second_page[0])
+    assert [
+        log.id for log in await db.get_logs(team_id=team.id, limit=2, offset=2)
+    ] == [second_page[0].id]
+
+    # Method: create_logs
+    logs = await db.create_logs(
+        team_id=team.id,
+        user_id=user.id,
+        queues={wow_items_id[1]: log_queue, wow_items_id[2]: []}
+    )
+    assert [(log.wow_item_id, log.queue) for log in logs] == [
+        (wow_items_id[1], log_queue), (wow_items_id[2], [])
+    ]
+    for log in logs:
+        check_log(log, (await db.get_logs(
+            team_id=team.id, wow_item_id=log.wow_item_id
+        ))[0])
+
 
 @pytest.mark.asyncio
 async def test_wow_item_model(
@@ -463,24 +724,237 @@ async def test_wow_item_model(
     # Method: get_wow_item
     check_wow_item(wow_item, await db.get_wow_item(wow_item.id))
 
+    # Method: create_wow_items
+    preloaded = [
+        WoWAPIItem(
+            wow_id=wow_id,
+            addon=EnumAddons.tbc,
+            lang=EnumLanguages.fr,
+            html_tooltip=f'<table>{wow_id}</table>',
+            icon_url='icon',
+            origin_link='link'
+        ) for wow_id in range(1, 6)
+    ]
+    assert await db.create_wow_items(preloaded[:3]) == 3
+    assert await db.create_wow_items(preloaded, batch_size=2) == 2
+    assert await db.create_wow_items(preloaded) == 0
+    wow_items = await db.get_wow_items_by_wow_ids(
+        wow_ids=range(1, 6),
+        addon=EnumAddons.tbc,
+        lang=EnumLanguages.fr,
+        wow_api=mock_wow_api
+    )
+    assert {
+        wow_id: wow_item.html_tooltip for wow_id, wow_item in wow_items.items()
+    } == {wow_id: f'<table>{wow_id}</table>' for wow_id in range(1, 6)}
+    mock_wow_api.get_items.assert_not_called()
+
+    # Concurrent lookups of a new item share one request and one row; a
+    # client with its own single flight ends up with the same row
+    requests = wow_api.get_stats().requests
+    other_wow_api = await type(wow_api)(wow_api.config).connect()
+    wow_items = await asyncio.gather(*(
+        db.get_wow_item_by_wow_id(
+            wow_id=wow_items_id[1],
+            addon=EnumAddons.classic,
+            lang=EnumLanguages.de,
+            wow_api=client
+        ) for client in [*[wow_api] * 5, other_wow_api]
+    ))
+    assert wow_api.get_stats().requests == requests + 1
+    assert len({wow_item.id for wow_item in wow_items if wow_item}) == 1
+    await other_wow_api.close()
+
+    # Placeholders are only stored on request and are fetched again on reads
+    unavailable_wow_api = mocker.Mock(spec=BaseAsyncWoWAPI)
+    unavailable_wow_api.get_items = mocker.AsyncMock(return_value={})
+    lookup = {
+        'wow_ids': [wow_items_id[2]],
+        'addon': EnumAddons.classic,
+        'lang': EnumLanguages.en
+    }
+    assert await db.get_wow_items_by_wow_ids(
+        **lookup, wow_api=unavailable_wow_api
+    ) == {}
+    placeholder = (await db.get_wow_items_by_wow_ids(
+        **lookup, wow_api=unavailable_wow_api, placeholders=True
+    ))[wow_items_id[2]]
+    assert placeholder.is_placeholder
+    assert placeholder.html_tooltip == ''
+    check_wow_item(placeholder, (await db.get_wow_items_by_wow_ids(
+        **lookup, wow_api=unavailable_wow_api, placeholders=True
+    ))[wow_items_id[2]])
+    assert unavailable_wow_api.get_items.call_count == 3
+
+    wow_item = (await db.get_wow_items_by_wow_ids(
+        **lookup, wow_api=wow_api
+    ))[wow_items_id[2]]
+    assert wow_item.id == placeholder.id
+    assert not wow_item.is_placeholder
+    assert wow_item.html_tooltip
+    # a fetched item is never replaced
+    assert await db.create_wow_items([WoWAPIItem(
+        wow_id=wow_items_id[2],
+        addon=EnumAddons.classic,
+        lang=EnumLanguages.en,
+        html_tooltip='<table>stale</table>',
+        icon_url='icon',
+        origin_link='link'
+    )]) == 0
+
+    # The backfill takes the least recently attempted placeholders first
+    unknown_lookup = {'addon': EnumAddons.tbc, 'lang': EnumLanguages.en}
+    for wow_id in (900001, 900002):
+        await db.get_wow_items_by_wow_ids(
+            [wow_id], **unknown_lookup, wow_api=unavailable_wow_api,
+            placeholders=True
+        )
+    unavailable_wow_api.get_items.reset_mock()
+    for _ in range(3):
+        assert await db.backfill_wow_items(unavailable_wow_api, batch_size=1) == 0
+    attempted = [
+        call.kwargs['ids'] for call in unavailable_wow_api.get_items.call_args_list
+    ]
+    assert sorted(attempted[:2]) == [[900001], [900002]]
+    assert attempted[2] == attempted[0]
+
+    # a placeholder WoWHead does not know is given up and reads as missing
+    missing_wow_api = mocker.Mock(spec=BaseAsyncWoWAPI)
+    missing_wow_api.get_items = mocker.AsyncMock(return_value={900001: None})
+    assert await db.get_wow_items_by_wow_ids(
+        [900001], **unknown_lookup, wow_api=missing_wow_api, placeholders=True
+    ) == {}
+    assert await db.get_wow_item_langs([900001, 900002], EnumAddons.tbc) == {
+        900002: {EnumLanguages.en}
+    }
+    unavailable_wow_api.get_items.reset_mock()
+    for _ in range(2):
+        await db.backfill_wow_items(unavailable_wow_api, batch_size=1)
+    assert all(
+        call.kwargs['ids'] == [900002]
+        for call in unavailable_wow_api.get_items.call_args_list
+    )
+    # it is stored again once WoWHead has it
+    wow_item = (await db.get_wow_items_by_wow_ids(
+        [900001], **unknown_lookup, wow_api=mocker.Mock(
+            spec=BaseAsyncWoWAPI, get_items=mocker.AsyncMock(return_value={
+                900001: WoWAPIItem(
+                    wow_id=900001, **unknown_lookup, html_tooltip='<table></table>',
+                    icon_url='icon', origin_link='link'
+                )
+            })
+        )
+    ))[900001]
+    assert not wow_item.is_placeholder
+    assert wow_item.backfill_failed_at is None
+
+
+@pytest.mark.asyncio
+async def test_outbox_email_model(db: BaseAsyncDB, hasher: BaseAsyncHasher) -> None:
+    lease = timedelta(minutes=5)
+    outbox_emails = [
+        await db.create_outbox_email(
+            subject='test_subject', body=f'test_body_{i}',
+            to_email=f'test_outbox_{i}@mail.com', html=f'<p>test_body_{i}</p>'
+        ) for i in range(3)
+    ]
+
+    # concurrent claims get disjoint emails
+    claimed = await asyncio.gather(
+        db.claim_outbox_emails(2, lease), db.claim_outbox_emails(2, lease)
+    )
+    claimed_by_id = {email.id: email for batch in claimed for email in batch}
+    assert sum(map(len, claimed)) == len(claimed_by_id) == 3
+    first, second, third = (claimed_by_id[email.id] for email in outbox_emails)
+    assert first.attempts == 1
+    assert first.to_email == 'test_outbox_0@mail.com'
+    assert first.body == 'test_body_0'
+    assert first.html == '<p>test_body_0</p>'
+    assert first.next_attempt_at > datetime.now() + lease - timedelta(minutes=1)
+    # leased emails are not claimed again
+    assert not await db.claim_outbox_emails(10, lease)
+
+    await db.del_outbox_emails([first.id])
+    await db.retry_outbox_email(second.id, timedelta(0), 'timeout')
+    await db.fail_outbox_email(third.id, 'refused')
+    retried = await db.claim_outbox_emails(10, lease)
+    assert [(email.id, email.attempts, email.error) for email in retried] == [
+        (second.id, 2, 'timeout')
+    ]
+    await db.del_outbox_emails([second.id])
+
+    async with db.get_read_session() as session:  # type: ignore
+        failed = (await session.scalars(select(OutboxEmail))).all()
+    assert [(email.id, email.error) for email in failed] == [(third.id, 'refused')]
+    assert failed[0].failed_at is not None
+
+    # an email stored with a user is committed or rolled back with it
+    await db.create_user(
+        username='outbox_user',
+        password='password',
+        email='test_outbox_user@mail.com',
+        is_active=False,
+        hasher=hasher,
+        outbox_email=Email('test_subject', 'test_user', 'test_outbox_user@mail.com')
+    )
+    with pytest.raises(DatabaseError):
+        await db.create_user(
+            username='outbox_lost',
+            password='password',
+            email='test_outbox_lost@mail.com',
+            is_active=False,
+            hasher=hasher,
+            outbox_email=Email('test_subject', 'test_lost', 'a' * 255)
+        )
+    with pytest.raises(UserNotFoundError):
+        await db.get_user_by_username('outbox_lost')
+    claimed = await db.claim_outbox_emails(10, lease)
+    assert [(email.to_email, email.body) for email in claimed] == [
+        ('test_outbox_user@mail.com', 'test_user')
+    ]
+
+
+def test_compressed_string() -> None:
+    column_type = CompressedString(min_size=16)
+    dialect = postgresql.dialect()
+    long_value = '<table><tr><td>item</td></tr></table>' * 20
+    for value in ['', 'short', long_value, 'é' * 40]:
+        stored = column_type.process_bind_param(value, dialect)
+        assert column_type.process_result_value(stored, dialect) == value
+    assert len(column_type.process_bind_param(long_value, dialect) or b'') < 100
+    assert column_type.process_bind_param('short', dialect) == b'\x00short'
+    assert column_type.process_bind_param(None, dialect) is None
+
+    raw_type = CompressedString(min_size=None)
+    stored = raw_type.process_bind_param(long_value, dialect)
+    assert stored == b'\x00' + long_value.encode()
+    assert column_type.process_result_value(stored, dialect) == long_value
+
+    raw_dialect = postgresql.dialect()
+    setattr(raw_dialect, CompressedString.MIN_SIZE_ATTR, None)
+    assert column_type.process_bind_param(long_value, raw_dialect) == stored
+    assert column_type.process_bind_param(long_value, dialect) != stored
+
 
 @pytest.mark.asyncio
 async def test_full_team(
-    db: BaseAsyncDB, wow_api: BaseAsyncWoWAPI, wow_items_id: list[int],
-    full_team_dump: dict
+    db: BaseAsyncDB, wow_api: BaseAsyncWoWAPI, hasher: BaseAsyncHasher,
+    wow_items_id: list[int], full_team_dump: dict
 ) -> None:
     user = await db.create_user(
         username='full_team',
         password='password',
         email='test_full_team@mail.com',
-        is_active=True
+        is_active=True,
+        hasher=hasher
     )
 
     team = await db.create_team(
         name='full_team',
         addon=EnumAddons.retail,
         owner_id=user.id,
-        password='password'
+        password='password',
+        hasher=hasher
     )
 
     raiders = []
@@ -529,3 +1003,109 @@ async def test_full_team(
 
     diff = DeepDiff(full_team, full_team_dump)
     assert not diff, diff
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_query_plans(
+    plan_db: AsyncSQLAlchemyDB, wow_api: BaseAsyncWoWAPI, hasher: BaseAsyncHasher
+) -> None:
+    teams_count, logs_count, items_count = 10_000, 1_000_000, 10_000
+    user = await plan_db.create_user(
+        username='plan_user',
+        password='password',
+        email='test_plan_user@mail.com',
+        is_active=True,
+        hasher=hasher
+    )
+
+    def series(stop: int, name: str):  # noqa: ANN202
+        return func.generate_series(1, stop).column_valued(name)
+
+    def team_id(number):  # noqa: ANN001, ANN202
+        return literal('plan_team_') + cast(number, String)
+
+    team_n = series(teams_count, 'team_n')
+    log_n = series(logs_count, 'log_n')
+    item_n = series(items_count, 'item_n')
+    queue_n = series(10, 'queue_n')
+    async with plan_db.engine.begin() as conn:
+        await conn.execute(insert(Team).from_select(
+            ['id', 'name', 'addon', 'is_vip', 'owner_id', 'password'],
+            select(
+                team_id(team_n), literal('plan_') + cast(team_n, String),
+                literal(EnumAddons.retail, Team.addon.type), literal(False),
+                literal(user.id),
+                literal('password')
+            )
+        ))
+        await conn.execute(insert(Raider).from_select(
+            ['id', 'name', 'team_id', 'class_name', 'is_active'],
+            select(
+                team_id(team_n), literal('plan_raider'), team_id(team_n),
+                literal(EnumClasses.warrior, Raider.class_name.type), literal(True)
+            )
+        ))
+        await conn.execute(insert(Queue).from_select(
+            ['id', 'position', 'team_id', 'raider_id', 'wow_item_id'],
+            select(
+                team_id(team_n) + '_' + cast(queue_n, String), literal(1),
+                team_id(team_n), team_id(team_n), queue_n
+            )
+        ))
+        await conn.execute(insert(Log).from_select(
+            ['id', 'team_id', 'user_id', 'wow_item_id', 'created_at', 'queue'],
+            select(
+                literal('plan_log_') + cast(log_n, String),
+                team_id(log_n % teams_count + 1), literal(user.id),
+                cast(log_n % 50, Integer),
+                func.now() - func.make_interval(0, 0, 0, 0, 0, 0, log_n),
+                literal([], Log.queue.type)
+            )
+        ))
+        await conn.execute(insert(WoWItem).from_select(
+            ['id', 'wow_id', 'addon', 'lang', 'html_tooltip', 'icon_url',
+             'origin_link'],
+            select(
+                literal('plan_item_') + cast(item_n, String), item_n,
+                literal(EnumAddons.retail, WoWItem.addon.type),
+                literal(EnumLanguages.en, WoWItem.lang.type),
+                literal('', WoWItem.html_tooltip.type), literal(''), literal('')
+            )
+        ))
+        for table in (Team, Raider, Queue, Log, WoWItem):
+            await conn.exec_driver_sql(f'ANALYZE {table.__tablename__}')
+
+    queue_index = 'ix_queues_team_id_wow_item_id_position'
+    for call in (
+        plan_db.get_queues('plan_team_1'),
+        plan_db.get_queue_by_item('plan_team_1', 1),
+        plan_db.is_queue_exists('plan_team_1', 1)
+    ):
+        check_index_scan(await get_query_plans(plan_db, call), 'queues', queue_index)
+    check_index_scan(
+        await get_query_plans(plan_db, plan_db.get_logs('plan_team_1', limit=50)),
+        'logs', 'ix_logs_team_id_created_at_id'
+    )
+    last_log = (await plan_db.get_logs('plan_team_1', limit=50))[-1]
+    check_index_scan(
+        await get_query_plans(plan_db, plan_db.get_logs(
+            'plan_team_1', limit=50, after=(last_log.created_at, last_log.id)
+        )),
+        'logs', 'ix_logs_team_id_created_at_id'
+    )
+    check_index_scan(
+        await get_query_plans(
+            plan_db, plan_db.get_logs('plan_team_1', wow_item_id=1, limit=50)
+        ),
+        'logs', 'ix_logs_team_id_wow_item_id_created_at_id'
+    )
+    check_index_scan(
+        await get_query_plans(plan_db, plan_db.get_wow_item_by_wow_id(
+            wow_id=1,
+            addon=EnumAddons.retail,
+            lang=EnumLanguages.en,
+            wow_api=wow_api
+        )),
+        'wow_items', 'ix_wow_items_wow_id_addon_lang'
+    )
@@ -0,0 +1,73 @@
+# flake8-in-file-ignores: noqa: WPS432
+
+import asyncio
+import logging
+
+import pytest
+
+from app.hashers.base import BaseAsyncHasher, PasslibAsyncHasher
+from app.hashers.configs import BaseHasherConfig, PasslibConfig
+
+parametrize = {
+    'argnames': 'hasher_type, config',
+    'argvalues': [
+        [
+            PasslibAsyncHasher,
+            PasslibConfig(
+                logger=logging.getLogger('hasher'),
+                executor='thread',
+                max_workers=2,
+                max_concurrency=2
+            )
+        ],
+        [
+            PasslibAsyncHasher,
+            PasslibConfig(
+                logger=logging.getLogger('hasher'),
+                executor='process',
+                max_workers=2,
+                max_concurrency=2
+            )
+        ]
+    ]
+}
+
+
+@pytest.mark.parametrize(**parametrize)
+@pytest.mark.asyncio
+async def test_hasher(
+    hasher_type: type[BaseAsyncHasher], config: BaseHasherConfig
+) -> None:
+    hasher = hasher_type(config)
+    await hasher.connect()
+
+    hashed_password = await hasher.hash('password')
+    assert hashed_password != 'password', 'The password is not hashed'
+    assert await hasher.verify('password', hashed_password) is True
+    assert await hasher.verify('invalid_password', hashed_password) is False
+    assert await hasher.verify('password', 'not_a_hash') is False
+
+    await hasher.close()
+
+
+@pytest.mark.parametrize(**parametrize)
+@pytest.mark.asyncio
+async def test_hasher_concurrency(
+    hasher_type: type[BaseAsyncHasher], config: BaseHasherConfig
+) -> None:
+    hasher = hasher_type(config)
+    await hasher.connect()
+
+    hashed_passwords = await asyncio.gather(*[
+        hasher.hash(f'password_{i}') for i in range(8)
+    ])
+    assert len(set(hashed_passwords)) == 8
+
+    stats = hasher.get_stats()
+    assert stats.completed == 8
+    assert stats.in_flight == 0
+    assert stats.queue_depth == 0
+    assert stats.max_queue_depth > config.max_concurrency, \
+        'Requests over the concurrency limit should wait in the queue'
+
+    await hasher.close()
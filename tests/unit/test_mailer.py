@@ -1,13 +1,26 @@
 # flake8-in-file-ignores: noqa: WPS432
 
+import asyncio
 import logging
+from email import message_from_bytes, policy
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Self
 
 import httpx
 import pytest
+from sqlalchemy import select
 from testcontainers.mailpit import MailpitContainer
+from testcontainers.postgres import PostgresContainer
 
-from app.mailers.base import AsyncSMTPMailer, BaseAsyncMailer
+from app.db.sqlalchemy.base import AsyncSQLAlchemyDB
+from app.db.sqlalchemy.config import SQLAlchemyDBConfig
+from app.db.sqlalchemy.models import OutboxEmail
+from app.mailers.base import (AsyncSMTPMailer, BaseAsyncMailer, Email,
+                              MailerError, NonExistentEmail, build_message)
 from app.mailers.configs import BaseMailerConfig, SMTPConfig
+from app.mailers.outbox import MailOutbox
+from app.mailers.templates import EmailTemplate, EmailTemplates, text_to_html
 
 
 def update_config(config: BaseMailerConfig, testcontainer: MailpitContainer) -> None:
@@ -17,6 +30,43 @@ def update_config(config: BaseMailerConfig, testcontainer: MailpitContainer) ->
         config.smtp_port = testcontainer.get_exposed_smtp_port()  # type: ignore
 
 
+async def get_messages(testcontainer: MailpitContainer) -> list[dict]:
+    async with httpx.AsyncClient() as client:
+        smtp_response = await client.get((
+            'http://' + testcontainer.get_container_host_ip()
+            + ':' + str(testcontainer.get_exposed_port(8025))
+            + '/api/v1/messages'
+        ))
+    return smtp_response.json()['messages']
+
+
+@dataclass
+class FakeMailer(BaseAsyncMailer[BaseMailerConfig]):
+    sent: list[str] = field(default_factory=list)
+    concurrent: int = 0
+    max_concurrent: int = 0
+
+    async def connect(self) -> Self:
+        return self
+
+    async def send(
+        self, subject: str, body: str, to_email: str, html: str | None = None
+    ) -> None:
+        self.concurrent += 1
+        self.max_concurrent = max(self.max_concurrent, self.concurrent)
+        try:
+            await asyncio.sleep(0.01)
+            if to_email.startswith('refused'):
+                raise NonExistentEmail
+            if to_email.startswith('broken'):
+                raise MailerError('Connection lost')
+            self.sent.append(to_email)
+        finally:
+            self.concurrent -= 1
+
+    async def close(self) -> None: ...
+
+
 @pytest.mark.parametrize(
     argnames='mailer_type, config',
     argvalues=[
@@ -47,13 +97,7 @@ async def test_smtp_mailer(
             body='test_body',
             to_email='to_test_email@mail.com'
         )
-        async with httpx.AsyncClient() as client:
-            smtp_response = await client.get((
-                'http://' + mailpit.get_container_host_ip()
-                + ':' + str(mailpit.get_exposed_port(8025))
-                + '/api/v1/messages'
-            ))
-        message = smtp_response.json()['messages'][0]
+        message = (await get_messages(mailpit))[0]
 
         assert message['From']['Address'] == 'test@mail.com'
         assert message['To'][0]['Address'] == 'to_test_email@mail.com'
@@ -61,3 +105,180 @@ async def test_smtp_mailer(
         assert message['Snippet'] == 'test_body'
 
         await mailer.close()
+
+
+@pytest.mark.asyncio
+async def test_smtp_mailer_pool() -> None:
+    config = SMTPConfig(
+        logger=logging.getLogger('mailer'),
+        self_email='test@mail.com',
+        smtp_user='',
+        smtp_password='',
+        smtp_server='',
+        smtp_port=0,
+        pool_size=3,
+        health_check_interval=0
+    )
+    with MailpitContainer() as mailpit:
+        update_config(config, mailpit)
+        mailer = AsyncSMTPMailer(config)
+        await mailer.connect()
+
+        async def send_all(count: int) -> None:
+            await asyncio.gather(*(
+                mailer.send(
+                    subject='test_subject',
+                    body='test_body',
+                    to_email=f'to_test_email_{i}@mail.com'
+                ) for i in range(count)
+            ))
+
+        await send_all(10)
+        sessions = list(mailer.sessions._queue)  # type: ignore # noqa: WPS437
+        assert len(sessions) == 3
+        assert all(session.smtp.is_connected for session in sessions)
+
+        # the server drops every connection, sessions are reconnected
+        for session in sessions:
+            session.smtp.transport.abort()
+        await send_all(10)
+        assert all(session.smtp.is_connected for session in sessions)
+        assert len(await get_messages(mailpit)) == 20
+
+        await mailer.close()
+        assert not any(session.smtp.is_connected for session in sessions)
+
+
+@pytest.mark.asyncio
+async def test_mail_outbox() -> None:
+    with PostgresContainer(dbname='lootx', driver='asyncpg') as postgres:
+        db = AsyncSQLAlchemyDB(SQLAlchemyDBConfig(
+            logger=logging.getLogger('db'),
+            db_url=postgres.get_connection_url(),
+            session_maker_kwargs={'expire_on_commit': False}
+        ))
+        await db.connect()
+        mailer = FakeMailer(BaseMailerConfig(
+            logger=logging.getLogger('mailer'), self_email='test@mail.com'
+        ))
+        outbox = MailOutbox(
+            db=db,
+            mailer=mailer,
+            workers=3,
+            batch_size=5,
+            poll_interval=1,
+            retry_delay=timedelta(0),
+            max_attempts=2
+        )
+
+        # emails stored before a restart are sent once the outbox is running
+        await db.create_outbox_email('subject', 'body', 'stored@mail.com')
+        await outbox.connect()
+        for to_email in [
+            *(f'to_test_email_{i}@mail.com' for i in range(20)),
+            'refused@mail.com', 'broken@mail.com'
+        ]:
+            await outbox.send(Email('subject', 'body', to_email))
+
+        async def delivered() -> None:
+            while outbox.stats.sent + outbox.stats.failed < 23:
+                await asyncio.sleep(0.05)
+
+        await asyncio.wait_for(delivered(), 30)
+        await outbox.close()
+        async with db.get_read_session() as session:
+            failed = (await session.scalars(
+                select(OutboxEmail).order_by(OutboxEmail.to_email)
+            )).all()
+        await db.close()
+
+    assert sorted(mailer.sent) == sorted(
+        ['stored@mail.com'] + [f'to_test_email_{i}@mail.com' for i in range(20)]
+    )
+    assert mailer.max_concurrent == 3
+    stats = outbox.get_stats()
+    assert (stats.enqueued, stats.sent, stats.retried, stats.failed) == (22, 21, 1, 2)
+
+    assert [(email.to_email, email.attempts) for email in failed] == [
+        ('broken@mail.com', 2), ('refused@mail.com', 1)
+    ]
+
+
+def test_email_templates() -> None:
+    text = 'Visit http://localhost/verify/{token}\nDo not <share> it.'
+    templates = EmailTemplates(default_lang='en')
+    templates.add('verify', 'en', EmailTemplate('Verify', text, text_to_html(text)))
+    templates.add('verify', 'ru', EmailTemplate('Подтверждение', text))
+
+    email = templates.render('verify', 'en', to_email='to@mail.com', token='a&b')
+    assert email == Email(
+        subject='Verify',
+        body='Visit http://localhost/verify/a&b\nDo not <share> it.',
+        to_email='to@mail.com',
+        html=(
+            '<p>Visit <a href="http://localhost/verify/a&amp;b">'
+            'http://localhost/verify/a&amp;b</a></p>\n'
+            '<p>Do not &lt;share&gt; it.</p>'
+        )
+    )
+    assert templates.render('verify', 'ru', 'to@mail.com', token='t').html is None
+    email = templates.render('verify', 'de', 'to@mail.com', token='t')
+    assert email.subject == 'Verify'
+    with pytest.raises(KeyError):
+        templates.render('verify', 'en', 'to@mail.com')
+    with pytest.raises(ValueError):
+        EmailTemplate('Verify', 'Visit {}')
+
+    message = message_from_bytes(
+        build_message(email, 'test@mail.com'), policy=policy.default
+    )
+    assert message['From'] == 'test@mail.com'
+    assert message['To'] == 'to@mail.com'
+    assert message['Subject'] == 'Verify'
+    assert message.get_body(('plain',)).get_content() == email.body
+    assert message.get_body(('html',)).get_content() == email.html
+    russian = templates.render('verify', 'ru', 'to@mail.com', token='t')
+    assert message_from_bytes(
+        build_message(russian, 'test@mail.com'), policy=policy.default
+    )['Subject'] == 'Подтверждение'
+    with pytest.raises(NonExistentEmail):
+        build_message(Email('Verify', 'body', 'to@mail.com\r\nBcc: x@mail.com'), '')
+
+
+@pytest.mark.asyncio
+async def test_smtp_mailer_send_many() -> None:
+    config = SMTPConfig(
+        logger=logging.getLogger('mailer'),
+        self_email='test@mail.com',
+        smtp_user='',
+        smtp_password='',
+        smtp_server='',
+        smtp_port=0,
+        pool_size=1
+    )
+    with MailpitContainer() as mailpit:
+        update_config(config, mailpit)
+        mailer = AsyncSMTPMailer(config)
+        await mailer.connect()
+
+        emails = [
+            Email('test_subject', f'test_body_{i}', f'to_test_email_{i}@mail.com')
+            for i in range(50)
+        ]
+        emails[10] = Email('test_subject', 'body', 'to@mail.com\r\nBcc: x@mail.com')
+        assert await mailer.send_many(emails[:10]) == [None] * 10
+
+        # the server dropped the connection between the batches
+        mailer.sessions._queue[0].smtp.transport.abort()  # type: ignore # noqa: WPS437
+        await asyncio.sleep(0)
+        errors = await mailer.send_many(emails[10:])
+        assert isinstance(errors[0], NonExistentEmail)
+        assert errors[1:] == [None] * 39
+
+        messages = await get_messages(mailpit)
+        assert len(messages) == 49
+        assert {message['Snippet'] for message in messages} == {
+            email.body for email in emails if email is not emails[10]
+        }
+
+        await mailer.close()
@@ -14,6 +14,8 @@ from app.db.abc.base import BaseAsyncDB
 from app.db.exc import UserNotFoundError
 from app.db.sqlalchemy.base import AsyncSQLAlchemyDB
 from app.db.sqlalchemy.config import SQLAlchemyDBConfig
+from app.hashers.base import PasslibAsyncHasher
+from app.hashers.configs import PasslibConfig
 from app.task_managers.base import (BaseAsyncTaskManager, KapustaTaskManager,
                                     Tasks)
 from app.task_managers.configs import BaseTaskManagerConfig, KapustaConfig
@@ -25,6 +27,7 @@ db_config = SQLAlchemyDBConfig(
     db_url='',
     session_maker_kwargs={'expire_on_commit': False}
 )
+hasher = PasslibAsyncHasher(PasslibConfig(logger=logging.getLogger('hasher')))
 
 
 def del_inactive_user_task(db: BaseAsyncDB) -> Callable[..., Coroutine[Any, Any, None]]:
@@ -78,13 +81,15 @@ async def test_task_manager(
         )
 
         await db.connect()
+        await hasher.connect()
         await task_manager.connect()
 
         user = await db.create_user(
             username=task_manager_type.__name__[:12],
             password='password',
             email='task_manager_test@mail.com',
-            is_active=False
+            is_active=False,
+            hasher=hasher
         )
         await task_manager.del_inactive_user(
             user_id=user.id,
@@ -95,4 +100,5 @@ async def test_task_manager(
             user = await db.get_user(user.id)
 
         await task_manager.close()
+        await hasher.close()
         await db.close()
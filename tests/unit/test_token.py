@@ -1,32 +1,77 @@
 # flake8-in-file-ignores: noqa: WPS432
 
+import asyncio
 import logging
-from datetime import timedelta
+from datetime import UTC, datetime, timedelta
 
+import jwt
 import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
 from deepdiff import DeepDiff
+from pytest_mock import MockerFixture
+from testcontainers.redis import RedisContainer
 
-from app.tokens.base import (BaseToken, JWToken, JWTokenConfig,
-                             create_access_token, create_change_password_token,
+from app.tokens.base import (BaseToken, DecodeTokenError, JWToken,
+                             JWTokenConfig, create_access_token,
+                             create_change_password_token,
                              create_delete_team_token, create_refresh_token,
-                             create_registration_token, verify_access_token,
-                             verify_change_password_token,
+                             create_registration_token, get_jwks, prepare_key,
+                             verify_access_token, verify_change_password_token,
                              verify_delete_team_token, verify_refresh_token,
                              verify_registration_token)
-from app.tokens.configs import BaseTokenConfig
+from app.caches.base import RedisAsyncCache
+from app.caches.configs import RedisConfig
+from app.tokens.cache import VerifiedTokenCache, VerifiedTokenCacheStats
+from app.tokens.configs import BaseTokenConfig, JWTKey
+from app.tokens.families import (RefreshTokenFamilies,
+                                 RefreshTokenFamiliesStats,
+                                 RefreshTokenReusedError,
+                                 RefreshTokenRevokedError)
+from app.tokens.payloads import AccessTokenPayload, RefreshTokenPayload
+
+PRIVATE_KEYS = {
+    'EdDSA': ed25519.Ed25519PrivateKey.generate,
+    'ES256': lambda: ec.generate_private_key(ec.SECP256R1()),
+    'RS256': lambda: rsa.generate_private_key(public_exponent=65537, key_size=2048)
+}
+
+
+def make_jwt_key(kid: str, alg: str, **kwargs) -> JWTKey:
+    private_key = PRIVATE_KEYS[alg]()
+    return JWTKey(
+        kid=kid,
+        alg=alg,
+        public_key=private_key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode(),
+        private_key=private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        ).decode(),
+        **kwargs
+    )
+
+
+def make_config(**kwargs) -> JWTokenConfig:
+    return JWTokenConfig(
+        logger=logging.getLogger('token'),
+        alg='HS256',  # type: ignore
+        typ='JWT',
+        **kwargs
+    )
+
 
 parametrize = {
     'argnames': 'token_type, config',
     'argvalues': [
-        [
-            JWToken,
-            JWTokenConfig(
-                logger=logging.getLogger('token'),
-                alg='HS256',  # type: ignore
-                typ='JWT',
-                key='SECRET_KEY'
-            )
-        ]
+        [JWToken, make_config(key='SECRET_KEY')],
+        *(
+            [JWToken, make_config(keys=[make_jwt_key(f'{alg}-key', alg)])]
+            for alg in PRIVATE_KEYS
+        )
     ]
 }
 
@@ -144,3 +189,178 @@ async def test_delete_team_token(
         verify_token.payload.model_dump()
     )
     assert not diff, diff
+
+
+def test_verified_token_cache(mocker: MockerFixture) -> None:
+    now = mocker.patch('time.time', return_value=1000.0)
+    cache = VerifiedTokenCache(max_size=2)
+    first = AccessTokenPayload(exp=1010, sub='first_user')
+    second = AccessTokenPayload(exp=1100, sub='second_user')
+
+    assert cache.get('first') is None
+    cache.add('first', first)
+    cache.add('second', second)
+    assert cache.get('first') is first
+    # the least recently used token is evicted
+    cache.add('third', AccessTokenPayload(exp=1100, sub='second_user'))
+    assert cache.get('second') is None
+    assert cache.get('first') is first
+
+    # an expired token is dropped, so verifying it again reports the expiry
+    now.return_value = 1010.0
+    assert cache.get('first') is None
+
+    cache.add('second', second)
+    cache.revoke('third')
+    assert cache.get('third') is None
+    assert cache.get('second') is second
+    cache.revoke_subject('second_user')
+    assert cache.get('second') is None
+    assert cache.get_stats() == VerifiedTokenCacheStats(
+        hits=3, misses=5, expired=1, evicted=1, revoked=2, size=0
+    )
+
+
+@pytest.mark.parametrize(**parametrize)
+def test_verified_token_cache_hits(
+    token_type: type[BaseToken], config: BaseTokenConfig
+) -> None:
+    # what auth_client does per request, without and with the cache
+    token = create_access_token(
+        token_type=token_type,
+        token_config=config,
+        exp=timedelta(hours=1),
+        sub='test_user'
+    ).encode()
+
+    def authenticate(cache: VerifiedTokenCache) -> AccessTokenPayload:
+        payload = cache.get(token)
+        if payload is None:
+            payload = verify_access_token(token, token_type, config).payload
+            cache.add(token, payload)  # type: ignore
+        return payload  # type: ignore
+
+    for max_size, hits in [(0, 0), (100, 1999)]:
+        cache = VerifiedTokenCache(max_size=max_size)
+        for _ in range(2000):
+            assert authenticate(cache).sub == 'test_user'
+        stats = cache.get_stats()
+        assert (stats.hits, stats.misses) == (hits, 2000 - hits)
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_families(mocker: MockerFixture) -> None:
+    with RedisContainer() as container:
+        cache = await RedisAsyncCache(RedisConfig(
+            logger=logging.getLogger('redis'),
+            redis_host=container.get_container_host_ip(),
+            redis_port=container.get_exposed_port(6379)
+        )).connect()
+        families = RefreshTokenFamilies(cache)
+        exp = timedelta(weeks=5)
+
+        def rotate(payload: RefreshTokenPayload) -> RefreshTokenPayload:
+            return RefreshTokenPayload(
+                exp=payload.exp, sub=payload.sub, jti=f'{payload.jti}+', fid=payload.fid
+            )
+
+        first = RefreshTokenPayload(exp=0, sub='user', jti='1', fid='family')
+        await families.start(first, exp)
+        # a rotation is one compare and set
+        compare_and_set = mocker.spy(cache, 'compare_and_set')
+        second = rotate(first)
+        await families.rotate(first, second, exp)
+        third = rotate(second)
+        await families.rotate(second, third, exp)
+        assert compare_and_set.call_count == 2
+        assert 0 < await cache.redis.ttl('rtf: family') <= exp.total_seconds()
+
+        # a concurrent rotation of one token succeeds once
+        results = await asyncio.gather(
+            families.rotate(third, rotate(third), exp),
+            families.rotate(third, rotate(third), exp),
+            return_exceptions=True
+        )
+        assert {type(result) for result in results} == {
+            RefreshTokenReusedError, type(None)
+        }
+        # the stolen token kills the family, the newest one included
+        with pytest.raises(RefreshTokenRevokedError):
+            await families.rotate(rotate(third), rotate(rotate(third)), exp)
+
+        other = RefreshTokenPayload(exp=0, sub='user', jti='1', fid='other')
+        await families.start(other, exp)
+        await families.revoke(other, exp)
+        with pytest.raises(RefreshTokenRevokedError):
+            await families.rotate(other, rotate(other), exp)
+        with pytest.raises(RefreshTokenRevokedError):
+            await families.rotate(
+                RefreshTokenPayload(exp=0, sub='user', jti='1', fid='unknown'),
+                other, exp
+            )
+        assert families.get_stats() == RefreshTokenFamiliesStats(
+            started=2, rotated=3, rejected=4, reused=1, revoked=2
+        )
+
+        await cache.close()
+
+
+def test_jwt_key_rotation() -> None:
+    now = datetime.now(UTC)
+    old_key = make_jwt_key('old', 'EdDSA')
+    new_key = make_jwt_key('new', 'ES256', active_from=now + timedelta(hours=1))
+    config = make_config(key='SECRET_KEY', keys=[old_key, new_key])
+
+    def sign(config: JWTokenConfig) -> str:
+        return create_access_token(JWToken, config, timedelta(hours=1), 'user').encode()
+
+    legacy_token = sign(make_config(key='SECRET_KEY'))
+    old_token = sign(config)
+    assert jwt.get_unverified_header(old_token)['kid'] == 'old'
+
+    # the new key signs once active, tokens of the old one stay valid
+    new_key.active_from = now - timedelta(minutes=1)
+    new_token = sign(config)
+    assert jwt.get_unverified_header(new_token) == {
+        'alg': 'ES256', 'kid': 'new', 'typ': 'JWT'
+    }
+    for token in [legacy_token, old_token, new_token]:
+        assert verify_access_token(token, JWToken, config).payload.sub == 'user'
+
+    old_key.expires_at = now
+    with pytest.raises(DecodeTokenError):
+        verify_access_token(old_token, JWToken, config)
+    with pytest.raises(DecodeTokenError):
+        verify_access_token(new_token, JWToken, make_config(keys=[old_key]))
+    with pytest.raises(DecodeTokenError):
+        verify_access_token(legacy_token, JWToken, make_config(keys=[new_key]))
+
+    # PEM keys are parsed once
+    hits = prepare_key.cache_info().hits
+    verify_access_token(new_token, JWToken, config)
+    assert prepare_key.cache_info().hits == hits + 1
+
+    # other services verify with the public keys alone
+    jwks = jwt.PyJWKSet.from_dict(get_jwks(config))
+    assert jwt.decode(
+        new_token, key=jwks['new'].key, algorithms=['ES256']
+    )['sub'] == 'user'
+    assert 'd' not in get_jwks(config)['keys'][0]
+
+
+def test_jwt_key_naive_timestamps() -> None:
+    # naive timestamps, e.g. from an env file, are read as UTC
+    now = datetime.now(UTC)
+    old_key = make_jwt_key(
+        'old', 'EdDSA', expires_at=(now + timedelta(hours=1)).replace(tzinfo=None)
+    )
+    new_key = make_jwt_key(
+        'new', 'ES256', active_from=(now + timedelta(hours=2)).isoformat()[:19]
+    )
+    assert old_key.expires_at == (now + timedelta(hours=1))
+    assert new_key.active_from is not None
+    assert new_key.active_from.tzinfo is UTC
+    config = make_config(keys=[old_key, new_key])
+    token = create_access_token(JWToken, config, timedelta(hours=1), 'user').encode()
+    assert jwt.get_unverified_header(token)['kid'] == 'old'
+    assert verify_access_token(token, JWToken, config).payload.sub == 'user'
@@ -0,0 +1,319 @@
+# flake8-in-file-ignores: noqa: WPS432
+
+import asyncio
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import AsyncGenerator
+
+import pytest
+import pytest_asyncio
+from pytest_mock import MockerFixture
+
+from app.db.enums import EnumAddons, EnumLanguages
+from app.db.wow_api.base import (WoWAPIStats, WoWAPIUnavailableError,
+                                  WoWHeadAPI, minify_html)
+from app.db.wow_api.circuit_breaker import CircuitBreaker, CircuitState
+from app.db.wow_api.configs import WoWHeadAPIConfig
+from app.db.wow_api.negative_cache import NegativeCache, NegativeCacheStats
+
+ITEM_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?><wowhead><item id="{id}">'
+    '<name><![CDATA[Item {id}]]></name><icon displayId="1">icon_{id}</icon>'
+    '<htmlTooltip><![CDATA[<table>\n  <tr>\n    <td><b>Item  {id}</b>  <br />\n'
+    '    Binds when picked up</td>\n  </tr>\n</table>]]></htmlTooltip>'
+    '<json><![CDATA["id":{id}]]></json>'
+    '<link>https://www.wowhead.com/item={id}</link></item></wowhead>'
+)
+BAD_XML = '<wowhead><item id="1"><icon>icon</item></wowhead>'  # noqa: WPS323
+MISSING_XML = '<wowhead><error>Item not found!</error></wowhead>'
+
+
+@dataclass
+class StubWoWHead:
+    # item id -> [(status, delay)]; the last response repeats
+    responses: dict[int, list[tuple[int, float]]] = field(default_factory=dict)
+    calls: dict[int, int] = field(default_factory=dict)
+    in_flight: int = 0
+    max_in_flight: int = 0
+    request_times: list[float] = field(default_factory=list)
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while request_line := await reader.readline():
+                while await reader.readline() not in {b'\r\n', b''}: ...
+                await self.respond(request_line, reader, writer)
+        except ConnectionError: ...
+        finally:
+            writer.close()
+
+    async def respond(
+        self, request_line: bytes, reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter
+    ) -> None:
+        id = int(re.search(rb'item=(\d+)', request_line).group(1))  # type: ignore
+        self.request_times.append(asyncio.get_running_loop().time())
+        responses = self.responses.get(id, [(200, 0.01)])
+        status, delay = responses[min(self.calls.get(id, 0), len(responses) - 1)]
+        self.calls[id] = self.calls.get(id, 0) + 1
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            # a client that gave up closes the connection
+            if await asyncio.wait_for(reader.read(1), delay) == b'':
+                raise ConnectionError
+        except asyncio.TimeoutError: ...
+        finally:
+            self.in_flight -= 1
+
+        body = (
+            BAD_XML if id == 999 else
+            MISSING_XML if id >= 1000 else ITEM_XML.format(id=id)
+        ).encode()
+        writer.write(
+            f'HTTP/1.1 {status} Stub\r\nContent-Length: {len(body)}\r\n'
+            f'Retry-After: 0\r\n\r\n'.encode() + body
+        )
+        await writer.drain()
+
+
+@pytest_asyncio.fixture
+async def stub() -> AsyncGenerator[tuple[StubWoWHead, str], None]:
+    stub = StubWoWHead()
+    server = await asyncio.start_server(stub.handle, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        yield stub, f'http://127.0.0.1:{port}/{{addon}}/{{lang}}/item={{id}}&xml'
+
+
+def make_config(url: str, **kwargs) -> WoWHeadAPIConfig:
+    return WoWHeadAPIConfig(
+        logger=logging.getLogger('wow_head'),
+        url=url,
+        icon_url='https://wow.zamimg.com/images/wow/icons/large/{icon}.jpg',
+        **kwargs
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_items(stub: tuple[StubWoWHead, str]) -> None:
+    server, url = stub
+    server.responses = {
+        1: [(503, 0), (200, 0)],     # recovers after a retry
+        2: [(429, 0), (200, 0)],     # throttled once
+        3: [(500, 0)],               # always failing
+        4: [(200, 1)],               # always past the deadline
+        5: [(200, 1), (200, 0)],     # late once
+    }
+    wow_api = await WoWHeadAPI(make_config(
+        url, max_concurrency=4, rate_limit=1000, rate_limit_burst=1000,
+        request_timeout=0.3, max_retries=2, retry_backoff=0.01,
+        circuit_breaker_min_calls=1000
+    )).connect()
+
+    ids = [*range(1, 41), 1000, 1001, 1]
+    items = await wow_api.get_items(ids, EnumAddons.retail, EnumLanguages.en)
+
+    # partial result: failed ids are left out, missing ones map to None
+    assert set(items) == set(range(1, 41)) - {3, 4} | {1000, 1001}
+    assert items[1000] is None and items[1001] is None
+    assert items[1] is not None
+    assert items[1].wow_id == 1
+    assert items[1].origin_link == 'https://www.wowhead.com/item=1'
+    assert items[1].icon_url.endswith('/icon_1.jpg')
+    assert items[1].html_tooltip == (
+        '<table><tr><td><b>Item  1</b><br />\n'
+        '    Binds when picked up</td></tr></table>'
+    )
+    assert all(items[id] is not None for id in (2, 5))
+    assert server.calls[1] == 2 and server.calls[3] == 3 and server.calls[4] == 3
+
+    assert server.max_in_flight <= 4
+    assert wow_api.get_stats() == WoWAPIStats(
+        requests=49, retries=7, failures=2, in_flight=0, max_in_flight=4
+    )
+
+    # a single item still goes through retries
+    assert (await wow_api.get_item(1, EnumAddons.retail, EnumLanguages.en)) is not None
+
+    await wow_api.close()
+
+
+@pytest.mark.asyncio
+async def test_get_items_rate_limit(stub: tuple[StubWoWHead, str]) -> None:
+    server, url = stub
+    wow_api = await WoWHeadAPI(make_config(
+        url, max_concurrency=16, rate_limit=20, rate_limit_burst=5
+    )).connect()
+
+    items = await wow_api.get_items(
+        list(range(1, 26)), EnumAddons.retail, EnumLanguages.en
+    )
+    assert len(items) == 25
+    # a burst of 5, then 20 more at 20 per second
+    assert server.request_times[-1] - server.request_times[0] >= 0.9
+    assert server.request_times[4] - server.request_times[0] < 0.1
+
+    await wow_api.close()
+
+
+@pytest.mark.asyncio
+async def test_negative_cache(stub: tuple[StubWoWHead, str]) -> None:
+    server, url = stub
+    server.responses = {3: [(500, 0)]}
+    wow_api = await WoWHeadAPI(make_config(
+        url, max_retries=0, negative_cache_max_size=100
+    )).connect()
+
+    for _ in range(3):
+        items = await wow_api.get_items(
+            [1, 2, 3, 1000, 1001], EnumAddons.retail, EnumLanguages.en
+        )
+        assert set(items) == {1, 2, 1000, 1001}
+    assert await wow_api.get_item(1000, EnumAddons.retail, EnumLanguages.en) is None
+
+    # missing items are asked for once; failures are not cached
+    assert server.calls == {1: 3, 2: 3, 3: 3, 1000: 1, 1001: 1}
+    # the key includes addon and lang
+    await wow_api.get_item(1000, EnumAddons.classic, EnumLanguages.en)
+    assert server.calls[1000] == 2
+
+    stats = wow_api.get_negative_cache_stats()
+    assert stats.hits == 5
+    assert stats.stores == 3
+    assert stats.size == 3
+    assert stats.hits + stats.misses == 17
+
+    await wow_api.close()
+
+
+def test_negative_cache_bounds() -> None:
+    cache = NegativeCache(max_size=100, lifetime=0.05)
+    for key in range(1000):
+        cache.add(key)
+    assert len(cache.entries) == 100
+    assert all(key in cache for key in range(900, 1000))
+    assert not any(key in cache for key in range(900))
+
+    time.sleep(0.06)
+    assert not any(key in cache for key in range(900, 1000))
+    assert cache.get_stats() == NegativeCacheStats(
+        hits=100, misses=1000, stores=1000, size=0
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_item_single_flight(stub: tuple[StubWoWHead, str]) -> None:
+    server, url = stub
+    server.responses = {1: [(200, 0.1)], 1000: [(200, 0.1)]}
+    wow_api = await WoWHeadAPI(make_config(url)).connect()
+
+    items = await asyncio.gather(*(
+        wow_api.get_item(wow_id, EnumAddons.retail, lang)
+        for wow_id in (1, 1000) for lang in (EnumLanguages.en, EnumLanguages.de)
+        for _ in range(10)
+    ))
+    assert server.calls == {1: 2, 1000: 2}
+    assert len({id(item) for item in items[:10]}) == 1
+    assert items[20:] == [None] * 20
+    assert not wow_api.single_flight.calls
+
+    await wow_api.close()
+
+
+@pytest.mark.asyncio
+async def test_get_item_bad_response(stub: tuple[StubWoWHead, str]) -> None:
+    server, url = stub
+    wow_api = await WoWHeadAPI(make_config(url)).connect()
+
+    assert await wow_api.get_items([1, 999], EnumAddons.retail, EnumLanguages.en) == {
+        1: await wow_api.get_item(1, EnumAddons.retail, EnumLanguages.en)
+    }
+    # malformed XML is neither retried nor cached as missing
+    await wow_api.get_items([999], EnumAddons.retail, EnumLanguages.en)
+    assert server.calls[999] == 2
+
+    await wow_api.close()
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker(stub: tuple[StubWoWHead, str]) -> None:
+    server, url = stub
+    server.responses = {id: [(503, 0)] for id in range(1, 5)}
+    wow_api = await WoWHeadAPI(make_config(
+        url, rate_limit=1000, rate_limit_burst=1000, max_retries=0,
+        circuit_breaker_min_calls=4, circuit_breaker_open_duration=0.3,
+        circuit_breaker_half_open_probes=2
+    )).connect()
+
+    # the failures open the circuit, then requests fail without being sent
+    assert await wow_api.get_items(
+        [1, 2, 3, 4], EnumAddons.retail, EnumLanguages.en
+    ) == {}
+    assert wow_api.get_stats().requests == 4
+    with pytest.raises(WoWAPIUnavailableError):
+        await wow_api.get_item(10, EnumAddons.retail, EnumLanguages.en)
+    assert 10 not in server.calls
+    stats = wow_api.get_circuit_breaker_stats()
+    assert stats.state is CircuitState.open
+    assert stats.opened == 1 and stats.rejected == 1
+
+    # only two probes go through once it is half-open; they close it
+    await asyncio.sleep(0.3)
+    items = await wow_api.get_items([10, 11, 12], EnumAddons.retail, EnumLanguages.en)
+    assert set(items) == {10, 11}
+    stats = wow_api.get_circuit_breaker_stats()
+    assert stats.state is CircuitState.closed
+    assert stats.probes == 2 and stats.closed == 1 and stats.calls == 0
+    assert await wow_api.get_item(12, EnumAddons.retail, EnumLanguages.en) is not None
+
+    await wow_api.close()
+
+
+def test_circuit_breaker_window(mocker: MockerFixture) -> None:
+    now = mocker.patch('time.monotonic', return_value=100.0)
+    breaker = CircuitBreaker(
+        window=10, min_calls=3, failure_rate_threshold=0.5, open_duration=5
+    )
+    breaker.record(False)
+    breaker.record(False)
+    now.return_value = 111.0
+    # the old failures left the window
+    breaker.record(False)
+    breaker.record(True)
+    breaker.record(True)
+    assert breaker.state is CircuitState.closed
+    assert breaker.get_stats().failure_rate == 1 / 3
+    breaker.record(False)
+    assert breaker.state is CircuitState.open
+    assert not breaker.allow()
+
+    # a failed probe opens it again, a cancelled one frees its slot
+    now.return_value = 116.0
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state is CircuitState.open
+    now.return_value = 121.0
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state is CircuitState.closed
+    assert breaker.get_stats().opened == 2
+
+
+def test_minify_html() -> None:
+    assert minify_html(
+        '<div class="tooltip">\n  <table>\n\t<tr><td>\n  <span>+20</span>\n  '
+        '<span>Stamina</span>\n  </td></tr>\n</TABLE>  <br>\n  Sell  Price</div>'
+    ) == (
+        '<div class="tooltip"><table><tr><td><span>+20</span> '
+        '<span>Stamina</span></td></tr></TABLE><br>\n  Sell  Price</div>'
+    )
+    # text and attribute values are left alone
+    assert minify_html('<a title="x  y"> a  b </a>\n') == '<a title="x  y"> a  b </a>'